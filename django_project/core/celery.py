@@ -40,8 +40,43 @@ app.conf.beat_schedule = {
         'task': 'sync_all_erp_data',
         'schedule': crontab(minute='*'),
     },
+    'drain_erp_outbox': {
+        'task': 'drain_erp_outbox',
+        'schedule': crontab(minute='*'),
+    },
+    'probe_dependencies': {
+        'task': 'probe_dependencies',
+        'schedule': crontab(minute='*'),
+    },
+    'materialise_pending_invoices': {
+        'task': 'materialise_pending_invoices',
+        'schedule': crontab(minute='*/5'),
+    },
     'sync_subscriptions': {
         'task': 'sync_subscriptions',
         'schedule': crontab(minute='*/5'),
+    },
+    'rollup_instance_uptime_five_minutes': {
+        'task': 'rollup_instance_uptime',
+        'schedule': crontab(minute='*/5'),
+        'args': ('5m',),
+    },
+    'rollup_instance_uptime_hour': {
+        'task': 'rollup_instance_uptime',
+        'schedule': crontab(minute=7),
+        'args': ('1h',),
+    },
+    'rollup_instance_uptime_day': {
+        'task': 'rollup_instance_uptime',
+        'schedule': crontab(hour=0, minute=17),
+        'args': ('1d',),
+    },
+    'purge_instance_uptime': {
+        'task': 'purge_instance_uptime',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'sync_paystack_plans': {
+        'task': 'sync_paystack_plans',
+        'schedule': crontab(hour=2, minute=0),
     }
 }
@@ -72,6 +72,149 @@ ERPNEXT_API_KEY = os.environ.get('ERPNEXT_API_KEY', '')
 ERPNEXT_API_SECRET = os.environ.get('ERPNEXT_API_SECRET', '')
 ERPNEXT_BASE_URL = os.environ.get('ERPNEXT_BASE_URL', '')
 
+# ERPNext http client
+ERPNEXT_CONNECT_TIMEOUT = float(
+    os.environ.get('ERPNEXT_CONNECT_TIMEOUT', 5)
+)
+ERPNEXT_READ_TIMEOUT = float(os.environ.get('ERPNEXT_READ_TIMEOUT', 30))
+ERPNEXT_MAX_RETRIES = int(os.environ.get('ERPNEXT_MAX_RETRIES', 3))
+ERPNEXT_BACKOFF_FACTOR = float(
+    os.environ.get('ERPNEXT_BACKOFF_FACTOR', 0.5)
+)
+ERPNEXT_BACKOFF_MAX = float(os.environ.get('ERPNEXT_BACKOFF_MAX', 10))
+ERPNEXT_POOL_MAXSIZE = int(os.environ.get('ERPNEXT_POOL_MAXSIZE', 10))
+
+# ERPNext pagination
+ERPNEXT_PAGE_LENGTH = int(os.environ.get('ERPNEXT_PAGE_LENGTH', 100))
+ERPNEXT_MAX_PAGE_LENGTH = int(
+    os.environ.get('ERPNEXT_MAX_PAGE_LENGTH', 1000)
+)
+ERPNEXT_PAGE_TARGET_SECONDS = float(
+    os.environ.get('ERPNEXT_PAGE_TARGET_SECONDS', 2)
+)
+ERPNEXT_PREFETCH_PAGES = int(os.environ.get('ERPNEXT_PREFETCH_PAGES', 4))
+
+# ERPNext incremental sync
+ERPNEXT_FULL_SYNC_INTERVAL_HOURS = float(
+    os.environ.get('ERPNEXT_FULL_SYNC_INTERVAL_HOURS', 24)
+)
+ERPNEXT_SYNC_LOOKBACK_SECONDS = int(
+    os.environ.get('ERPNEXT_SYNC_LOOKBACK_SECONDS', 60)
+)
+ERPNEXT_SYNC_DELETE_GRACE_MINUTES = int(
+    os.environ.get('ERPNEXT_SYNC_DELETE_GRACE_MINUTES', 10)
+)
+ERPNEXT_SYNC_BATCH_SIZE = int(
+    os.environ.get('ERPNEXT_SYNC_BATCH_SIZE', 500)
+)
+# Names per lookup by name, they are in the query string of the request,
+# so it is kept under the common 8 KB url limit
+ERPNEXT_NAME_LOOKUP_BATCH_SIZE = int(
+    os.environ.get('ERPNEXT_NAME_LOOKUP_BATCH_SIZE', 50)
+)
+
+# Maximum docs in one ERPNext batch write, ERPNext allows 200 inserts
+ERPNEXT_BATCH_WRITE_SIZE = int(
+    os.environ.get('ERPNEXT_BATCH_WRITE_SIZE', 200)
+)
+
+# Concurrent requests of the product catalog sync
+ERPNEXT_CATALOG_SYNC_WORKERS = int(
+    os.environ.get('ERPNEXT_CATALOG_SYNC_WORKERS', 8)
+)
+
+# ERPNext reference documents cache, in seconds
+ERPNEXT_DATA_CACHE_TIMEOUT = int(
+    os.environ.get('ERPNEXT_DATA_CACHE_TIMEOUT', 6 * 60 * 60)
+)
+
+# ERPNext outbox
+ERPNEXT_OUTBOX_MAX_ATTEMPTS = int(
+    os.environ.get('ERPNEXT_OUTBOX_MAX_ATTEMPTS', 8)
+)
+ERPNEXT_OUTBOX_BACKOFF_SECONDS = int(
+    os.environ.get('ERPNEXT_OUTBOX_BACKOFF_SECONDS', 30)
+)
+ERPNEXT_OUTBOX_BACKOFF_MAX_SECONDS = int(
+    os.environ.get('ERPNEXT_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+)
+ERPNEXT_OUTBOX_PROCESSING_TIMEOUT_SECONDS = int(
+    os.environ.get('ERPNEXT_OUTBOX_PROCESSING_TIMEOUT_SECONDS', 600)
+)
+
+# Invoice pdf download
+ERPNEXT_DOWNLOAD_CHUNK_SIZE = int(
+    os.environ.get('ERPNEXT_DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+)
+INVOICE_PDF_LOCK_SECONDS = int(
+    os.environ.get('INVOICE_PDF_LOCK_SECONDS', 300)
+)
+INVOICE_PDF_BATCH_SIZE = int(
+    os.environ.get('INVOICE_PDF_BATCH_SIZE', 50)
+)
+
+# Health of the external dependencies
+HEALTH_STATE_TIMEOUT_SECONDS = int(
+    os.environ.get('HEALTH_STATE_TIMEOUT_SECONDS', 180)
+)
+HEALTH_FAILURE_THRESHOLD = int(
+    os.environ.get('HEALTH_FAILURE_THRESHOLD', 3)
+)
+HEALTH_COOLDOWN_SECONDS = int(
+    os.environ.get('HEALTH_COOLDOWN_SECONDS', 60)
+)
+HEALTH_COOLDOWN_MAX_SECONDS = int(
+    os.environ.get('HEALTH_COOLDOWN_MAX_SECONDS', 600)
+)
+
+# Instance health check
+INSTANCE_CHECK_CONCURRENCY = int(
+    os.environ.get('INSTANCE_CHECK_CONCURRENCY', 100)
+)
+INSTANCE_CHECK_TIMEOUT = float(
+    os.environ.get('INSTANCE_CHECK_TIMEOUT', 10)
+)
+INSTANCE_CHECK_CONNECTIONS_PER_DOMAIN = int(
+    os.environ.get('INSTANCE_CHECK_CONNECTIONS_PER_DOMAIN', 20)
+)
+# Instances are split by id into shards, one celery task per shard
+INSTANCE_CHECK_SHARDS = int(os.environ.get('INSTANCE_CHECK_SHARDS', 8))
+INSTANCE_CHECK_LOCK_SECONDS = int(
+    os.environ.get('INSTANCE_CHECK_LOCK_SECONDS', 300)
+)
+# Cache of the instance names, positive and negative
+INSTANCE_DNS_POSITIVE_TTL_SECONDS = int(
+    os.environ.get('INSTANCE_DNS_POSITIVE_TTL_SECONDS', 60)
+)
+INSTANCE_DNS_NEGATIVE_TTL_SECONDS = int(
+    os.environ.get('INSTANCE_DNS_NEGATIVE_TTL_SECONDS', 30)
+)
+# Interval between checks, it backs off while the status is stable
+INSTANCE_CHECK_MIN_INTERVAL_SECONDS = int(
+    os.environ.get('INSTANCE_CHECK_MIN_INTERVAL_SECONDS', 60)
+)
+INSTANCE_CHECK_MAX_INTERVAL_SECONDS = int(
+    os.environ.get('INSTANCE_CHECK_MAX_INTERVAL_SECONDS', 30 * 60)
+)
+
+# Instance uptime
+INSTANCE_PROBE_BATCH_SIZE = int(
+    os.environ.get('INSTANCE_PROBE_BATCH_SIZE', 500)
+)
+# Closed periods that are rolled up again, for probes that come late
+INSTANCE_UPTIME_ROLLUP_PERIODS = int(
+    os.environ.get('INSTANCE_UPTIME_ROLLUP_PERIODS', 2)
+)
+INSTANCE_PROBE_RETENTION_DAYS = int(
+    os.environ.get('INSTANCE_PROBE_RETENTION_DAYS', 7)
+)
+INSTANCE_UPTIME_FIVE_MINUTES_RETENTION_DAYS = int(
+    os.environ.get('INSTANCE_UPTIME_FIVE_MINUTES_RETENTION_DAYS', 31)
+)
+INSTANCE_UPTIME_HOUR_RETENTION_DAYS = int(
+    os.environ.get('INSTANCE_UPTIME_HOUR_RETENTION_DAYS', 400)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': (
@@ -109,6 +252,7 @@ CELERY_BROKER_URL = CELERY_BROKER_REDIS_URL
 # --------------------------------------
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
 
 # --------------------------------------
 # PAYSTACK
@@ -116,6 +260,81 @@ STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
 PAYSTACK_PUBLISHABLE_KEY = os.environ.get('PAYSTACK_PUBLISHABLE_KEY', '')
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', '')
 
+# Payment gateway rate limits, in requests per second
+GATEWAY_RATE_LIMITS = {
+    'stripe': float(os.environ.get('STRIPE_RATE_LIMIT', 25)),
+    'paystack': float(os.environ.get('PAYSTACK_RATE_LIMIT', 10)),
+}
+# Bucket holds this many seconds of the rate
+GATEWAY_RATE_LIMIT_BURST_SECONDS = float(
+    os.environ.get('GATEWAY_RATE_LIMIT_BURST_SECONDS', 2)
+)
+# Fraction of the bucket that batch requests leave to interactive ones
+GATEWAY_BATCH_RESERVE = float(
+    os.environ.get('GATEWAY_BATCH_RESERVE', 0.5)
+)
+GATEWAY_INTERACTIVE_MAX_WAIT_SECONDS = float(
+    os.environ.get('GATEWAY_INTERACTIVE_MAX_WAIT_SECONDS', 5)
+)
+GATEWAY_BATCH_MAX_WAIT_SECONDS = float(
+    os.environ.get('GATEWAY_BATCH_MAX_WAIT_SECONDS', 60)
+)
+# Backoff after 429 without Retry-After, doubled on every 429 in a row
+GATEWAY_BACKOFF_SECONDS = float(
+    os.environ.get('GATEWAY_BACKOFF_SECONDS', 1)
+)
+GATEWAY_BACKOFF_MAX_SECONDS = float(
+    os.environ.get('GATEWAY_BACKOFF_MAX_SECONDS', 60)
+)
+GATEWAY_MAX_RETRIES = int(os.environ.get('GATEWAY_MAX_RETRIES', 2))
+GATEWAY_METRICS_MINUTES = int(os.environ.get('GATEWAY_METRICS_MINUTES', 60))
+
+# Subscriptions are synced by the webhooks,
+# the others are reconciled when they are not synced for this long
+SUBSCRIPTION_RECONCILE_SECONDS = int(
+    os.environ.get('SUBSCRIPTION_RECONCILE_SECONDS', 24 * 60 * 60)
+)
+# Subscriptions that end within this window, or ended within the grace
+# period, are synced every SUBSCRIPTION_DUE_SYNC_SECONDS
+SUBSCRIPTION_RENEWAL_WINDOW_SECONDS = int(
+    os.environ.get('SUBSCRIPTION_RENEWAL_WINDOW_SECONDS', 24 * 60 * 60)
+)
+SUBSCRIPTION_DUE_SYNC_SECONDS = int(
+    os.environ.get('SUBSCRIPTION_DUE_SYNC_SECONDS', 15 * 60)
+)
+# Maximum stale subscriptions outside the window that are synced per sweep
+SUBSCRIPTION_ROTATION_BATCH_SIZE = int(
+    os.environ.get('SUBSCRIPTION_ROTATION_BATCH_SIZE', 50)
+)
+SUBSCRIPTION_SYNC_LOCK_SECONDS = int(
+    os.environ.get('SUBSCRIPTION_SYNC_LOCK_SECONDS', 10 * 60)
+)
+
+# Remote detail of the subscription cache, in seconds
+SUBSCRIPTION_DETAIL_CACHE_TIMEOUT = int(
+    os.environ.get('SUBSCRIPTION_DETAIL_CACHE_TIMEOUT', 5 * 60)
+)
+
+# Stripe subscriptions are reconciled from the subscription list
+# when at least this many are due, otherwise one by one
+STRIPE_BULK_RECONCILE_MIN = int(
+    os.environ.get('STRIPE_BULK_RECONCILE_MIN', 20)
+)
+# Max pages of the subscription list, 100 subscriptions per page,
+# the ones that are not found are synced one by one
+STRIPE_BULK_RECONCILE_MAX_PAGES = int(
+    os.environ.get('STRIPE_BULK_RECONCILE_MAX_PAGES', 5)
+)
+
+# Payment event that fails is retried with exponential backoff,
+# the backoff is capped to the max seconds
+PAYMENT_EVENT_MAX_RETRIES = int(
+    os.environ.get('PAYMENT_EVENT_MAX_RETRIES', 8)
+)
+PAYMENT_EVENT_RETRY_BACKOFF_MAX_SECONDS = int(
+    os.environ.get('PAYMENT_EVENT_RETRY_BACKOFF_MAX_SECONDS', 15 * 60)
+)
+
 STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
@@ -5,10 +5,12 @@ from django.utils.html import format_html
 from geohosting.forms.coupon import CreateCouponForm, EditCouponForm
 from geohosting.models.coupon import CouponCode, Coupon
 from geohosting.tasks.coupon import sync_stripe_coupon
+from geohosting.utils.gateway_rate_limit import batch_priority
 from geohosting_event.models.log import LogTracker
 
 
 @admin.action(description="Sync stripe")
+@batch_priority()
 def sync_coupon_code_stripe(modeladmin, request, queryset):
     """Sync stripe."""
     for config in queryset:
@@ -19,6 +21,7 @@ def sync_coupon_code_stripe(modeladmin, request, queryset):
 
 
 @admin.action(description="Sync paystack")
+@batch_priority()
 def sync_coupon_code_paystack(modeladmin, request, queryset):
     """Sync stripe."""
     for coupon_code in queryset:
@@ -71,6 +74,7 @@ def sync_stripe(modeladmin, request, queryset):
         sync_stripe_coupon.delay(config.id)
 
 
+@batch_priority()
 def sync_paystack(modeladmin, request, queryset):
     """Sync paystack."""
     for coupon in queryset:
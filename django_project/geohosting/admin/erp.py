@@ -3,7 +3,27 @@ from django.contrib import admin
 from geohosting.models.erp_company import (
     ErpCompany, TaxesAndCharges, CostCenter
 )
-from geohosting.models.erp_model import ErpPaymentTermTemplate
+from geohosting.models.erp_model import (
+    ErpPaymentTermTemplate, ErpSyncState
+)
+from geohosting.models.erp_outbox import ErpOutbox, ErpOutboxStatus
+from geohosting.utils.erpnext import invalidate_erpnext_data_cache
+
+
+@admin.action(description='Clear cached erp data')
+def clear_erp_company_cache(modeladmin, request, queryset):
+    """Clear cached taxes of the companies."""
+    for company in queryset:
+        company.invalidate_erpnext_data_cache()
+
+
+@admin.action(description='Clear cached erp data')
+def clear_erp_payment_term_cache(modeladmin, request, queryset):
+    """Clear cached payment terms."""
+    invalidate_erpnext_data_cache(
+        ErpPaymentTermTemplate.doc_type,
+        queryset.values_list('erpnext_code', flat=True)
+    )
 
 
 class TaxesAndChargesInline(admin.TabularInline):
@@ -43,6 +63,7 @@ class ErpCompanyAdmin(admin.ModelAdmin):
         'payment_method', 'invoice_from_sales_invoice'
     )
     inlines = (TaxesAndChargesInline, CostCenterInline)
+    actions = (clear_erp_company_cache,)
 
     def changelist_view(self, request, extra_context=None):
         """Changelist view."""
@@ -72,6 +93,7 @@ class ErpCompanyAdmin(admin.ModelAdmin):
 class PaymentTermTemplateAdmin(admin.ModelAdmin):
     list_display = ('erpnext_code', 'is_active')
     list_editable = ('is_active',)
+    actions = (clear_erp_payment_term_cache,)
     change_list_template = 'admin/erp_change_list.html'
 
     def changelist_view(self, request, extra_context=None):
@@ -82,3 +104,32 @@ class PaymentTermTemplateAdmin(admin.ModelAdmin):
         extra_context = extra_context or {}
         extra_context.update(custom_context)
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(ErpSyncState)
+class ErpSyncStateAdmin(admin.ModelAdmin):
+    list_display = (
+        'model_name', 'watermark', 'last_synced_at', 'last_full_synced_at'
+    )
+    readonly_fields = ('model_name', 'last_synced_at', 'last_full_synced_at')
+
+
+@admin.action(description='Retry push to erp')
+def retry_erp_outbox(modeladmin, request, queryset):
+    """Retry the dead outbox."""
+    for entry in queryset.filter(status=ErpOutboxStatus.DEAD):
+        entry.retry()
+
+
+@admin.register(ErpOutbox)
+class ErpOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'content_type', 'object_id', 'status', 'attempts',
+        'next_attempt_at', 'created_at', 'processed_at'
+    )
+    list_filter = ('status', 'content_type')
+    readonly_fields = (
+        'content_type', 'object_id', 'attempts', 'locked_at', 'last_error',
+        'created_at', 'processed_at'
+    )
+    actions = (retry_erp_outbox,)
@@ -3,6 +3,9 @@
 from django.contrib import admin, messages
 from django.shortcuts import render
 
+from geohosting.models.erp_model import ErpModel
+from geohosting.utils.gateway_rate_limit import batch_priority
+
 
 class NoUpdateAdmin(admin.ModelAdmin):
     """Admin without delete."""
@@ -24,28 +27,38 @@ class NoUpdateAdmin(admin.ModelAdmin):
 
 
 def push_to_erp(modeladmin, request, queryset):
-    for obj in queryset:
-        result = obj.post_to_erpnext()
-        if result['status'] == 'success':
-            messages.add_message(
-                request,
-                messages.SUCCESS,
-                'Published'
-            )
+    """Push objects to erp, in batches for erp models."""
+    if issubclass(queryset.model, ErpModel):
+        results = queryset.model.bulk_post_to_erpnext(queryset)
+    else:
+        results = [(obj, obj.post_to_erpnext()) for obj in queryset]
+
+    published = 0
+    for obj, result in results:
+        if result and result['status'] == 'success':
+            published += 1
         else:
             messages.add_message(
                 request,
                 messages.ERROR,
-                result['message']
+                f'{obj}: {result["message"] if result else "Failed"}'
             )
+    if published:
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            f'Published {published}'
+        )
 
 
+@batch_priority()
 def sync_subscriptions(modeladmin, request, queryset):
     """Sync subscription."""
     for order in queryset.filter():
         order.sync_subscription()
 
 
+@batch_priority()
 def cancel_subscription(modeladmin, request, queryset):
     """Cancel subscription."""
     if 'apply' in request.POST:
@@ -3,7 +3,8 @@ import json
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from geohosting.models import PackageGroup, Package
+from geohosting.models import PackageGroup, Package, PaystackPlan
+from geohosting.utils.gateway_rate_limit import batch_priority
 
 
 def sync_specification(modeladmin, request, queryset):
@@ -85,3 +86,23 @@ class PackageAdmin(admin.ModelAdmin):
             }
         )
     )
+
+
+@admin.action(description='Sync plans from paystack')
+@batch_priority()
+def sync_paystack_plans(modeladmin, request, queryset):
+    """Sync paystack plans."""
+    PaystackPlan.sync()
+
+
+@admin.register(PaystackPlan)
+class PaystackPlanAdmin(admin.ModelAdmin):
+    """PaystackPlan admin."""
+
+    list_display = (
+        'name', 'plan_code', 'amount', 'currency', 'interval',
+        'discount_signature', 'is_active', 'synced_at'
+    )
+    list_filter = ('is_active', 'currency', 'interval')
+    search_fields = ('name', 'plan_code')
+    actions = (sync_paystack_plans,)
@@ -7,6 +7,7 @@ from geohosting.admin.global_function import (
 from geohosting.models import SalesOrder, SalesOrderInvoice
 from geohosting.models.agreement import SalesOrderAgreement
 from geohosting.models.sales_order import SalesOrderAutoRepeat
+from geohosting.utils.gateway_rate_limit import batch_priority
 from geohosting_event.admin.log import LogTrackerObjectAdmin
 from geohosting_event.models import LogTracker
 
@@ -70,6 +71,7 @@ class SalesOrderAgreementInline(admin.TabularInline):
         return False
 
 
+@batch_priority()
 def update_payment_status(modeladmin, request, queryset):
     """Update order status."""
     for order in queryset.filter():
@@ -1,42 +1,66 @@
 """Health check APIs."""
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from core.models.preferences import Preferences
+from geohosting.utils.gateway_rate_limit import Gateway, gateway_metrics
+from geohosting.utils.health import Dependency, DependencyHealth, OK
 
 
 class BaseHealthView(APIView):
     permission_classes = (IsAuthenticated, IsAdminUser)
+    dependency = None
 
-    def result(self, value: str):
-        ok = value == 'OK'
+    def result(self, state: dict):
+        ok = state['status'] == OK
         return Response(
-            {'status': value},
+            {
+                'status': state['status'],
+                'latency_ms': state.get('latency_ms'),
+                'checked_at': state.get('checked_at')
+            },
             status=200 if ok else 503
         )
 
+    def get(self, request):
+        return self.result(DependencyHealth(self.dependency).get())
+
 
 class ErpHealthView(BaseHealthView):
-    def get(self, request):
-        return self.result(Preferences.load().erp_next_test)
+    dependency = Dependency.ERP
 
 
 class ProxyHealthView(BaseHealthView):
-    def get(self, request):
-        return self.result(Preferences.load().proxy_test)
+    dependency = Dependency.PROXY
 
 
 class StripeHealthView(BaseHealthView):
-    def get(self, request):
-        return self.result(Preferences.load().stripe_test)
+    dependency = Dependency.STRIPE
 
 
 class PaystackHealthView(BaseHealthView):
-    def get(self, request):
-        return self.result(Preferences.load().paystack_test)
+    dependency = Dependency.PAYSTACK
 
 
 class VaultHealthView(BaseHealthView):
+    dependency = Dependency.VAULT
+
+
+class GatewayRateView(APIView):
+    """Budget of the payment gateways used per minute."""
+
+    permission_classes = (IsAuthenticated, IsAdminUser)
+
     def get(self, request):
-        return self.result(Preferences.load().vault_test)
+        try:
+            minutes = int(request.GET.get('minutes', 15))
+        except ValueError:
+            minutes = 15
+        minutes = min(max(minutes, 1), settings.GATEWAY_METRICS_MINUTES)
+        return Response(
+            {
+                gateway: gateway_metrics(gateway, minutes)
+                for gateway in Gateway.ALL
+            }
+        )
@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from django.http import HttpResponseBadRequest, Http404, HttpResponseForbidden
+from django.utils import timezone
 from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -14,6 +17,7 @@ from geohosting.models import (
 from geohosting.serializer.instance import (
     InstanceSerializer, InstanceDetailSerializer
 )
+from geohosting.utils.instance_uptime import instance_uptime_report
 
 
 class InstanceViewSet(
@@ -30,7 +34,7 @@ class InstanceViewSet(
     permission_classes = [IsAuthenticated]
     default_query_filter = ['name__icontains']
     lookup_field = 'name'
-    ignored_fields = ['page', 'page_size', 'q', 'product']
+    ignored_fields = ['page', 'page_size', 'q', 'product', 'days']
 
     def get_serializer_class(self):
         """Get serializer class."""
@@ -87,6 +91,22 @@ class InstanceViewSet(
         except Product.DoesNotExist:
             return Http404('No such product.')
 
+    @action(detail=True, methods=["get"])
+    def uptime(self, request, name=None):
+        """Return uptime and latency percentiles of the last days."""
+        instance = self.get_object()
+        try:
+            days = int(request.GET.get('days', 30))
+            if not 0 < days <= 366:
+                raise ValueError
+        except ValueError:
+            return HttpResponseBadRequest('days should be between 1 and 366')
+        return Response(
+            instance_uptime_report(
+                instance, timezone.now() - timedelta(days=days)
+            )
+        )
+
     def destroy(self, request, *args, **kwargs):
         """Destroy an instance."""
         instance = self.get_object()
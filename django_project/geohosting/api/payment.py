@@ -6,15 +6,14 @@ from django.conf import settings
 from django.http import HttpResponseServerError, JsonResponse
 from django.shortcuts import get_object_or_404
 from paystackapi.paystack import Paystack
-from paystackapi.plan import Plan
 from paystackapi.transaction import Transaction
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from core.models.preferences import Preferences
 from geohosting.models import Package, UserPaymentGatewayId
 from geohosting.models.coupon import CouponCode
 from geohosting.models.sales_order import SalesOrder, PaymentMethod
+from geohosting.utils.health import Dependency, DependencyHealth
 from geohosting_event.models.log import LogTracker
 
 paystack = Paystack(secret_key=settings.PAYSTACK_SECRET_KEY)
@@ -47,18 +46,17 @@ class PaymentAPI(APIView):
                 'We don\'t recognize your profile. '
                 'Please update your profile at /#/dashboard/profile.'
             )
-        pref = Preferences.load()
-        if pref.erp_next_test != 'OK':
+        if not DependencyHealth(Dependency.ERP).is_available:
             raise Exception(
                 'Our payment system is temporarily unavailable. '
                 'Please try again later or contact support.'
             )
-        if pref.proxy_test != 'OK':
+        if not DependencyHealth(Dependency.PROXY).is_available:
             raise Exception(
                 'Our deployment system is temporarily unavailable. '
                 'Please try again later or contact support.'
             )
-        if pref.vault_test != 'OK':
+        if not DependencyHealth(Dependency.VAULT).is_available:
             raise Exception(
                 'Our deployment system is temporarily unavailable. '
                 'Please try again later or contact support.'
@@ -193,13 +191,7 @@ class PaymentPaystackSessionAPI:
             metadata = coupon_code.metadata(price)
             price = metadata['discounted_amount']
 
-        plan = Plan.get(package.get_paystack_price_id(email, metadata))
-        try:
-            plan = plan['data']
-        except KeyError as e:
-            LogTracker.error(package, f'Plan : {json.dumps(plan)}')
-            raise e
-
+        plan = package.get_paystack_plan(email, metadata)
         transaction = Transaction.initialize(
             email=email,
             amount=price,
@@ -39,6 +39,8 @@ class SubscriptionChangeAPI(APIView):
             _id, payload = self.create_payload(
                 subscription, request.data['url']
             )
+            # The payment detail is going to be changed
+            subscription.invalidate_detail()
             return JsonResponse({
                 "url": payload,
                 "key": payload,
@@ -7,13 +7,22 @@ import json
 import re
 
 from django.http import HttpResponseBadRequest, HttpResponseServerError
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import (
+    AllowAny, IsAuthenticated, IsAdminUser
+)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from geohosting.models import Activity, ActivityStatus, Instance, Package
+from geohosting.models.data_types import PaymentMethod
 from geohosting.models.instance import InstanceStatus
-from geohosting_event.models.webhook import WebhookStatus, WebhookEvent
+from geohosting.utils.payment_webhook import (
+    InvalidSignature, construct_stripe_event, paystack_event_id,
+    receive_payment_event, verify_paystack_signature
+)
+from geohosting_event.models.webhook import (
+    WebhookHealth, WebhookStatus, WebhookEvent
+)
 
 
 class WebhookView(APIView):
@@ -22,6 +31,19 @@ class WebhookView(APIView):
     permission_classes = (IsAuthenticated, IsAdminUser)
     ARGO_CD = 'argocd'
 
+    @staticmethod
+    def apply_instance_event(instance, status, health) -> bool:
+        """Apply event that is not for an activity to the instance.
+
+        Return False if the event is not used.
+        """
+        if status == WebhookStatus.DELETED:
+            instance.deleted()
+            return True
+        if health:
+            return instance.apply_argo_cd_health(health)
+        return False
+
     def post(self, request):
         """Create new instance."""
         data = request.data
@@ -41,8 +63,11 @@ class WebhookView(APIView):
                 )
             source = source.lower()
 
+            health = data.get('Health', data.get('health'))
+            health = health.lower() if health else None
+
             # Don't do anything if it is still running
-            if status in [WebhookStatus.RUNNING]:
+            if status in [WebhookStatus.RUNNING] and not health:
                 return Response()
             if source != self.ARGO_CD:
                 return Response()
@@ -65,10 +90,21 @@ class WebhookView(APIView):
                     instance=instance, status=ActivityStatus.ERROR
                 ).last()
             if not activity:
+                # Events of a running instance, e.g. health or deletion
+                if (
+                        self.apply_instance_event(instance, status, health) or
+                        status in [WebhookStatus.RUNNING]
+                ):
+                    return Response()
                 raise Activity.DoesNotExist()
             webhook.activity = activity
             webhook.save()
 
+            if status in [WebhookStatus.RUNNING]:
+                if health:
+                    instance.apply_argo_cd_health(health)
+                return Response()
+
             # If error
             if status in [
                 WebhookStatus.ERROR, WebhookStatus.FAILED,
@@ -91,6 +127,9 @@ class WebhookView(APIView):
             activity.note = json.dumps(data)
             activity.update_status(ActivityStatus.SUCCESS)
             activity.save()
+            if health and health != WebhookHealth.MISSING:
+                instance.refresh_from_db()
+                instance.apply_argo_cd_health(health)
 
         except (
                 KeyError, Instance.DoesNotExist, Activity.DoesNotExist,
@@ -106,3 +145,49 @@ class WebhookView(APIView):
             return HttpResponseServerError(f'{e}')
 
         return Response()
+
+
+class StripeWebhookView(APIView):
+    """Webhook receiver of stripe, it is verified by the signature."""
+
+    authentication_classes = []
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        """Store the event, it is applied on the background."""
+        payload = request.body
+        try:
+            event = construct_stripe_event(
+                payload, request.headers.get('Stripe-Signature', '')
+            )
+        except InvalidSignature as e:
+            return HttpResponseBadRequest(f'{e}')
+        receive_payment_event(
+            PaymentMethod.STRIPE, event['id'], event['type'],
+            json.loads(payload)
+        )
+        return Response()
+
+
+class PaystackWebhookView(APIView):
+    """Webhook receiver of paystack, it is verified by the signature."""
+
+    authentication_classes = []
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        """Store the event, it is applied on the background."""
+        payload = request.body
+        try:
+            verify_paystack_signature(
+                payload, request.headers.get('X-Paystack-Signature', '')
+            )
+            data = json.loads(payload)
+            event_type = data['event']
+        except (InvalidSignature, ValueError, KeyError) as e:
+            return HttpResponseBadRequest(f'{e}')
+        receive_payment_event(
+            PaymentMethod.PAYSTACK, paystack_event_id(payload), event_type,
+            data
+        )
+        return Response()
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.13 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0062_salesorderautorepeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ErpSyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=256, unique=True)),
+                ('watermark', models.CharField(blank=True, help_text='Highest modified timestamp on ERPNext that has been synced.', max_length=64, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_synced_at', models.DateTimeField(blank=True, help_text='Last time that all rows were synced and the deleted ones were reconciled.', null=True)),
+            ],
+            options={
+                'ordering': ('model_name',),
+            },
+        ),
+    ]
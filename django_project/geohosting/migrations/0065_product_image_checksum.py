@@ -0,0 +1,33 @@
+# Generated by Django 5.2.13 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0064_erpoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_checksum',
+            field=models.CharField(blank=True, help_text='Sha256 checksum of the image content.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_etag',
+            field=models.CharField(blank=True, help_text='ETag of the image on erpnext.', max_length=256, null=True),
+        ),
+        migrations.AddField(
+            model_name='productmedia',
+            name='image_checksum',
+            field=models.CharField(blank=True, help_text='Sha256 checksum of the image content.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='productmedia',
+            name='image_etag',
+            field=models.CharField(blank=True, help_text='ETag of the image on erpnext.', max_length=256, null=True),
+        ),
+    ]
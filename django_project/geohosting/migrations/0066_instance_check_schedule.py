@@ -0,0 +1,23 @@
+# Generated by Django 5.2.13 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0065_product_image_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='next_check_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the instance is checked next, empty is now.', null=True),
+        ),
+        migrations.AddField(
+            model_name='instance',
+            name='stability',
+            field=models.PositiveIntegerField(default=0, help_text='Number of checks in a row without status change.'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.13 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0066_instance_check_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstanceProbe',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_at', models.DateTimeField(db_index=True)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('reachable', models.BooleanField(default=True)),
+                ('online', models.BooleanField(default=False)),
+                ('interval_seconds', models.FloatField(default=0, help_text='Time until the next check.')),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='geohosting.instance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['instance', 'checked_at'], name='geohosting__instanc_057883_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstanceUptime',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('5m', '5 minutes'), ('1h', 'Hour'), ('1d', 'Day')], max_length=2)),
+                ('period_start', models.DateTimeField()),
+                ('probes', models.PositiveIntegerField(default=0)),
+                ('online_probes', models.PositiveIntegerField(default=0)),
+                ('unreachable_probes', models.PositiveIntegerField(default=0)),
+                ('observed_seconds', models.FloatField(default=0)),
+                ('online_seconds', models.FloatField(default=0)),
+                ('latency_histogram', models.JSONField(default=list)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='geohosting.instance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'period_start'], name='geohosting__resolut_cbf29e_idx')],
+                'unique_together': {('instance', 'resolution', 'period_start')},
+            },
+        ),
+    ]
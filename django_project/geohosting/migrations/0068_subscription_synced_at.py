@@ -0,0 +1,18 @@
+# Generated by Django 5.2.13 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0067_instance_uptime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, help_text='Last time it is synced from the payment gateway.', null=True),
+        ),
+    ]
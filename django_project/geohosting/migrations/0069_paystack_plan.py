@@ -0,0 +1,32 @@
+# Generated by Django 5.2.13 on 2026-10-18 13:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0068_subscription_synced_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaystackPlan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plan_id', models.CharField(max_length=256, unique=True)),
+                ('plan_code', models.CharField(max_length=256, unique=True)),
+                ('name', models.CharField(max_length=512)),
+                ('amount', models.PositiveBigIntegerField(help_text='Amount in the subunit of the currency.')),
+                ('currency', models.CharField(max_length=16)),
+                ('interval', models.CharField(max_length=64)),
+                ('discount_signature', models.CharField(blank=True, default='', help_text='Signature of the discount of the plan, empty for none.', max_length=256)),
+                ('is_active', models.BooleanField(default=True, help_text='False when the plan is deleted or archived on paystack.')),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('amount', 'currency', 'interval', 'discount_signature'), name='unique_active_paystack_plan')],
+            },
+        ),
+    ]
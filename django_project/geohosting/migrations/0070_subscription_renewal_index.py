@@ -0,0 +1,23 @@
+# Generated by Django 5.2.13 on 2026-10-18 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0069_paystack_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['is_active', 'current_period_end'], name='geohosting__is_acti_b2e72f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['is_active', 'synced_at'], name='geohosting__is_acti_538e27_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.13 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting', '0070_subscription_renewal_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='gateway_event_at',
+            field=models.DateTimeField(blank=True, help_text='Creation time of the last subscription event of the payment gateway that is applied, older events are skipped.', null=True),
+        ),
+    ]
@@ -12,8 +12,11 @@ from geohosting.models.company import *
 from geohosting.models.country import *
 from geohosting.models.coupon import *
 from geohosting.models.erp_company import *
+from geohosting.models.erp_outbox import *
 from geohosting.models.instance import *
+from geohosting.models.instance_uptime import *
 from geohosting.models.package import *
+from geohosting.models.paystack_plan import *
 from geohosting.models.product import *
 from geohosting.models.region import *
 from geohosting.models.sales_order import *
@@ -12,6 +12,8 @@ from geohosting.models.erp_model import ErpModel
 class Company(ErpModel):
     """Company profile model."""
 
+    erp_batch_write = False
+
     name = models.CharField(
         max_length=255, unique=True
     )
@@ -5,7 +5,7 @@ from django.dispatch import receiver
 from geohosting.models.data_types import PaymentMethod
 from geohosting.models.erp_model import ErpModel
 from geohosting.utils.erpnext import (
-    fetch_erpnext_data
+    fetch_erpnext_data, invalidate_erpnext_data_cache
 )
 
 
@@ -49,6 +49,13 @@ class ErpCompany(ErpModel):
         ordering = ('name',)
         verbose_name_plural = 'Erp companies'
 
+    def invalidate_erpnext_data_cache(self):
+        """Invalidate cached erpnext data of the taxes."""
+        invalidate_erpnext_data_cache(
+            TaxesAndCharges.doc_type,
+            self.taxesandcharges_set.values_list('erpnext_code', flat=True)
+        )
+
 
 @receiver(post_save, sender=ErpCompany)
 def erp_company_post_save(sender, instance, created, **kwargs):
@@ -77,6 +84,9 @@ def erp_company_post_save(sender, instance, created, **kwargs):
                 erpnext_code=row['name']
             )
 
+        # Taxes may be changed on erpnext
+        instance.invalidate_erpnext_data_cache()
+
 
 class TaxesAndCharges(ErpModel):
     """Sales and charge."""
@@ -5,20 +5,131 @@ GeoHosting.
 .. note:: Model for ERP.
 """
 
-from django.db import models
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import models, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 from geohosting.utils.erpnext import (
-    fetch_erpnext_data, post_to_erpnext, put_to_erpnext
+    bulk_update_to_erpnext, fetch_erpnext_data, post_to_erpnext,
+    put_to_erpnext
 )
 
 
+ERP_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def parse_erp_datetime(value: str) -> datetime:
+    """Parse datetime string from erpnext."""
+    try:
+        return datetime.strptime(value, ERP_DATETIME_FORMAT)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+class ErpSyncState(models.Model):
+    """Sync state of a model that is synced from erpnext.
+
+    The watermark is the highest `modified` value of erpnext that has been
+    synced, so the next sync only requests the rows that changed after it.
+    """
+
+    model_name = models.CharField(
+        max_length=256, unique=True
+    )
+    watermark = models.CharField(
+        max_length=64, blank=True, null=True,
+        help_text=(
+            'Highest modified timestamp on ERPNext that has been synced.'
+        )
+    )
+    last_synced_at = models.DateTimeField(
+        blank=True, null=True
+    )
+    last_full_synced_at = models.DateTimeField(
+        blank=True, null=True,
+        help_text=(
+            'Last time that all rows were synced and '
+            'the deleted ones were reconciled.'
+        )
+    )
+
+    class Meta:  # noqa: D106
+        ordering = ('model_name',)
+
+    def __str__(self):
+        return self.model_name
+
+    @staticmethod
+    def for_model(model) -> 'ErpSyncState':
+        """Return sync state of the model."""
+        state, _ = ErpSyncState.objects.get_or_create(
+            model_name=model.__name__
+        )
+        return state
+
+    @property
+    def is_full_sync_due(self) -> bool:
+        """Return if full reconciliation needs to be run."""
+        if not self.watermark or not self.last_full_synced_at:
+            return True
+        return timezone.now() >= self.last_full_synced_at + timedelta(
+            hours=settings.ERPNEXT_FULL_SYNC_INTERVAL_HOURS
+        )
+
+    def filters(self, full: bool) -> list:
+        """Return erpnext filters for the rows that need to be synced.
+
+        The lookback re-reads rows around the watermark, so rows that are
+        committed late with an older timestamp are not missed.
+        """
+        if full or not self.watermark:
+            return []
+        since = parse_erp_datetime(self.watermark) - timedelta(
+            seconds=settings.ERPNEXT_SYNC_LOOKBACK_SECONDS
+        )
+        return [["modified", ">=", since.strftime(ERP_DATETIME_FORMAT)]]
+
+    @staticmethod
+    def order_by(full: bool) -> str | None:
+        """Return order of the rows that need to be synced.
+
+        Erpnext sorts by modified desc by default, a row that is modified
+        during a full sync moves between pages and can be skipped.
+        The creation order keeps the pages stable.
+        """
+        return 'creation asc' if full else None
+
+    def finish(self, rows: list, full: bool):
+        """Save the state after rows are synced."""
+        modified = [
+            row['modified'] for row in rows if row.get('modified')
+        ]
+        if modified:
+            latest = max(modified, key=parse_erp_datetime)
+            if (
+                    not self.watermark or
+                    parse_erp_datetime(latest) >
+                    parse_erp_datetime(self.watermark)
+            ):
+                self.watermark = latest
+        self.last_synced_at = timezone.now()
+        if full:
+            self.last_full_synced_at = self.last_synced_at
+        self.save()
+
+
 class ErpModel(models.Model):
     """Abstract erp model."""
 
     id_field_in_erpnext = 'id'
 
+    # Push in batch when post_to_erpnext has no other writes
+    erp_batch_write = True
+
     erpnext_code = models.CharField(
         max_length=100, blank=True, null=True
     )
@@ -60,23 +171,192 @@ class ErpModel(models.Model):
         return result
 
     @classmethod
-    def sync_data(cls):
-        """Sync data from erpnext to django that has erpnext code."""
+    def bulk_post_to_erpnext(cls, objs) -> list:
+        """Post objects to erpnext in batches, grouped per doctype.
+
+        Existing objects are updated with bulk_update, the docname maps
+        the result back to each object. New objects are posted one by one,
+        insert_many returns the names as a set, so they can't be mapped
+        back to the objects.
+
+        :return: List of (obj, result) in the order of objs.
+        """
+        objs = list(objs)
+        if not cls.erp_batch_write:
+            return [(obj, obj.post_to_erpnext()) for obj in objs]
+
+        results = {}
+        creates = {}
+        updates = {}
+        for obj in objs:
+            group = updates if obj.erpnext_code else creates
+            group.setdefault(obj.doc_type, []).append(obj)
+
+        batch_size = settings.ERPNEXT_BATCH_WRITE_SIZE
+        for doc_type, _objs in updates.items():
+            for idx in range(0, len(_objs), batch_size):
+                results.update(
+                    cls._bulk_update_to_erpnext(
+                        doc_type, _objs[idx:idx + batch_size]
+                    )
+                )
+        for _objs in creates.values():
+            for obj in _objs:
+                results[obj.pk] = obj.post_to_erpnext()
+        return [(obj, results[obj.pk]) for obj in objs]
+
+    @classmethod
+    def _bulk_update_to_erpnext(cls, doc_type, objs) -> dict:
+        """Update objects on erpnext, return result by pk."""
+        docs = []
+        for obj in objs:
+            doc = dict(obj.erp_payload_for_edit)
+            doc['doctype'] = doc_type
+            doc['docname'] = obj.erpnext_code
+            docs.append(doc)
+        result = bulk_update_to_erpnext(docs)
+        if result['status'] != 'success':
+            return {obj.pk: result for obj in objs}
+
+        results = {}
+        for obj in objs:
+            error = result['failed'].get(obj.erpnext_code)
+            if error:
+                results[obj.pk] = {"status": "error", "message": error}
+            else:
+                results[obj.pk] = {"status": "success", "data": {}}
+        return results
+
+    def erp_outbox_pushed(self):
+        """Run after the object is pushed from the erp outbox."""
+        pass
+
+    @classmethod
+    def erp_sync_filters(cls) -> list:
+        """Filters of erpnext rows that are synced to this model."""
+        return []
+
+    @classmethod
+    def erp_delete_missing_rows(cls, erpnext_codes: set, started_at):
+        """Reconcile rows that are deleted on erpnext.
+
+        By default nothing is deleted,
+        override it for the model that erpnext is the source of.
+
+        :param erpnext_codes: All erpnext codes that exist on erpnext.
+        :param started_at: Time when the rows were requested.
+        """
+        pass
+
+    @classmethod
+    def existing_rows_by_erpnext_code(cls, erpnext_codes) -> dict:
+        """Return existing rows grouped by erpnext code."""
+        erpnext_codes = list(erpnext_codes)
+        batch_size = settings.ERPNEXT_SYNC_BATCH_SIZE
+        existing = {}
+        for idx in range(0, len(erpnext_codes), batch_size):
+            for obj in cls.objects.filter(
+                    erpnext_code__in=erpnext_codes[idx:idx + batch_size]
+            ).order_by('pk'):
+                existing.setdefault(obj.erpnext_code, []).append(obj)
+        return existing
+
+    @classmethod
+    def bulk_sync_rows(cls, rows: dict) -> (int, int):
+        """Create or update rows in bulk, only the changed ones are written.
+
+        Rows are compared against the existing ones in memory,
+        then written in batches inside one transaction.
+        post_save is sent for the written rows, as save() would do.
+
+        :param rows: Values of fields keyed by erpnext code.
+        :return: Number of created and updated rows.
+        """
+        existing = cls.existing_rows_by_erpnext_code(rows.keys())
+        fields = {field.name: field for field in cls._meta.concrete_fields}
+        created = []
+        updated = []
+        updated_fields = set()
+        for erpnext_code, values in rows.items():
+            values = {
+                key: fields[key].to_python(value)
+                for key, value in values.items()
+            }
+            objs = existing.get(erpnext_code)
+            if not objs:
+                created.append(cls(erpnext_code=erpnext_code, **values))
+                continue
+            for obj in objs:
+                changed = [
+                    key for key, value in values.items()
+                    if getattr(obj, key) != value
+                ]
+                for key in changed:
+                    setattr(obj, key, values[key])
+                if changed:
+                    updated_fields.update(changed)
+                    updated.append(obj)
+
+        batch_size = settings.ERPNEXT_SYNC_BATCH_SIZE
+        with transaction.atomic():
+            if created:
+                created = cls.objects.bulk_create(
+                    created, batch_size=batch_size
+                )
+            if updated:
+                cls.objects.bulk_update(
+                    updated, list(updated_fields), batch_size=batch_size
+                )
+
+        for obj in created:
+            post_save.send(sender=cls, instance=obj, created=True)
+        for obj in updated:
+            post_save.send(
+                sender=cls, instance=obj, created=False,
+                update_fields=frozenset(updated_fields)
+            )
+        return len(created), len(updated)
+
+    @classmethod
+    def sync_data(cls, full: bool = None):
+        """Sync data from erpnext to django that has erpnext code.
+
+        Only the rows that are modified after the last sync are requested.
+        Periodically, all rows are requested to reconcile the deleted ones.
+        """
         try:
-            data = fetch_erpnext_data(cls().doc_type)
+            started_at = timezone.now()
+            state = ErpSyncState.for_model(cls)
+            if full is None:
+                full = state.is_full_sync_due
+            data = fetch_erpnext_data(
+                cls().doc_type,
+                filters=cls.erp_sync_filters() + state.filters(full),
+                order_by=state.order_by(full)
+            )
+            if not isinstance(data, list):
+                raise ValueError("Failed to fetch data from ERPNext")
+
             field_names = [
-                field.name for field in cls._meta.get_fields() if
-                field.editable and not field.auto_created
+                field.name for field in cls._meta.concrete_fields if
+                field.editable and not field.is_relation
                 and field.name != 'erpnext_code'
             ]
-            for _data in data:
-                cls.objects.update_or_create(
-                    erpnext_code=_data[cls.id_field_in_erpnext],
-                    defaults={
+            cls.bulk_sync_rows(
+                {
+                    _data[cls.id_field_in_erpnext]: {
                         key: value for key, value in _data.items() if
                         key in field_names
                     }
+                    for _data in data
+                }
+            )
+            if full and data:
+                cls.erp_delete_missing_rows(
+                    {_data[cls.id_field_in_erpnext] for _data in data},
+                    started_at
                 )
+            state.finish(data, full)
         except Exception:
             pass
 
@@ -0,0 +1,233 @@
+# coding=utf-8
+"""
+GeoHosting.
+
+.. note:: Outbox of pending ERP mutations.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from geohosting_event.models.log import LogTracker
+
+
+class ErpOutboxStatus:
+    """Erp outbox Status."""
+
+    PENDING = 'Pending'
+    PROCESSING = 'Processing'
+    DONE = 'Done'
+    DEAD = 'Dead'
+
+
+class ErpOutbox(models.Model):
+    """Pending push of an erp model to erpnext.
+
+    The entry is created in the same transaction as the save of the object,
+    then pushed by celery. The payload is built from the object when it is
+    pushed, so one pending entry per object is enough.
+    Entries of an object are pushed one by one, in order.
+    """
+
+    STATUS_CHOICES = (
+        (ErpOutboxStatus.PENDING, ErpOutboxStatus.PENDING),
+        (ErpOutboxStatus.PROCESSING, ErpOutboxStatus.PROCESSING),
+        (ErpOutboxStatus.DONE, ErpOutboxStatus.DONE),
+        (ErpOutboxStatus.DEAD, ErpOutboxStatus.DEAD),
+    )
+
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE
+    )
+    object_id = models.PositiveIntegerField()
+    object = GenericForeignKey(
+        'content_type', 'object_id'
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES,
+        default=ErpOutboxStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(
+        blank=True, null=True
+    )
+    last_error = models.TextField(
+        blank=True, null=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(
+        blank=True, null=True
+    )
+
+    class Meta:  # noqa: D106
+        ordering = ('id',)
+        verbose_name = 'ERP outbox'
+        verbose_name_plural = 'ERP outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['content_type', 'object_id', 'status']),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type} {self.object_id} ({self.status})'
+
+    @staticmethod
+    def dispatch(content_type_id: int, object_id: int):
+        """Push the object on celery after the transaction is committed."""
+        from geohosting.tasks.erp import push_erp_outbox
+        transaction.on_commit(
+            lambda: push_erp_outbox.delay(content_type_id, object_id)
+        )
+
+    @staticmethod
+    def enqueue(instance) -> 'ErpOutbox':
+        """Record that the instance needs to be pushed to erpnext.
+
+        Call it inside the transaction that saves the instance.
+        """
+        content_type = ContentType.objects.get_for_model(instance)
+        entry = ErpOutbox.objects.filter(
+            content_type=content_type,
+            object_id=instance.pk,
+            status=ErpOutboxStatus.PENDING
+        ).first()
+        if not entry:
+            entry = ErpOutbox.objects.create(
+                content_type=content_type,
+                object_id=instance.pk
+            )
+        ErpOutbox.dispatch(content_type.id, instance.pk)
+        return entry
+
+    @staticmethod
+    def claim(content_type_id: int, object_id: int) -> 'ErpOutbox':
+        """Claim the oldest entry of the object if it can be pushed.
+
+        The oldest entry is locked, so the entries of one object are never
+        pushed concurrently or out of order.
+        """
+        now = timezone.now()
+        stale_at = now - timedelta(
+            seconds=settings.ERPNEXT_OUTBOX_PROCESSING_TIMEOUT_SECONDS
+        )
+        with transaction.atomic():
+            entry = ErpOutbox.objects.select_for_update().filter(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                status__in=[
+                    ErpOutboxStatus.PENDING, ErpOutboxStatus.PROCESSING
+                ]
+            ).order_by('id').first()
+            if not entry:
+                return None
+            if entry.status == ErpOutboxStatus.PROCESSING:
+                if entry.locked_at and entry.locked_at > stale_at:
+                    return None
+            elif entry.next_attempt_at > now:
+                return None
+            entry.status = ErpOutboxStatus.PROCESSING
+            entry.locked_at = now
+            entry.attempts += 1
+            entry.save()
+        return entry
+
+    @staticmethod
+    def push_object(content_type_id: int, object_id: int):
+        """Push every entry of the object that is due."""
+        entry = ErpOutbox.claim(content_type_id, object_id)
+        while entry:
+            if not entry.push():
+                return
+            entry = ErpOutbox.claim(content_type_id, object_id)
+
+    @staticmethod
+    def drain():
+        """Push every object that has due entries."""
+        now = timezone.now()
+        stale_at = now - timedelta(
+            seconds=settings.ERPNEXT_OUTBOX_PROCESSING_TIMEOUT_SECONDS
+        )
+        objects = ErpOutbox.objects.filter(
+            Q(
+                status=ErpOutboxStatus.PENDING,
+                next_attempt_at__lte=now
+            ) | Q(
+                status=ErpOutboxStatus.PROCESSING,
+                locked_at__lte=stale_at
+            )
+        ).values_list('content_type_id', 'object_id').distinct()
+        for content_type_id, object_id in objects:
+            ErpOutbox.push_object(content_type_id, object_id)
+
+    def push(self) -> bool:
+        """Push the object to erpnext.
+
+        :return: True if it is pushed.
+        """
+        obj = self.object
+        if obj is None:
+            self.done()
+            return True
+
+        # Saves during the push are part of this push
+        obj._erp_outbox_pushing = True
+        try:
+            result = obj.post_to_erpnext()
+        except Exception as e:
+            result = {'status': 'error', 'message': f'{e}'}
+        finally:
+            obj._erp_outbox_pushing = False
+
+        if not result or result['status'] != 'success':
+            error = result.get('message', result) if result else result
+            self.failed(obj, f'{error}')
+            return False
+        self.done()
+        obj.erp_outbox_pushed()
+        return True
+
+    def done(self):
+        """Mark the entry as done."""
+        self.status = ErpOutboxStatus.DONE
+        self.processed_at = timezone.now()
+        self.last_error = None
+        self.save()
+
+    def failed(self, obj, error: str):
+        """Retry the entry later, or dead-letter it."""
+        self.last_error = error
+        if self.attempts >= settings.ERPNEXT_OUTBOX_MAX_ATTEMPTS:
+            self.status = ErpOutboxStatus.DEAD
+            self.processed_at = timezone.now()
+            self.save()
+            LogTracker.error(
+                obj,
+                f'Failed to push to erpnext after {self.attempts} '
+                f'attempts: {error}'
+            )
+            return
+        self.status = ErpOutboxStatus.PENDING
+        self.next_attempt_at = timezone.now() + timedelta(
+            seconds=min(
+                settings.ERPNEXT_OUTBOX_BACKOFF_SECONDS *
+                (2 ** (self.attempts - 1)),
+                settings.ERPNEXT_OUTBOX_BACKOFF_MAX_SECONDS
+            )
+        )
+        self.save()
+
+    def retry(self):
+        """Push the dead entry again."""
+        self.status = ErpOutboxStatus.PENDING
+        self.attempts = 0
+        self.next_attempt_at = timezone.now()
+        self.processed_at = None
+        self.save()
+        ErpOutbox.dispatch(self.content_type_id, self.object_id)
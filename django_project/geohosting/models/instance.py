@@ -5,9 +5,14 @@ GeoHosting.
 .. note:: Instance model.
 """
 
+from datetime import timedelta
+from urllib.parse import urlparse
+
 import requests
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 from geohosting.models.cluster import Cluster
 from geohosting.models.company import Company
@@ -33,6 +38,113 @@ class InstanceStatus:
     DELETED = 'Deleted'
 
 
+class InstanceEvent:
+    """Event that changes the instance status."""
+
+    # Results of the check, reached is when it is not online
+    ONLINE = 'online'
+    REACHED = 'reached'
+    UNREACHED = 'unreached'
+
+    # From the deployment
+    STARTED = 'started'
+    OFFLINE = 'offline'
+    DELETE = 'delete'
+    DELETED = 'deleted'
+
+
+class InstanceStateMachine:
+    """Transitions of instance status for a batch of events.
+
+    The changed statuses are saved in bulk and the side effects are run
+    only for the instances whose status is changed.
+    """
+
+    TRANSITIONS = {
+        InstanceStatus.DEPLOYING: {
+            InstanceEvent.STARTED: InstanceStatus.STARTING_UP,
+            InstanceEvent.ONLINE: InstanceStatus.STARTING_UP,
+            InstanceEvent.REACHED: InstanceStatus.STARTING_UP,
+            InstanceEvent.DELETE: InstanceStatus.DELETING,
+        },
+        InstanceStatus.STARTING_UP: {
+            InstanceEvent.ONLINE: InstanceStatus.ONLINE,
+            InstanceEvent.DELETE: InstanceStatus.DELETING,
+        },
+        InstanceStatus.ONLINE: {
+            InstanceEvent.OFFLINE: InstanceStatus.OFFLINE,
+            InstanceEvent.REACHED: InstanceStatus.OFFLINE,
+            InstanceEvent.UNREACHED: InstanceStatus.OFFLINE,
+            InstanceEvent.DELETE: InstanceStatus.DELETING,
+        },
+        InstanceStatus.OFFLINE: {
+            InstanceEvent.ONLINE: InstanceStatus.ONLINE,
+            InstanceEvent.DELETE: InstanceStatus.DELETING,
+        },
+        InstanceStatus.DELETING: {
+            InstanceEvent.UNREACHED: InstanceStatus.DELETED,
+            InstanceEvent.DELETED: InstanceStatus.DELETED,
+        },
+        InstanceStatus.DELETED: {},
+    }
+
+    def __init__(self):
+        self.changed = []
+
+    @staticmethod
+    def next_status(status: str, event: str) -> str:
+        """Return status after the event."""
+        return InstanceStateMachine.TRANSITIONS.get(status, {}).get(
+            event, status
+        )
+
+    def transition(self, instance, event: str) -> bool:
+        """Apply event to the instance, return True if it is changed."""
+        status = self.next_status(instance.status, event)
+        instance.previous_status = instance.status
+        if status == instance.status:
+            return False
+        instance.status = status
+        instance.modified_at = timezone.now()
+        self.changed.append(instance)
+        return True
+
+    def save(self, fields: list = None):
+        """Save the changed instances in bulk."""
+        Instance.objects.bulk_update(
+            self.changed, ['status', 'modified_at'] + (fields or [])
+        )
+
+    @staticmethod
+    def _run_side_effects(instance):
+        """Run side effects of the status change of an instance."""
+        from geohosting.utils.email import InstanceEmail
+        if instance.status in [InstanceStatus.ONLINE, InstanceStatus.OFFLINE]:
+            if instance.previous_status == InstanceStatus.STARTING_UP:
+                InstanceEmail(instance).send_credentials()
+            instance.update_sales_order()
+        elif instance.status == InstanceStatus.DELETED:
+            instance.update_running_activities()
+            instance.cancel_subscription()
+
+    def run_side_effects(self):
+        """Run side effects of the changed instances."""
+        for instance in self.changed:
+            try:
+                self._run_side_effects(instance)
+            except Exception as e:
+                LogTracker.error(
+                    instance,
+                    f'{instance.previous_status} to {instance.status}: {e}'
+                )
+
+    def apply(self, fields: list = None) -> list:
+        """Save the changed instances, then run their side effects."""
+        self.save(fields)
+        self.run_side_effects()
+        return self.changed
+
+
 class Instance(models.Model):
     """Instance model."""
 
@@ -76,6 +188,16 @@ class Instance(models.Model):
         null=True, blank=True
     )
 
+    # Schedule of the health check
+    next_check_at = models.DateTimeField(
+        null=True, blank=True, db_index=True,
+        help_text='When the instance is checked next, empty is now.'
+    )
+    stability = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of checks in a row without status change.'
+    )
+
     # This is what subscription for this instance
     subscription = models.ForeignKey(
         Subscription, on_delete=models.SET_NULL,
@@ -127,20 +249,18 @@ class Instance(models.Model):
             return addon.addon_url(self)
         return self.url
 
-    def _change_status(self, status):
-        """Change status."""""
-        if self.status == status:
+    def _transition(self, event: str):
+        """Apply event, the instance is checked on the next run."""
+        machine = InstanceStateMachine()
+        if not machine.transition(self, event):
             return
-
-        self.status = status
-        self.save()
+        self.next_check_at = None
+        self.stability = 0
+        machine.apply(['next_check_at', 'stability'])
 
     def starting_up(self):
-        """Make instance online."""
-        if self.is_lock:
-            return
-        if self.status == InstanceStatus.DEPLOYING:
-            self._change_status(InstanceStatus.STARTING_UP)
+        """Make instance starting up."""
+        self._transition(InstanceEvent.STARTED)
 
     def update_running_activities(self):
         """Update running activities."""
@@ -171,50 +291,60 @@ class Instance(models.Model):
         ).update(order_status=SalesOrderStatus.DEPLOYED.key)
 
     def online(self):
-        """Make instance online."""
-        if self.is_lock:
-            return
-
-        # For deploying, change to starting up
+        """Make instance online, credentials are sent when starting up."""
+        # For deploying, it is started up and online at once
         if self.status == InstanceStatus.DEPLOYING:
             self.status = InstanceStatus.STARTING_UP
-
-        # When starting up, send credential
-        if self.status == InstanceStatus.STARTING_UP:
-            self.send_credentials()
-
-        self._change_status(InstanceStatus.ONLINE)
-        self.update_sales_order()
+        self._transition(InstanceEvent.ONLINE)
 
     def offline(self):
         """Make instance offline."""
-        if self.status in [
-            InstanceStatus.DEPLOYING,
-            InstanceStatus.STARTING_UP,
-            InstanceStatus.DELETING,
-            InstanceStatus.DELETED
-        ]:
-            return
-        if self.is_lock:
-            return
-        self._change_status(InstanceStatus.OFFLINE)
-        self.update_sales_order()
+        self._transition(InstanceEvent.OFFLINE)
 
     def deleting(self):
         """Make instance deleting."""
-        if self.status != InstanceStatus.DELETED:
-            self._change_status(InstanceStatus.DELETING)
+        self._transition(InstanceEvent.DELETE)
 
     def deleted(self):
         """Make instance deleted."""
-        if not self.status == InstanceStatus.DELETING:
-            return
-        self._change_status(InstanceStatus.DELETED)
-        self.update_running_activities()
-        try:
-            self.cancel_subscription()
-        except Exception as e:
-            LogTracker.error(self, f'Cancel subscription : {e}')
+        self._transition(InstanceEvent.DELETED)
+
+    def schedule_check(self, next_check_at=None):
+        """Schedule the next check, empty is on the next run."""
+        self.next_check_at = next_check_at
+        Instance.objects.filter(id=self.id).update(
+            next_check_at=next_check_at
+        )
+
+    def apply_argo_cd_health(self, health: str) -> bool:
+        """Apply health of the Argo CD application.
+
+        The status is changed right away, the checks confirm or repair it.
+        When the health confirms the status, the next check is postponed.
+        Return False if the health is not used.
+        """
+        from geohosting_event.models.webhook import WebhookHealth
+        if health == WebhookHealth.HEALTHY:
+            if self.status == InstanceStatus.DEPLOYING:
+                self.starting_up()
+            elif self.status == InstanceStatus.STARTING_UP:
+                # Credentials are sent by the check when it is online
+                self.schedule_check()
+            elif self.status == InstanceStatus.OFFLINE:
+                self.online()
+            elif self.status == InstanceStatus.ONLINE:
+                self.schedule_check(
+                    timezone.now() + timedelta(
+                        seconds=settings.INSTANCE_CHECK_MAX_INTERVAL_SECONDS
+                    )
+                )
+        elif health == WebhookHealth.DEGRADED:
+            self.offline()
+        elif health == WebhookHealth.MISSING:
+            self.deleted()
+        else:
+            return False
+        return True
 
     @property
     def vault_url(self):
@@ -252,24 +382,27 @@ class Instance(models.Model):
     def is_server_online(self) -> bool:
         """Is server online."""
         try:
-            response = requests.head(self.url_check, allow_redirects=True)
+            response = requests.head(
+                self.url_check, allow_redirects=True,
+                timeout=settings.INSTANCE_CHECK_TIMEOUT
+            )
             return response.status_code in [200]
-        except requests.exceptions.ConnectionError:
+        except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout
+        ):
             return False
         except Exception as e:
             LogTracker.error(self, f'Check instance: {str(e)}')
             raise e
 
     def is_server_reached(self) -> bool:
-        """Is server reached."""
-        try:
-            requests.head(self.url_check, allow_redirects=True)
-        except requests.exceptions.ConnectionError as e:
-            if 'Name or service not known' in f'{e}':
-                return False
-            if 'No address associated with hostname' in f'{e}':
-                return False
-        return True
+        """Is server reached, it is when the name has address."""
+        from geohosting.utils.dns_resolver import DnsResolver, Reachability
+        reachability = DnsResolver().resolve_sync(
+            urlparse(self.url_check).hostname
+        )
+        return reachability not in Reachability.UNREACHED
 
     def checking_server(self):
         """Check server is online or offline."""
@@ -0,0 +1,87 @@
+# coding=utf-8
+"""
+GeoHosting.
+
+.. note:: Probe results and uptime rollups of instances.
+"""
+
+from django.db import models
+
+from geohosting.models.instance import Instance
+
+
+class InstanceProbe(models.Model):
+    """Raw result of a health check, append only.
+
+    The probe covers the time until the next scheduled check,
+    so the uptime is weighted by time and not by number of probes.
+    """
+
+    instance = models.ForeignKey(
+        Instance, on_delete=models.CASCADE
+    )
+    checked_at = models.DateTimeField(db_index=True)
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True
+    )
+    latency_ms = models.FloatField(
+        null=True, blank=True
+    )
+    reachable = models.BooleanField(default=True)
+    online = models.BooleanField(default=False)
+    interval_seconds = models.FloatField(
+        default=0,
+        help_text='Time until the next check.'
+    )
+
+    class Meta:  # noqa: D106
+        indexes = [
+            models.Index(fields=['instance', 'checked_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.instance_id} {self.checked_at}'
+
+
+class InstanceUptimeResolution:
+    """Resolution of instance uptime rollups."""
+
+    FIVE_MINUTES = '5m'
+    HOUR = '1h'
+    DAY = '1d'
+
+
+class InstanceUptime(models.Model):
+    """Uptime and latency of an instance over a period.
+
+    Latencies are kept as histogram, so the percentiles
+    of any range are computed from the rollups.
+    """
+
+    instance = models.ForeignKey(
+        Instance, on_delete=models.CASCADE
+    )
+    resolution = models.CharField(
+        max_length=2,
+        choices=(
+            (InstanceUptimeResolution.FIVE_MINUTES, '5 minutes'),
+            (InstanceUptimeResolution.HOUR, 'Hour'),
+            (InstanceUptimeResolution.DAY, 'Day'),
+        )
+    )
+    period_start = models.DateTimeField()
+    probes = models.PositiveIntegerField(default=0)
+    online_probes = models.PositiveIntegerField(default=0)
+    unreachable_probes = models.PositiveIntegerField(default=0)
+    observed_seconds = models.FloatField(default=0)
+    online_seconds = models.FloatField(default=0)
+    latency_histogram = models.JSONField(default=list)
+
+    class Meta:  # noqa: D106
+        unique_together = ('instance', 'resolution', 'period_start')
+        indexes = [
+            models.Index(fields=['resolution', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f'{self.instance_id} {self.resolution} {self.period_start}'
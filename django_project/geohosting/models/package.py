@@ -8,7 +8,6 @@ import json
 
 from django.db import models
 from django.db.models import JSONField
-from django.utils import timezone
 
 from geohosting.models.product import Product
 from geohosting.utils.functions import (
@@ -195,8 +194,12 @@ class Package(models.Model):
     # ----------------------------------------------------
     # PAYSTACK
     # ----------------------------------------------------
-    def _create_paystack_price(self, email, metadata=None):
-        """Create price id on paystack."""
+    def _create_paystack_price(self, email=None, metadata=None):
+        """Return plan of the price on paystack.
+
+        The plan is shared by the checkouts with the same pricing,
+        so the email is not used anymore.
+        """
         features = []
         paystack_price = None
         try:
@@ -204,14 +207,20 @@ class Package(models.Model):
         except KeyError:
             pass
         if self.price:
-            now = int(timezone.now().timestamp())
+            name = self.name
+            if metadata:
+                name = f'{name} - Discounted'
             paystack_price = create_paystack_price(
-                f'{self.name} - {email} - {now}', self.currency, self.price,
+                name, self.currency, self.price,
                 self.periodicity,
                 features, metadata=metadata
             )
         return paystack_price
 
-    def get_paystack_price_id(self, email, metadata=None):
+    def get_paystack_plan(self, email=None, metadata=None) -> dict:
+        """Return plan on paystack."""
+        return self._create_paystack_price(email, metadata)
+
+    def get_paystack_price_id(self, email=None, metadata=None):
         """Return price id on paystack."""
-        return self._create_paystack_price(email, metadata)["id"]
+        return self.get_paystack_plan(email, metadata)["id"]
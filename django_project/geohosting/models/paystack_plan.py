@@ -0,0 +1,137 @@
+# coding=utf-8
+"""
+GeoHosting.
+
+.. note:: Paystack plan model.
+"""
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+PRICING_FIELDS = ['amount', 'currency', 'interval', 'discount_signature']
+
+
+class PaystackPlan(models.Model):
+    """Plan that is created on paystack.
+
+    The plans are reused for the same pricing, so the checkout does not
+    need to create or list the plans on paystack.
+    """
+
+    plan_id = models.CharField(max_length=256, unique=True)
+    plan_code = models.CharField(max_length=256, unique=True)
+    name = models.CharField(max_length=512)
+    amount = models.PositiveBigIntegerField(
+        help_text='Amount in the subunit of the currency.'
+    )
+    currency = models.CharField(max_length=16)
+    interval = models.CharField(max_length=64)
+    discount_signature = models.CharField(
+        max_length=256, blank=True, default='',
+        help_text='Signature of the discount of the plan, empty for none.'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        help_text='False when the plan is deleted or archived on paystack.'
+    )
+    synced_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:  # noqa
+        # It is also the index of the lookup by the pricing
+        constraints = [
+            models.UniqueConstraint(
+                fields=PRICING_FIELDS,
+                condition=models.Q(is_active=True),
+                name='unique_active_paystack_plan'
+            )
+        ]
+
+    def __str__(self):
+        """Return plan name."""
+        return self.name
+
+    @property
+    def data(self) -> dict:
+        """Return data as the plan of paystack."""
+        return {
+            'id': self.plan_id,
+            'plan_code': self.plan_code,
+            'name': self.name,
+            'amount': self.amount,
+            'currency': self.currency,
+            'interval': self.interval
+        }
+
+    @staticmethod
+    def get_discount_signature(metadata: dict = None) -> str:
+        """Return signature of the discount of metadata."""
+        if not metadata:
+            return ''
+        return ':'.join(
+            f'{metadata.get(key) or ""}' for key in [
+                'discount_percentage', 'discount_amount', 'discount_currency'
+            ]
+        )
+
+    @staticmethod
+    def get_or_create_plan(
+            name: str, currency: str, amount: int, interval: str,
+            features: list, discount_signature: str = ''
+    ) -> 'PaystackPlan':
+        """Return the active plan of the pricing, create it when none."""
+        from geohosting.utils.paystack import create_plan
+        query = dict(
+            amount=amount,
+            currency=currency,
+            interval=interval,
+            discount_signature=discount_signature
+        )
+        plan = PaystackPlan.objects.filter(is_active=True, **query).first()
+        if plan:
+            return plan
+
+        data = create_plan(name, currency, amount, interval, features)
+        try:
+            with transaction.atomic():
+                return PaystackPlan.objects.create(
+                    plan_id=data['id'],
+                    plan_code=data['plan_code'],
+                    name=data['name'],
+                    **query
+                )
+        except IntegrityError:
+            # It is created at the same time, the new one is not used
+            return PaystackPlan.objects.get(is_active=True, **query)
+
+    @staticmethod
+    def sync():
+        """Sync the plans from paystack.
+
+        The plans that are deleted, archived, changed or not found on
+        paystack are not used anymore.
+        """
+        from geohosting.utils.paystack import list_plans
+        plans = {
+            plan.plan_code: plan
+            for plan in PaystackPlan.objects.filter(is_active=True)
+        }
+        now = timezone.now()
+        updated = []
+        for data in list_plans():
+            plan = plans.pop(data['plan_code'], None)
+            if not plan:
+                continue
+            plan.name = data['name']
+            plan.is_active = not (
+                data['is_deleted'] or data['is_archived'] or
+                data['amount'] != plan.amount
+            )
+            plan.synced_at = now
+            updated.append(plan)
+        for plan in plans.values():
+            plan.is_active = False
+            plan.synced_at = now
+            updated.append(plan)
+        PaystackPlan.objects.bulk_update(
+            updated, ['name', 'is_active', 'synced_at']
+        )
@@ -38,6 +38,16 @@ class Product(models.Model):
         null=True,
         blank=True
     )
+    image_etag = models.CharField(
+        max_length=256,
+        null=True, blank=True,
+        help_text='ETag of the image on erpnext.'
+    )
+    image_checksum = models.CharField(
+        max_length=64,
+        null=True, blank=True,
+        help_text='Sha256 checksum of the image content.'
+    )
     available = models.BooleanField(
         default=False
     )
@@ -150,16 +160,16 @@ class Product(models.Model):
             fetch_erpnext_detail_data,
         )
         from geohosting.utils.media import (
-            download_erp_file, save_product_image
+            save_product_image, sync_erp_image
         )
-        from geohosting.views.products import parse_description
+        from geohosting.utils.product_catalog import parse_description
         product_detail = fetch_erpnext_detail_data(
             f'{self.doctype}/{self.name}'
         )
         image_path = product_detail.get('image', '')
         if image_path:
-            self.image = download_erp_file(image_path)
-            self.save()
+            if sync_erp_image(self, image_path, 'product_images'):
+                self.save()
 
         description = product_detail.get('description', None)
         desc = parse_description(description)
@@ -262,6 +272,16 @@ class ProductMedia(models.Model):
     image = models.ImageField(
         upload_to='product_media/'
     )
+    image_etag = models.CharField(
+        max_length=256,
+        null=True, blank=True,
+        help_text='ETag of the image on erpnext.'
+    )
+    image_checksum = models.CharField(
+        max_length=64,
+        null=True, blank=True,
+        help_text='Sha256 checksum of the image content.'
+    )
     title = models.TextField(
         blank=True
     )
@@ -290,6 +310,11 @@ def delete_old_image(sender, instance, **kwargs):
         except Product.DoesNotExist:
             return
         if old_product.image and instance.image != old_product.image:
+            # Files are stored by checksum, so they can be shared
+            if sender.objects.filter(
+                    image=old_product.image.name
+            ).exclude(pk=instance.pk).exists():
+                return
             old_image_path = old_product.image.path
             if os.path.exists(old_image_path):
                 default_storage.delete(old_image_path)
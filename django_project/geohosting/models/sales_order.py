@@ -1,21 +1,24 @@
 from datetime import timedelta, datetime
+from urllib.parse import quote
 
 import stripe
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils.timezone import now
 
 from geohosting.models.company import Company
 from geohosting.models.data_types import PaymentMethod
 from geohosting.models.erp_model import ErpModel
+from geohosting.models.erp_outbox import ErpOutbox
 from geohosting.models.instance import Instance
 from geohosting.models.region import Region
 from geohosting.models.subscription import Subscription
 from geohosting.models.user_profile import UserProfile
 from geohosting.utils.erpnext import (
     add_erp_next_comment, download_erp_file, post_to_erpnext,
-    get_erpnext_data
+    get_cached_erpnext_data
 )
 from geohosting.utils.payment import (
     PaymentGateway, StripePaymentGateway, PaystackPaymentGateway
@@ -104,10 +107,40 @@ class SalesOrderStatus:
         return output
 
 
+class InvoiceStatus:
+    """Status of the invoice pdf."""
+
+    PENDING = 'pending'
+    READY = 'ready'
+
+
+def download_invoice_pdf(document: ErpModel):
+    """Download the pdf of document from erpnext and store it.
+
+    Return the url of stored invoice, None when it is failed.
+    """
+    if not document.erpnext_code:
+        return None
+    path = download_erp_file(
+        '/api/method/frappe.utils.print_format.download_pdf'
+        f'?doctype={quote(document.doc_type)}'
+        f'&name={quote(document.erpnext_code)}',
+        folder='invoices',
+        filename=f'{document.erpnext_code}.pdf'
+    )
+    if not path:
+        return None
+    # Update the field only, saving the model pushes it to erp
+    document.__class__.objects.filter(pk=document.pk).update(invoice=path)
+    document.invoice = path
+    return document.invoice.url
+
+
 class SalesOrder(ErpModel):
     """Sales Order."""
 
     doc_type = "Sales Order"
+    erp_batch_write = False
     package = models.ForeignKey(
         'geohosting.Package',
         null=False,
@@ -236,17 +269,26 @@ class SalesOrder(ErpModel):
         )
 
     def save(self, *args, **kwargs):
-        """Save model."""
-        super(SalesOrder, self).save(*args, **kwargs)
-        # Push to erp
-        result = self.post_to_erpnext()
-        if result['status'] != 'success':
-            return
-
-        # Check if order status is waiting configuration
+        """Save model.
+
+        The push to erp is recorded in the outbox and done by celery,
+        the order is deployed after the push (see erp_outbox_pushed).
+        """
+        with transaction.atomic():
+            super(SalesOrder, self).save(*args, **kwargs)
+            if getattr(self, '_erp_outbox_pushing', False):
+                return
+            ErpOutbox.enqueue(self)
+
+    def erp_outbox_pushed(self):
+        """Deploy when the order is waiting configuration.
+
+        It needs the erpnext code, that is created by the push.
+        """
         order_status_obj = self.sales_order_status_obj
         if order_status_obj == SalesOrderStatus.WAITING_CONFIGURATION:
             self.auto_deploy()
+        self.request_invoice()
 
     def post_to_erpnext(self):
         """Post data to erpnext."""
@@ -340,7 +382,7 @@ class SalesOrder(ErpModel):
         if taxes_and_charges:
             payload['taxes_and_charges'] = taxes_and_charges.erpnext_code
             payload['tax_category'] = taxes_and_charges.tax_category
-            data = get_erpnext_data(
+            data = get_cached_erpnext_data(
                 TaxesAndCharges.doc_type,
                 taxes_and_charges.erpnext_code
             )
@@ -411,35 +453,87 @@ class SalesOrder(ErpModel):
                     SalesOrderStatus.WAITING_CONFIGURATION
                 )
 
+    @property
+    def invoice_document(self):
+        """Return the document that the invoice pdf is generated from."""
+        if (
+                self.erp_company and
+                self.erp_company.invoice_from_sales_invoice
+        ):
+            # Use the sales order invoice
+            invoice = self.salesorderinvoice_set.first()
+            if invoice:
+                return invoice
+        return self
+
     @property
     def invoice_url(self):
-        """Return invoice url when the status is not payment anymore."""
-        if self.sales_order_status_obj != SalesOrderStatus.WAITING_PAYMENT:
-            if (
-                    self.erp_company and
-                    self.erp_company.invoice_from_sales_invoice
-            ):
-                # Return using invoice from the sales order invoice
-                invoice = self.salesorderinvoice_set.first()
-                if invoice:
-                    return invoice.invoice_url
-
-            # Return using invoice from the sales order
-            if self.invoice:
-                return self.invoice.url
-            else:
-                image_file = download_erp_file(
-                    '/api/method/frappe.utils.print_format.download_pdf'
-                    f'?doctype=Sales%20Order&name={self.erpnext_code}',
-                    folder='invoices',
-                    filename=f'{self.erpnext_code}.pdf'
-                )
-                if image_file:
-                    self.invoice = image_file
-                    self.save()
-                    return self.invoice.url
+        """Return stored invoice url when the status is not payment anymore.
+
+        The pdf is never downloaded here, it is done by materialise_invoice.
+        """
+        if self.sales_order_status_obj == SalesOrderStatus.WAITING_PAYMENT:
+            return None
+        document = self.invoice_document
+        if document.invoice:
+            return document.invoice.url
         return None
 
+    @property
+    def invoice_status(self):
+        """Return status of the invoice pdf, None when it is not needed."""
+        if self.sales_order_status_obj == SalesOrderStatus.WAITING_PAYMENT:
+            return None
+        if self.invoice_url:
+            return InvoiceStatus.READY
+        return InvoiceStatus.PENDING
+
+    def materialise_invoice(self):
+        """Generate the invoice pdf and store it.
+
+        Return the url of stored invoice, None when it is not ready.
+        """
+        if self.sales_order_status_obj == SalesOrderStatus.WAITING_PAYMENT:
+            return None
+        document = self.invoice_document
+        if document.invoice:
+            return document.invoice.url
+        if not document.erpnext_code:
+            document.post_to_erpnext()
+        return download_invoice_pdf(document)
+
+    def request_invoice(self):
+        """Materialise the invoice pdf in background when it is pending."""
+        from geohosting.tasks.invoice import materialise_invoice
+        if not self.erpnext_code:
+            return
+        if self.invoice_status != InvoiceStatus.PENDING:
+            return
+        transaction.on_commit(lambda: materialise_invoice.delay(self.id))
+
+    @staticmethod
+    def invoice_pending_orders():
+        """Return orders that have left payment, but have no invoice pdf."""
+        from geohosting.models.erp_company import ErpCompany
+        no_file = Q(invoice__isnull=True) | Q(invoice='')
+        from_invoice = Q(
+            payment_method__in=ErpCompany.objects.filter(
+                invoice_from_sales_invoice=True
+            ).values('payment_method'),
+            id__in=SalesOrderInvoice.objects.values('sales_order_id')
+        )
+        invoice_no_file = SalesOrderInvoice.objects.filter(
+            no_file
+        ).values('sales_order_id')
+        return SalesOrder.objects.exclude(
+            order_status=SalesOrderStatus.WAITING_PAYMENT.key
+        ).exclude(
+            Q(erpnext_code__isnull=True) | Q(erpnext_code='')
+        ).filter(
+            Q(from_invoice, id__in=invoice_no_file) |
+            Q(~from_invoice, no_file)
+        )
+
     def auto_deploy(self):
         """Change status to deployment and do deployment."""
         from geohosting.forms.activity.create_instance import (
@@ -583,6 +677,7 @@ class SalesOrderInvoice(ErpModel):
     """Sales Order."""
 
     doc_type = "Sales Invoice"
+    erp_batch_write = False
     sales_order = models.ForeignKey(
         SalesOrder,
         on_delete=models.CASCADE
@@ -626,7 +721,7 @@ class SalesOrderInvoice(ErpModel):
                         is_active=True
                     ).first()
                     if term:
-                        data = get_erpnext_data(
+                        data = get_cached_erpnext_data(
                             ErpPaymentTermTemplate.doc_type,
                             term.erpnext_code
                         )
@@ -645,22 +740,14 @@ class SalesOrderInvoice(ErpModel):
 
     @property
     def invoice_url(self):
-        """Return invoice url when the status is not payment anymore."""
+        """Return stored invoice url when the status is not payment anymore.
+
+        The pdf is downloaded by SalesOrder.materialise_invoice.
+        """
         if (
                 self.sales_order.sales_order_status_obj !=
                 SalesOrderStatus.WAITING_PAYMENT
         ):
             if self.invoice:
                 return self.invoice.url
-            else:
-                image_file = download_erp_file(
-                    '/api/method/frappe.utils.print_format.download_pdf'
-                    f'?doctype=Sales%20Invoice&name={self.erpnext_code}',
-                    folder='invoices',
-                    filename=f'{self.erpnext_code}.pdf'
-                )
-                if image_file:
-                    self.invoice = image_file
-                    self.save()
-                    return self.invoice.url
         return None
@@ -1,6 +1,8 @@
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -41,6 +43,23 @@ class Subscription(models.Model):
         help_text='Payment id on the payment gateway, it needs for paystack.',
         null=True, blank=True
     )
+    synced_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text='Last time it is synced from the payment gateway.'
+    )
+    gateway_event_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text=(
+            'Creation time of the last subscription event of the payment '
+            'gateway that is applied, older events are skipped.'
+        )
+    )
+
+    class Meta:  # noqa
+        indexes = [
+            models.Index(fields=['is_active', 'current_period_end']),
+            models.Index(fields=['is_active', 'synced_at']),
+        ]
 
     def __str__(self):
         """Return subscription id."""
@@ -63,16 +82,67 @@ class Subscription(models.Model):
     def cancel_subscription(self):
         """Cancel subscription."""
         self.payment_gateway.cancel_subscription()
+        self.invalidate_detail()
         self.sync_subscription()
 
     def sync_subscription(self):
         """Sync subscription."""
         self.update_payment()
         self.payment_gateway.subscription(self.customer)
+        self.check_expiry()
 
+    def check_expiry(self):
+        """Check expiry of the instances, it does not call the gateway."""
         for instance in self.instance_set.all():
             instance.is_expired  # noqa
 
+    @staticmethod
+    def renewal_window() -> models.Q:
+        """Return filter of the subscriptions that are changing state.
+
+        They are near or past the period end and inside the grace period,
+        plus one window after it, so the expiry is applied.
+        """
+        now = timezone.now()
+        window = timedelta(
+            seconds=settings.SUBSCRIPTION_RENEWAL_WINDOW_SECONDS
+        )
+        grace_period = timedelta(days=Preferences.load().grace_period_days)
+        return models.Q(
+            current_period_end__lte=now + window,
+            current_period_end__gte=now - grace_period - window
+        )
+
+    @staticmethod
+    def renewal_due(query):
+        """Return subscriptions of the query in the renewal window.
+
+        They are synced at most every SUBSCRIPTION_DUE_SYNC_SECONDS,
+        the webhooks keep them up to date in between.
+        """
+        synced_at = timezone.now() - timedelta(
+            seconds=settings.SUBSCRIPTION_DUE_SYNC_SECONDS
+        )
+        return query.filter(Subscription.renewal_window()).filter(
+            models.Q(synced_at__isnull=True) |
+            models.Q(synced_at__lt=synced_at)
+        )
+
+    @staticmethod
+    def rotation_due(query):
+        """Return the rest of the query that are stale, the oldest first.
+
+        The subscriptions outside the renewal window are synced by
+        the webhooks, so they are only rotated through slowly.
+        """
+        stale_at = timezone.now() - timedelta(
+            seconds=settings.SUBSCRIPTION_RECONCILE_SECONDS
+        )
+        return query.exclude(Subscription.renewal_window()).filter(
+            models.Q(synced_at__isnull=True) |
+            models.Q(synced_at__lt=stale_at)
+        ).order_by(models.F('synced_at').asc(nulls_first=True))
+
     @property
     def current_expiry_at(self):
         """Return hard deadline time."""
@@ -93,13 +163,35 @@ class Subscription(models.Model):
             return False
         return timezone.now() >= self.current_expiry_at
 
+    @property
+    def detail_cache_key(self) -> str:
+        """Return cache key of the remote detail data."""
+        return f'subscription-detail:{self.id}'
+
+    def invalidate_detail(self):
+        """Remove cached remote detail data."""
+        cache.delete(self.detail_cache_key)
+
     @property
     def detail(self) -> dict:
-        """Remote detail data."""
-        if self.payment_gateway.get_subscription_data():
-            return self.payment_gateway.get_subscription_data().json
-        else:
-            return {}
+        """Remote detail data.
+
+        It is cached for SUBSCRIPTION_DETAIL_CACHE_TIMEOUT and it is
+        invalidated when the subscription is saved from the gateway.
+        Reading it does not save the subscription.
+        """
+        detail = cache.get(self.detail_cache_key)
+        if detail is not None:
+            return detail
+        subscription_data = self.payment_gateway.get_subscription_data(
+            save=False
+        )
+        detail = subscription_data.json if subscription_data else {}
+        cache.set(
+            self.detail_cache_key, detail,
+            settings.SUBSCRIPTION_DETAIL_CACHE_TIMEOUT
+        )
+        return detail
 
     def update_payment(self):
         """Update payment for paystack."""
@@ -1,12 +1,16 @@
 # models.py
-from datetime import datetime
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils.timezone import make_aware, now
 
 from core.models.preferences import Preferences
 from geohosting.models import UserProfile
-from geohosting.models.erp_model import ErpModel
+from geohosting.models.erp_model import (
+    ErpModel, ErpSyncState, parse_erp_datetime
+)
 from geohosting.utils.erpnext import (
     fetch_erpnext_data, upload_attachment_to_erp
 )
@@ -100,75 +104,185 @@ class Ticket(ErpModel):
         }
 
     @classmethod
-    def sync_data(cls):
+    def erp_sync_filters(cls) -> list:
+        """Filters of erpnext rows that are synced to this model."""
+        pref = Preferences.load()
+        return [
+            ["project", "=", pref.erpnext_project_code],
+        ]
+
+    @classmethod
+    def erp_delete_missing_rows(cls, erpnext_codes: set, started_at):
+        """Delete tickets that are deleted on erpnext.
+
+        Recently created tickets are kept, as they might be pushed
+        to erpnext after the rows were requested.
+        The missing codes are checked again on erpnext before deleting,
+        so a ticket that is skipped by the paging is not deleted.
+        """
+        missing_codes = set(
+            cls.objects.filter(
+                erpnext_code__isnull=False,
+                created_at__lt=started_at - timedelta(
+                    minutes=settings.ERPNEXT_SYNC_DELETE_GRACE_MINUTES
+                )
+            ).exclude(
+                erpnext_code__in=erpnext_codes
+            ).values_list('erpnext_code', flat=True)
+        )
+        if not missing_codes:
+            return
+        missing_codes -= cls.erp_existing_codes(missing_codes)
+        cls.objects.filter(erpnext_code__in=missing_codes).delete()
+
+    @classmethod
+    def erp_existing_codes(cls, erpnext_codes: set) -> set:
+        """Return the erpnext codes that still exist on erpnext.
+
+        Raises:
+            ValueError: When the issues can't be fetched.
+        """
+        erpnext_codes = sorted(erpnext_codes)
+        batch_size = settings.ERPNEXT_NAME_LOOKUP_BATCH_SIZE
+        existing = set()
+        for idx in range(0, len(erpnext_codes), batch_size):
+            rows = fetch_erpnext_data(
+                doctype="Issue",
+                filters=[
+                    ["name", "in", erpnext_codes[idx:idx + batch_size]]
+                ],
+                fields=["name"]
+            )
+            if not isinstance(rows, list):
+                raise ValueError("Failed to fetch data from ERPNext")
+            existing.update(row['name'] for row in rows)
+        return existing
+
+    @classmethod
+    def bulk_sync_tickets(cls, erp_tickets: list):
+        """Create or update tickets from erpnext issues in bulk.
+
+        New issues are created as tickets.
+        For the existing one, just the status and updated_at of
+        the last ticket with the erpnext code are updated when changed.
+        """
+        erp_tickets = {
+            erp_ticket['name']: erp_ticket for erp_ticket in erp_tickets
+            if erp_ticket.get('name')
+        }
+        customers = {
+            erp_ticket.get('customer') for erp_ticket in erp_tickets.values()
+            if erp_ticket.get('customer')
+        }
+        users = dict(
+            UserProfile.objects.filter(
+                erpnext_code__in=customers
+            ).values_list('erpnext_code', 'user_id')
+        )
+        existing = cls.existing_rows_by_erpnext_code(erp_tickets.keys())
+
+        created = []
+        updated = []
+        for erpnext_code, erp_ticket in erp_tickets.items():
+            django_status = status_erp.get(
+                erp_ticket.get('status'), 'open'
+            )
+            updated_at = make_aware(
+                parse_erp_datetime(erp_ticket.get('modified'))
+            )
+            tickets = existing.get(erpnext_code)
+            if not tickets:
+                created.append(
+                    Ticket(
+                        erpnext_code=erpnext_code,
+                        user_id=users.get(erp_ticket.get('customer')),
+                        customer=erp_ticket.get('raised_by'),
+                        status=django_status,
+                        subject=erp_ticket.get('subject'),
+                        details=erp_ticket.get('description'),
+                        created_at=make_aware(
+                            parse_erp_datetime(erp_ticket.get('creation'))
+                        ),
+                        updated_at=updated_at
+                    )
+                )
+                continue
+
+            ticket = tickets[-1]
+            if (
+                    ticket.status != django_status or
+                    ticket.updated_at != updated_at
+            ):
+                ticket.status = django_status
+                ticket.updated_at = updated_at
+                updated.append(ticket)
+
+        batch_size = settings.ERPNEXT_SYNC_BATCH_SIZE
+        with transaction.atomic():
+            if created:
+                # Timestamps are auto_now_add,
+                # so they are overwritten on insert and need to be set back.
+                timestamps = [
+                    (ticket.created_at, ticket.updated_at)
+                    for ticket in created
+                ]
+                created = Ticket.objects.bulk_create(
+                    created, batch_size=batch_size
+                )
+                for ticket, (created_at, updated_at) in zip(
+                        created, timestamps
+                ):
+                    ticket.created_at = created_at
+                    ticket.updated_at = updated_at
+                Ticket.objects.bulk_update(
+                    created, ['created_at', 'updated_at'],
+                    batch_size=batch_size
+                )
+            if updated:
+                Ticket.objects.bulk_update(
+                    updated, ['status', 'updated_at'],
+                    batch_size=batch_size
+                )
+        return len(created), len(updated)
+
+    @classmethod
+    def sync_data(cls, full: bool = None):
         """Sync data from erpnext to django that has erpnext code.
 
+        Only the issues that are modified after the last sync are requested,
+        except on the periodic full sync that also reconciles deleted issues.
+
         Note:
             Erp will reuse the used previous
             erpnext_code if the ticket is deleted.
         """
-        pref = Preferences.load()
-        filters = [
-            ["project", "=", pref.erpnext_project_code],
-        ]
         try:
+            started_at = now()
+            state = ErpSyncState.for_model(cls)
+            if full is None:
+                full = state.is_full_sync_due
             erp_tickets = fetch_erpnext_data(
-                doctype="Issue", filters=filters,
+                doctype="Issue",
+                filters=cls.erp_sync_filters() + state.filters(full),
                 fields=[
                     "name", "subject", "description", "status", "owner",
-                    "modified", "customer", "raised_by"
-                ]
+                    "creation", "modified", "customer", "raised_by"
+                ],
+                order_by=state.order_by(full)
             )
             if not isinstance(erp_tickets, list):
                 raise ValueError("Failed to fetch data from ERPNext")
 
-            for erp_ticket in erp_tickets:
-                django_status = status_erp.get(
-                    erp_ticket.get('status'), 'open'
+            cls.bulk_sync_tickets(erp_tickets)
+            if full and erp_tickets:
+                cls.erp_delete_missing_rows(
+                    {
+                        erp_ticket['name'] for erp_ticket in erp_tickets
+                        if erp_ticket.get('name')
+                    },
+                    started_at
                 )
-                customer = erp_ticket.get('customer')
-                user = None
-                if customer:
-                    try:
-                        user = UserProfile.objects.get(
-                            erpnext_code=customer
-                        ).user
-                    except UserProfile.DoesNotExist:
-                        pass
-                if erp_ticket.get('name'):
-                    updated_at = datetime.strptime(
-                        erp_ticket.get('modified'),
-                        "%Y-%m-%d %H:%M:%S.%f"
-                    )
-
-                    ticket = Ticket.objects.filter(
-                        erpnext_code=erp_ticket.get('name')
-                    ).last()
-                    is_created = False
-                    if not ticket:
-                        ticket, _ = Ticket.objects.get_or_create(
-                            erpnext_code=erp_ticket.get('name'),
-                            defaults={
-                                'user': user,
-                                'customer': erp_ticket.get('raised_by'),
-                                'status': django_status,
-                                'subject': erp_ticket.get('subject'),
-                                'details': erp_ticket.get('description'),
-                                'updated_at': updated_at
-                            }
-                        )
-                        is_created = _
-
-                    ticket.status = django_status
-                    if is_created:
-                        created_at = datetime.strptime(
-                            erp_ticket.get('creation'),
-                            "%Y-%m-%d %H:%M:%S.%f"
-                        )
-                        ticket.created_at = created_at
-                    ticket.updated_at = updated_at
-                    ticket.save()
-
+            state.finish(erp_tickets, full)
         except Exception as e:
             print(f"Error fetching or updating tickets from ERPNext: {e}")
 
@@ -29,6 +29,8 @@ class UserBillingInformation(BillingInformation):
 class UserProfile(ErpModel):
     """User profile model."""
 
+    erp_batch_write = False
+
     user = models.OneToOneField(
         User, on_delete=models.CASCADE
     )
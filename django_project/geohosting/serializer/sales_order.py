@@ -17,6 +17,7 @@ class SalesOrderSerializer(serializers.ModelSerializer):
     package = serializers.SerializerMethodField()
     order_status = serializers.SerializerMethodField()
     invoice_url = serializers.SerializerMethodField()
+    invoice_status = serializers.SerializerMethodField()
     company_name = serializers.SerializerMethodField()
     agreements = serializers.SerializerMethodField()
 
@@ -25,9 +26,13 @@ class SalesOrderSerializer(serializers.ModelSerializer):
         return ProductPackageSerializer(obj.package).data
 
     def get_invoice_url(self, obj: SalesOrder):
-        """Return package."""
+        """Return stored invoice url."""
         return obj.invoice_url
 
+    def get_invoice_status(self, obj: SalesOrder):
+        """Return invoice status, pending when the pdf is not stored yet."""
+        return obj.invoice_status
+
     def get_order_status(self, obj: SalesOrder):
         """Return package."""
         obj.update_payment_status()
@@ -46,6 +46,9 @@ class SubscriptionDetailSerializer(SubscriptionSerializer):
     detail = serializers.SerializerMethodField()
 
     def get_detail(self, obj: Subscription):
-        """Return is detail."""
-        obj.update_payment()
+        """Return is detail.
+
+        It is read from the cache, the payment is updated by the webhook
+        and the scheduled sync.
+        """
         return obj.detail
@@ -63,6 +63,9 @@ const OrderDetail: React.FC = () => {
               </Link>
             </Box>
           )}
+          {orderDetail.invoice_status === 'pending' && (
+            <Text mt={4}>Invoice is being generated.</Text>
+          )}
         </Box>
       ) : (
         <Box>No order details found</Box>
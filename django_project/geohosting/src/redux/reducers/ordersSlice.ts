@@ -18,6 +18,7 @@ export interface SalesOrder {
   order_status: string;
   payment_method: string;
   invoice_url: string;
+  invoice_status: 'pending' | 'ready' | null;
   product: Product;
   package: Package;
   app_name: string;
@@ -1,4 +1,6 @@
 from geohosting.tasks.erp import sync_erp_data
+from geohosting.tasks.health import probe_dependencies_task
 from geohosting.tasks.instances import check_instances
+from geohosting.tasks.invoice import materialise_pending_invoices
 from geohosting.tasks.products import fetch_products_from_erpnext_task
 from geohosting.tasks.subscription import sync_subscriptions
@@ -2,12 +2,14 @@ import logging
 
 from core.celery import app
 from geohosting.models import Coupon
+from geohosting.utils.gateway_rate_limit import batch_priority
 from geohosting_event.models import LogTracker
 
 logger = logging.getLogger(__name__)
 
 
 @app.task(name='sync_coupon')
+@batch_priority()
 def sync_stripe_coupon(id):
     """Sync stripe coupon."""
     try:
@@ -4,22 +4,35 @@ from celery import shared_task
 from django.apps import apps
 
 from core.celery import app
+from geohosting.models.erp_outbox import ErpOutbox
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
 def sync_erp_data(class_name):
-    """Sync erp data from ERPNEXT API."""
+    """Sync all erp data from ERPNEXT API."""
     if class_name:
         Model = apps.get_model('geohosting', class_name)
-        Model.sync_data()
+        Model.sync_data(full=True)
 
 
 @app.task(name='sync_all_erp_data')
 def sync_all_erp_data():
-    """Sync erp data from ERPNEXT API."""
+    """Sync changed erp data from ERPNEXT API."""
     for class_name in ['Ticket']:
         logger.info('Syncing erp data for {}'.format(class_name))
         Model = apps.get_model('geohosting', class_name)
         Model.sync_data()
+
+
+@shared_task
+def push_erp_outbox(content_type_id, object_id):
+    """Push the pending erp outbox of an object to ERPNEXT API."""
+    ErpOutbox.push_object(content_type_id, object_id)
+
+
+@app.task(name='drain_erp_outbox')
+def drain_erp_outbox():
+    """Push the due erp outbox to ERPNEXT API, including retries."""
+    ErpOutbox.drain()
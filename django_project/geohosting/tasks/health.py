@@ -0,0 +1,10 @@
+from core.celery import app
+from geohosting.utils.gateway_rate_limit import batch_priority
+from geohosting.utils.health import probe_dependencies
+
+
+@app.task(name='probe_dependencies')
+@batch_priority()
+def probe_dependencies_task():
+    """Probe the health of external dependencies."""
+    probe_dependencies()
@@ -1,11 +1,65 @@
+from celery import group, shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
 from core.celery import app
 from geohosting.models import Instance, InstanceStatus
+from geohosting.utils import instance_checker, instance_uptime
+
+
+def check_instances_lock(shard: int, shards: int):
+    """Return lock key of a shard."""
+    return f'check-instances:{shards}:{shard}'
 
 
 @app.task(name='check_instances')
 def check_instances():
-    """Check instances."""
-    for instance in Instance.objects.exclude(
-            status=InstanceStatus.DELETED
-    ):
-        instance.checking_server()
+    """Dispatch the shards of instance checks.
+
+    A shard that is still in flight from the previous run is skipped.
+    """
+    shards = settings.INSTANCE_CHECK_SHARDS
+    tasks = [
+        check_instances_shard.s(shard, shards)
+        for shard in range(shards)
+        if cache.add(
+            check_instances_lock(shard, shards), True,
+            settings.INSTANCE_CHECK_LOCK_SECONDS
+        )
+    ]
+    if tasks:
+        group(tasks).apply_async()
+    return len(tasks)
+
+
+@shared_task
+def check_instances_shard(shard: int, shards: int):
+    """Check the due instances of a shard concurrently."""
+    try:
+        instance_checker.check_instances(
+            Instance.objects.exclude(
+                status=InstanceStatus.DELETED
+            ).filter(
+                Q(next_check_at__isnull=True) |
+                Q(next_check_at__lte=timezone.now())
+            ).annotate(
+                shard=Mod('id', shards)
+            ).filter(shard=shard)
+        )
+    finally:
+        cache.delete(check_instances_lock(shard, shards))
+
+
+@app.task(name='rollup_instance_uptime')
+def rollup_instance_uptime(resolution: str):
+    """Roll up uptime of instances of a resolution."""
+    return instance_uptime.rollup_instance_uptime(resolution)
+
+
+@app.task(name='purge_instance_uptime')
+def purge_instance_uptime():
+    """Delete uptime data that are older than the retention."""
+    instance_uptime.purge_instance_uptime()
@@ -0,0 +1,30 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+
+from core.celery import app
+from geohosting.models.sales_order import SalesOrder
+
+
+@shared_task
+def materialise_invoice(sales_order_id):
+    """Generate and store the invoice pdf of sales order."""
+    lock = f'invoice-pdf:{sales_order_id}'
+    if not cache.add(lock, True, settings.INVOICE_PDF_LOCK_SECONDS):
+        return
+    try:
+        SalesOrder.objects.get(id=sales_order_id).materialise_invoice()
+    except SalesOrder.DoesNotExist:
+        pass
+    finally:
+        cache.delete(lock)
+
+
+@app.task(name='materialise_pending_invoices')
+def materialise_pending_invoices():
+    """Materialise invoices that are missed, e.g. the download failed."""
+    orders = SalesOrder.invoice_pending_orders().order_by('-id')
+    for sales_order_id in orders.values_list(
+            'id', flat=True
+    )[:settings.INVOICE_PDF_BATCH_SIZE]:
+        materialise_invoice.delay(sales_order_id)
@@ -1,14 +1,119 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
 from core.celery import app
-from geohosting.models import Subscription
-from geohosting_event.models import LogTracker
+from geohosting.models import PaystackPlan, Subscription
+from geohosting.models.data_types import PaymentMethod
+from geohosting.utils.gateway_rate_limit import batch_priority
+from geohosting.utils.payment_webhook import TRANSIENT_ERRORS
+from geohosting_event.models import LogTracker, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+
+def sync_subscription_lock(subscription_id: int):
+    """Return lock key of the sync of a subscription."""
+    return f'sync-subscription:{subscription_id}'
 
 
 @app.task(name='sync_subscriptions')
+@batch_priority()
 def sync_subscriptions():
-    """Sync subscription."""
-    print('SYNC_SUBSCRIPTIONS')
-    for subscription in Subscription.objects.filter(is_active=True):
+    """Schedule the sync of the due subscriptions.
+
+    The subscriptions are kept up to date by the gateway webhooks,
+    so only the ones in the renewal window and a batch of the stale
+    ones are synced, each in its own task. When there are many due
+    stripe subscriptions, they are synced from the subscription list
+    in one pass.
+    """
+    from geohosting.utils.subscription import StripeSubscriptionGateway
+    subscriptions = Subscription.objects.filter(is_active=True)
+    due = list(Subscription.renewal_due(subscriptions)) + list(
+        Subscription.rotation_due(subscriptions)[
+            :settings.SUBSCRIPTION_ROTATION_BATCH_SIZE
+        ]
+    )
+
+    stripe_due = [
+        subscription for subscription in due
+        if subscription.payment_method == PaymentMethod.STRIPE
+    ]
+    if len(stripe_due) >= settings.STRIPE_BULK_RECONCILE_MIN:
+        try:
+            not_found = set(
+                subscription.id for subscription in
+                StripeSubscriptionGateway.reconcile(stripe_due)
+            )
+            due = [
+                subscription for subscription in due
+                if subscription.payment_method != PaymentMethod.STRIPE or
+                subscription.id in not_found
+            ]
+        except Exception as e:
+            logger.error(e)
+
+    scheduled_at = timezone.now().timestamp()
+    for subscription in due:
+        sync_subscription.delay(subscription.id, scheduled_at)
+    return len(due)
+
+
+@app.task(name='sync_subscription')
+@batch_priority()
+def sync_subscription(subscription_id: int, scheduled_at: float = None):
+    """Sync a subscription from the gateway.
+
+    It is skipped when the sync is still running or the subscription
+    is synced after it is scheduled, e.g. by the webhook.
+    """
+    lock = sync_subscription_lock(subscription_id)
+    if not cache.add(lock, True, settings.SUBSCRIPTION_SYNC_LOCK_SECONDS):
+        return
+    try:
+        subscription = Subscription.objects.get(id=subscription_id)
+        if (
+                scheduled_at and subscription.synced_at and
+                subscription.synced_at.timestamp() >= scheduled_at
+        ):
+            return
         try:
             subscription.sync_subscription()
         except Exception as e:
             LogTracker.error(subscription, f'{e}')
+    except Subscription.DoesNotExist:
+        pass
+    finally:
+        cache.delete(lock)
+
+
+@app.task(
+    name='process_payment_event',
+    autoretry_for=TRANSIENT_ERRORS,
+    retry_backoff=True,
+    retry_backoff_max=settings.PAYMENT_EVENT_RETRY_BACKOFF_MAX_SECONDS,
+    max_retries=settings.PAYMENT_EVENT_MAX_RETRIES
+)
+@batch_priority()
+def process_payment_event(event_id: int, force: bool = False):
+    """Apply payment event to the subscription and sales order.
+
+    The event that fails with a transient error, e.g. no gateway budget
+    for batch requests, is retried with backoff.
+    """
+    from geohosting.utils.payment_webhook import process_payment_event
+    try:
+        event = PaymentEvent.objects.get(id=event_id)
+    except PaymentEvent.DoesNotExist:
+        return
+    process_payment_event(event, force=force)
+
+
+@app.task(name='sync_paystack_plans')
+@batch_priority()
+def sync_paystack_plans():
+    """Sync the paystack plan registry from paystack."""
+    PaystackPlan.sync()
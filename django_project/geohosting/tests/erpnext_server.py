@@ -0,0 +1,427 @@
+"""Fake ERPNext (Frappe) REST server for tests and benchmarks.
+
+It keeps the documents in memory and implements the routes that are used
+by geohosting: resource list/get/post/put with filters and pagination,
+insert_many, bulk_update, make_sales_invoice, upload_file, download_pdf
+and add_comment.
+
+Use it in process:
+
+    with FakeErpNextServer() as server:
+        server.add('Item', {'name': 'Item 1'})
+        with override_settings(ERPNEXT_BASE_URL=server.url):
+            ...
+
+or run it on localhost:
+
+    python geohosting/tests/erpnext_server.py --port 8001 --latency 0.05
+"""
+import argparse
+import fnmatch
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+ERP_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DEFAULT_PAGE_LENGTH = 20
+
+
+def erp_now():
+    """Return now in erpnext format."""
+    return datetime.now().strftime(ERP_DATETIME_FORMAT)
+
+
+def match_filter(doc: dict, field: str, operator: str, value) -> bool:
+    """Return if doc matches the frappe filter."""
+    doc_value = doc.get(field)
+    operator = operator.lower()
+    if operator == '=':
+        return doc_value == value
+    if operator == '!=':
+        return doc_value != value
+    if operator in ('in', 'not in'):
+        if isinstance(value, str):
+            value = [val.strip() for val in value.split(',')]
+        found = doc_value in value
+        return found if operator == 'in' else not found
+    if operator in ('like', 'not like'):
+        pattern = f'{value}'.replace('%', '*')
+        found = fnmatch.fnmatch(f'{doc_value}', pattern)
+        return found if operator == 'like' else not found
+    if doc_value is None:
+        return False
+    if operator == '>':
+        return doc_value > value
+    if operator == '>=':
+        return doc_value >= value
+    if operator == '<':
+        return doc_value < value
+    if operator == '<=':
+        return doc_value <= value
+    raise ValueError(f'Operator {operator} is not supported')
+
+
+def parse_filters(filters) -> list:
+    """Return filters as list of (field, operator, value)."""
+    if not filters:
+        return []
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    if isinstance(filters, dict):
+        return [(key, '=', value) for key, value in filters.items()]
+    output = []
+    for _filter in filters:
+        if len(_filter) == 4:
+            _filter = _filter[1:]
+        output.append(tuple(_filter))
+    return output
+
+
+class FakeErpNext:
+    """In memory documents of fake ERPNext.
+
+    :param latency: Seconds that every request waits.
+    :param error_rate: Probability of a request to fail with 500.
+    :param pdf_size: Size of the downloaded pdf in bytes.
+    """
+
+    def __init__(
+            self, latency: float = 0, error_rate: float = 0,
+            pdf_size: int = 1024, seed: int = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.pdf_size = pdf_size
+        self.random = random.Random(seed)
+        self.docs = defaultdict(dict)
+        self.requests = []
+        self.errors = []
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def fail_next(self, *statuses: int):
+        """Fail the next requests with the statuses."""
+        with self.lock:
+            self.errors.extend(statuses)
+
+    # ---------------------------------------
+    # Documents
+    # ---------------------------------------
+    def next_name(self, doctype: str) -> str:
+        """Return next name of naming series of the doctype."""
+        with self.lock:
+            self.counters[doctype] += 1
+            prefix = ''.join(
+                word[0] for word in doctype.split(' ')
+            ).upper()
+            return f'{prefix}-{self.counters[doctype]:05d}'
+
+    def add(self, doctype: str, doc: dict) -> dict:
+        """Add or replace a document."""
+        doc = dict(doc)
+        doc['doctype'] = doctype
+        if not doc.get('name'):
+            doc['name'] = self.next_name(doctype)
+        now = erp_now()
+        doc.setdefault('creation', now)
+        doc.setdefault('modified', now)
+        doc.setdefault('docstatus', 0)
+        self.docs[doctype][doc['name']] = doc
+        return doc
+
+    def add_many(self, doctype: str, docs: list) -> list:
+        """Add documents."""
+        return [self.add(doctype, doc) for doc in docs]
+
+    def get(self, doctype: str, name: str) -> dict:
+        """Return a document."""
+        return self.docs[doctype].get(name)
+
+    def update(self, doctype: str, name: str, data: dict) -> dict:
+        """Update a document."""
+        doc = self.docs[doctype][name]
+        data = {
+            key: value for key, value in data.items()
+            if key not in ('name', 'doctype', 'docname')
+        }
+        doc.update(data)
+        doc['modified'] = erp_now()
+        return doc
+
+    def list(
+            self, doctype: str, filters=None, fields=None,
+            limit_start: int = 0, limit_page_length: int = None,
+            order_by: str = None
+    ) -> list:
+        """Return list of documents like frappe.get_list."""
+        filters = parse_filters(filters)
+        docs = [
+            doc for doc in self.docs[doctype].values()
+            if all(match_filter(doc, *_filter) for _filter in filters)
+        ]
+        field, _, direction = (order_by or 'modified desc').partition(' ')
+        docs.sort(
+            key=lambda doc: (doc.get(field) is None, doc.get(field) or ''),
+            reverse=direction.strip().lower() != 'asc'
+        )
+        if limit_page_length is None:
+            limit_page_length = DEFAULT_PAGE_LENGTH
+        if limit_page_length:
+            docs = docs[limit_start:limit_start + limit_page_length]
+        else:
+            docs = docs[limit_start:]
+        if fields and '*' not in fields:
+            docs = [
+                {field: doc.get(field) for field in fields} for doc in docs
+            ]
+        return docs
+
+    # ---------------------------------------
+    # Methods
+    # ---------------------------------------
+    def make_sales_invoice(self, source_name: str) -> dict:
+        """Return sales invoice that is mapped from the sales order."""
+        order = self.get('Sales Order', source_name)
+        if not order:
+            raise KeyError(source_name)
+        return {
+            'doctype': 'Sales Invoice',
+            'customer': order.get('customer'),
+            'company': order.get('company'),
+            'currency': order.get('currency'),
+            'items': [
+                dict(item, sales_order=source_name)
+                for item in order.get('items', [])
+            ],
+            'taxes': order.get('taxes', []),
+        }
+
+    def download_pdf(self, doctype: str, name: str) -> bytes:
+        """Return pdf of the document."""
+        if not self.get(doctype, name):
+            raise KeyError(name)
+        header = b'%PDF-1.4\n'
+        return header + b'0' * max(self.pdf_size - len(header), 0)
+
+
+class FakeErpNextHandler(BaseHTTPRequestHandler):
+    """Request handler of fake ERPNext."""
+
+    erp: FakeErpNext = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        """Do not log the requests."""
+        pass
+
+    def send_json(self, data, status: int = 200):
+        """Send json response."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_bytes(self, body: bytes, content_type: str):
+        """Send bytes response."""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str):
+        """Send frappe like error."""
+        self.send_json({'exc_type': message, 'exception': message}, status)
+
+    def read_body(self):
+        """Return body of the request as dict."""
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if 'application/json' in content_type:
+            return json.loads(body or b'{}')
+        if 'multipart/form-data' in content_type:
+            return {'size': len(body)}
+        return {
+            key: values[0] for key, values in parse_qs(body.decode()).items()
+        }
+
+    def handle_request(self, method: str):
+        """Handle the request."""
+        erp = self.erp
+        url = urlparse(self.path)
+        params = {
+            key: values[0] for key, values in parse_qs(url.query).items()
+        }
+        body = self.read_body() if method in ('POST', 'PUT') else {}
+        erp.requests.append((method, url.path))
+
+        if erp.latency:
+            time.sleep(erp.latency)
+        if erp.errors:
+            with erp.lock:
+                status = erp.errors.pop(0) if erp.errors else None
+            if status:
+                return self.send_error_json(status, 'Injected error')
+        if erp.error_rate and erp.random.random() < erp.error_rate:
+            return self.send_error_json(500, 'Injected error')
+
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        try:
+            if parts[:2] == ['api', 'resource'] and len(parts) in (3, 4):
+                return self.handle_resource(method, parts[2:], params, body)
+            if parts[:2] == ['api', 'method'] and len(parts) == 3:
+                return self.handle_method(method, parts[2], params, body)
+        except KeyError as e:
+            return self.send_error_json(404, f'DoesNotExistError: {e}')
+        except (ValueError, TypeError) as e:
+            return self.send_error_json(417, f'ValidationError: {e}')
+        return self.send_error_json(404, 'Not found')
+
+    def handle_resource(self, method, parts, params, body):
+        """Handle /api/resource routes."""
+        erp = self.erp
+        doctype = parts[0]
+        name = parts[1] if len(parts) == 2 else None
+        if method == 'GET' and not name:
+            limit_page_length = params.get('limit_page_length')
+            return self.send_json({
+                'data': erp.list(
+                    doctype,
+                    filters=params.get('filters'),
+                    fields=json.loads(params.get('fields', '["name"]')),
+                    limit_start=int(params.get('limit_start', 0)),
+                    limit_page_length=(
+                        int(limit_page_length)
+                        if limit_page_length is not None else None
+                    ),
+                    order_by=params.get('order_by')
+                )
+            })
+        if method == 'GET':
+            doc = erp.get(doctype, name)
+            if not doc:
+                raise KeyError(name)
+            return self.send_json({'data': doc})
+        if method == 'POST' and not name:
+            if body.get('name') and erp.get(doctype, body['name']):
+                return self.send_error_json(409, 'DuplicateEntryError')
+            return self.send_json({'data': erp.add(doctype, body)})
+        if method == 'PUT' and name:
+            if not erp.get(doctype, name):
+                raise KeyError(name)
+            return self.send_json({'data': erp.update(doctype, name, body)})
+        return self.send_error_json(405, 'Method not allowed')
+
+    def handle_method(self, method, name, params, body):
+        """Handle /api/method routes."""
+        erp = self.erp
+        data = dict(params, **body)
+        if name.endswith('make_sales_invoice'):
+            return self.send_json(
+                {'message': erp.make_sales_invoice(data['source_name'])}
+            )
+        if name == 'upload_file':
+            doc = erp.add('File', {'attached_to_name': data.get('docname')})
+            return self.send_json({'message': doc})
+        if name == 'frappe.utils.print_format.download_pdf':
+            return self.send_bytes(
+                erp.download_pdf(data['doctype'], data['name']),
+                'application/pdf'
+            )
+        if name == 'frappe.desk.form.utils.add_comment':
+            doc = erp.add('Comment', data)
+            return self.send_json({'message': doc})
+        if name == 'frappe.client.insert_many':
+            docs = json.loads(data['docs'])
+            return self.send_json({
+                'message': [
+                    erp.add(doc['doctype'], doc)['name'] for doc in docs
+                ]
+            })
+        if name == 'frappe.client.bulk_update':
+            failed = []
+            for doc in json.loads(data['docs']):
+                try:
+                    erp.update(doc['doctype'], doc['docname'], doc)
+                except KeyError:
+                    failed.append({'doc': doc, 'exc': 'DoesNotExistError'})
+            return self.send_json({'message': {'failed_docs': failed}})
+        return self.send_error_json(404, f'Method {name} not found')
+
+    def do_GET(self):  # noqa: D102
+        self.handle_request('GET')
+
+    def do_POST(self):  # noqa: D102
+        self.handle_request('POST')
+
+    def do_PUT(self):  # noqa: D102
+        self.handle_request('PUT')
+
+
+class FakeErpNextServer:
+    """Fake ERPNext http server that runs on a thread."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, **kwargs):
+        self.erp = FakeErpNext(**kwargs)
+        handler = type(
+            'Handler', (FakeErpNextHandler,), {'erp': self.erp}
+        )
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """Return base url of the server."""
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add(self, doctype: str, doc: dict) -> dict:
+        """Add a document."""
+        return self.erp.add(doctype, doc)
+
+    def start(self) -> 'FakeErpNextServer':
+        """Start the server on a thread."""
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake ERPNext server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    args = parser.parse_args()
+    server = FakeErpNextServer(
+        args.host, args.port,
+        latency=args.latency, error_rate=args.error_rate
+    )
+    print(f'Fake ERPNext is running on {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
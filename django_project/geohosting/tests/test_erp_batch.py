@@ -0,0 +1,104 @@
+import json
+
+import requests_mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core.models.preferences import Preferences
+from geohosting.models.support import Ticket
+
+ERP_URL = 'https://erp.example.com'
+
+
+@override_settings(ERPNEXT_BASE_URL=ERP_URL)
+class ErpBatchWriteTests(TestCase):
+    """Erp batch write tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='testuser@test.com',
+            password='password123'
+        )
+        self.user.userprofile.erpnext_code = 'User - 1'
+        self.user.userprofile.save()
+        pref = Preferences.load()
+        pref.erpnext_project_code = 'erpnext_project_code'
+        pref.save()
+
+    def create_ticket(self, subject, erpnext_code=None):
+        """Create ticket."""
+        return Ticket.objects.create(
+            customer=self.user.email, user=self.user, subject=subject,
+            details='Details', erpnext_code=erpnext_code
+        )
+
+    def test_create_one_by_one(self):
+        """Test new tickets get the code of their own created issue.
+
+        insert_many returns the names as a set, so it is not used.
+        """
+        tickets = [self.create_ticket(f'Subject {idx}') for idx in range(3)]
+
+        def create_issue(request, context):
+            subject = request.json()['subject']
+            return {'data': {'name': subject.replace('Subject', 'ISS')}}
+
+        with requests_mock.Mocker() as requests_mocker:
+            insert_many = requests_mocker.post(
+                f'{ERP_URL}/api/method/frappe.client.insert_many',
+                json={'message': ['ISS 2', 'ISS 0', 'ISS 1']}
+            )
+            requests_mocker.post(
+                f'{ERP_URL}/api/resource/Issue', json=create_issue
+            )
+            results = Ticket.bulk_post_to_erpnext(
+                Ticket.objects.order_by('id')
+            )
+            self.assertFalse(insert_many.called)
+
+        self.assertEqual(
+            [result['status'] for _, result in results], ['success'] * 3
+        )
+        for ticket in tickets:
+            ticket.refresh_from_db()
+        self.assertEqual(
+            [ticket.erpnext_code for ticket in tickets],
+            ['ISS 0', 'ISS 1', 'ISS 2']
+        )
+
+    def test_bulk_update(self):
+        """Test existing tickets are updated in one request."""
+        self.create_ticket('Subject 1', 'ISS-1')
+        self.create_ticket('Subject 2', 'ISS-2')
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.post(
+                f'{ERP_URL}/api/method/frappe.client.bulk_update',
+                json={
+                    'message': {
+                        'failed_docs': [
+                            {
+                                'doc': {'docname': 'ISS-2'},
+                                'exc': 'ValidationError'
+                            }
+                        ]
+                    }
+                }
+            )
+            results = Ticket.bulk_post_to_erpnext(
+                Ticket.objects.order_by('id')
+            )
+            self.assertEqual(requests_mocker.call_count, 1)
+            docs = json.loads(
+                requests_mocker.last_request.json()['docs']
+            )
+            self.assertEqual(
+                [(doc['doctype'], doc['docname']) for doc in docs],
+                [('Issue', 'ISS-1'), ('Issue', 'ISS-2')]
+            )
+        self.assertEqual(results[0][1]['status'], 'success')
+        self.assertEqual(
+            results[1][1],
+            {'status': 'error', 'message': 'ValidationError'}
+        )
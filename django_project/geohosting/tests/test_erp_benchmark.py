@@ -0,0 +1,223 @@
+"""Benchmarks of ERP code paths against the fake ERPNext server.
+
+They are skipped unless ERP_BENCHMARK is set, e.g.:
+
+    ERP_BENCHMARK=1 ERP_BENCHMARK_SIZES=10,1000,10000 \
+    python manage.py test geohosting.tests.test_erp_benchmark
+
+ERP_BENCHMARK_LATENCY adds latency to every fake request, in seconds.
+ERP_BENCHMARK_OUTPUT saves the results as json.
+ERP_BENCHMARK_BASELINE compares the results with saved ones, the benchmark
+fails when it is slower than ERP_BENCHMARK_TOLERANCE times the baseline.
+"""
+import json
+import os
+import time
+import unittest
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.test import TransactionTestCase, override_settings
+
+from core.models.preferences import Preferences
+from geohosting.factories import PackageFactory, ErpCompanyFactory
+from geohosting.models import SalesOrder, SalesOrderStatus
+from geohosting.models.erp_company import ErpCompany, erp_company_post_save
+from geohosting.models.support import Ticket
+from geohosting.tests.erpnext_server import FakeErpNextServer
+from geohosting.views.products import fetch_products_from_erpnext
+
+SIZES = [
+    int(size) for size in
+    os.environ.get('ERP_BENCHMARK_SIZES', '10,1000,10000').split(',')
+]
+LATENCY = float(os.environ.get('ERP_BENCHMARK_LATENCY', 0))
+TOLERANCE = float(os.environ.get('ERP_BENCHMARK_TOLERANCE', 1.5))
+RESULTS = {}
+
+
+def tearDownModule():
+    """Save and compare the results."""
+    output = os.environ.get('ERP_BENCHMARK_OUTPUT')
+    if output and RESULTS:
+        with open(output, 'w') as f:
+            json.dump(RESULTS, f, indent=2)
+
+
+@unittest.skipUnless(
+    os.environ.get('ERP_BENCHMARK'), 'ERP_BENCHMARK is not set'
+)
+class ErpBenchmark(TransactionTestCase):
+    """ERP benchmark."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.server = FakeErpNextServer(latency=LATENCY).start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(ERPNEXT_BASE_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        baseline = os.environ.get('ERP_BENCHMARK_BASELINE')
+        self.baseline = {}
+        if baseline and os.path.exists(baseline):
+            with open(baseline) as f:
+                self.baseline = json.load(f)
+
+    def reset(self):
+        """Reset the fake documents and requests."""
+        self.server.erp.docs.clear()
+        self.server.erp.requests.clear()
+
+    def measure(self, name: str, size: int, function):
+        """Measure the function and compare it with the baseline."""
+        self.server.erp.requests.clear()
+        started_at = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started_at
+        key = f'{name}:{size}'
+        RESULTS[key] = {
+            'seconds': round(elapsed, 4),
+            'records_per_second': round(size / elapsed, 2),
+            'requests': len(self.server.erp.requests)
+        }
+        print(
+            f'\n{key}: {elapsed:.3f}s, '
+            f'{RESULTS[key]["records_per_second"]} records/s, '
+            f'{RESULTS[key]["requests"]} requests'
+        )
+        baseline = self.baseline.get(key)
+        if baseline:
+            self.assertLessEqual(
+                elapsed, baseline['seconds'] * TOLERANCE,
+                f'{key} is slower than the baseline '
+                f'{baseline["seconds"]}s'
+            )
+
+    def test_fetch_products(self):
+        """Benchmark fetch_products_from_erpnext."""
+        for size in SIZES:
+            self.reset()
+            erp = self.server.erp
+            erp.add('Item Attribute', {
+                'name': 'Host Specifications',
+                'item_attribute_values': [
+                    {'abbr': 'DO', 'attribute_value': '2 CPU; 4 GB RAM'}
+                ]
+            })
+            for idx in range(size // 2):
+                product = f'Product {idx}'
+                erp.add('Item', {
+                    'name': product,
+                    'item_code': product,
+                    'item_name': product,
+                    'item_group': 'GeoHosting',
+                    'available_in_geohosting': 1,
+                    'description': (
+                        '<p><strong>Short Description</strong></p>'
+                        f'<p>Description {idx}</p>'
+                    ),
+                    'attributes': [{'attribute': 'Host Specifications'}]
+                })
+                package = f'{product}-DO'
+                erp.add('Item', {
+                    'name': package,
+                    'item_code': package,
+                    'item_group': 'GeoHosting',
+                    'variant_of': product
+                })
+                erp.add('Item Price', {
+                    'item_code': package,
+                    'item_name': package,
+                    'price_list': 'Standard Selling',
+                    'price_list_rate': 10,
+                    'currency': 'USD'
+                })
+            self.measure(
+                'fetch_products_from_erpnext', size,
+                fetch_products_from_erpnext
+            )
+
+    def test_ticket_sync(self):
+        """Benchmark Ticket.sync_data."""
+        pref = Preferences.load()
+        pref.erpnext_project_code = 'GeoHosting'
+        pref.save()
+        for size in SIZES:
+            self.reset()
+            Ticket.objects.all().delete()
+            self.server.erp.add_many('Issue', [
+                {
+                    'project': 'GeoHosting',
+                    'raised_by': f'user_{idx}@example.com',
+                    'customer': f'Customer {idx}',
+                    'subject': f'Subject {idx}',
+                    'description': f'Description {idx}',
+                    'status': 'Open'
+                }
+                for idx in range(size)
+            ])
+            self.measure(
+                'Ticket.sync_data', size,
+                lambda: Ticket.sync_data(full=True)
+            )
+            self.assertEqual(Ticket.objects.count(), size)
+
+    def test_erp_company_sync(self):
+        """Benchmark ErpCompany.sync_data."""
+        for size in SIZES:
+            self.reset()
+            ErpCompany.objects.all().delete()
+            erp = self.server.erp
+            for idx in range(size):
+                company = f'Company {idx}'
+                erp.add('Company', {
+                    'name': company, 'default_currency': 'USD'
+                })
+                erp.add('Sales Taxes and Charges Template', {
+                    'company': company, 'tax_category': 'VAT'
+                })
+                erp.add('Cost Center', {'company': company})
+            self.measure(
+                'ErpCompany.sync_data', size,
+                lambda: ErpCompany.sync_data(full=True)
+            )
+            self.assertEqual(ErpCompany.objects.count(), size)
+
+    def test_sales_order(self):
+        """Benchmark sales order create and invoice flows."""
+        post_save.disconnect(erp_company_post_save, sender=ErpCompany)
+        self.addCleanup(
+            post_save.connect, erp_company_post_save, sender=ErpCompany
+        )
+        ErpCompanyFactory(erpnext_code='Company')
+        package = PackageFactory(erpnext_code='Package')
+        user = User.objects.create_user(username='benchmark')
+        user.userprofile.erpnext_code = 'Customer'
+        user.userprofile.save()
+
+        for size in SIZES:
+            self.reset()
+            SalesOrder.objects.all().delete()
+
+            # The outbox is pushed on commit, celery is eager on tests
+            def create():
+                for _ in range(size):
+                    SalesOrder.objects.create(package=package, customer=user)
+
+            def invoice():
+                for order in SalesOrder.objects.all():
+                    order.order_status = (
+                        SalesOrderStatus.WAITING_DEPLOYMENT.key
+                    )
+                    order.save()
+
+            self.measure('SalesOrder.create', size, create)
+            self.measure('SalesOrder.invoice', size, invoice)
+            self.assertEqual(
+                SalesOrder.objects.filter(
+                    erpnext_code__isnull=False,
+                    salesorderinvoice__isnull=False
+                ).count(),
+                size
+            )
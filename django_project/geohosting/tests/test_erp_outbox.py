@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from geohosting.factories import SalesOrderFactory
+from geohosting.models import SalesOrder
+from geohosting.models.erp_outbox import ErpOutbox, ErpOutboxStatus
+from geohosting.tasks.erp import drain_erp_outbox
+from geohosting_event.models import LogTracker
+
+
+@override_settings(
+    ERPNEXT_OUTBOX_MAX_ATTEMPTS=3, ERPNEXT_OUTBOX_BACKOFF_SECONDS=10
+)
+@patch('geohosting.models.erp_model.put_to_erpnext')
+@patch('geohosting.models.erp_model.post_to_erpnext')
+class ErpOutboxTests(TestCase):
+    """Erp outbox tests."""
+
+    def create_sales_order(self):
+        """Create sales order without pushing it."""
+        with self.captureOnCommitCallbacks(execute=False):
+            return SalesOrderFactory()
+
+    def entries(self, sales_order):
+        """Return outbox of sales order."""
+        return ErpOutbox.objects.filter(
+            content_type=ContentType.objects.get_for_model(SalesOrder),
+            object_id=sales_order.id
+        )
+
+    def test_save_enqueues(
+            self, mock_post_to_erpnext, mock_put_to_erpnext
+    ):
+        """Test save records the push in outbox without calling erp."""
+        sales_order = self.create_sales_order()
+        sales_order.save()
+        mock_post_to_erpnext.assert_not_called()
+        self.assertEqual(self.entries(sales_order).count(), 1)
+
+        mock_post_to_erpnext.return_value = {
+            "status": "success", "id": 'erpnext_1'
+        }
+        drain_erp_outbox()
+        sales_order.refresh_from_db()
+        self.assertEqual(sales_order.erpnext_code, 'erpnext_1')
+        self.assertEqual(mock_post_to_erpnext.call_count, 1)
+        mock_put_to_erpnext.assert_not_called()
+        self.assertEqual(
+            self.entries(sales_order).get().status, ErpOutboxStatus.DONE
+        )
+
+    def test_retry_and_dead_letter(
+            self, mock_post_to_erpnext, mock_put_to_erpnext
+    ):
+        """Test failed push is retried with backoff then dead-lettered."""
+        mock_post_to_erpnext.return_value = {
+            "status": "error", "message": "500 Server Error"
+        }
+        sales_order = self.create_sales_order()
+        entry = self.entries(sales_order).get()
+
+        drain_erp_outbox()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, ErpOutboxStatus.PENDING)
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.last_error, '500 Server Error')
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+
+        # Not due yet
+        drain_erp_outbox()
+        self.assertEqual(mock_post_to_erpnext.call_count, 1)
+
+        for _ in range(2):
+            ErpOutbox.objects.filter(id=entry.id).update(
+                next_attempt_at=timezone.now()
+            )
+            drain_erp_outbox()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, ErpOutboxStatus.DEAD)
+        self.assertEqual(entry.attempts, 3)
+        self.assertTrue(
+            LogTracker.objects.filter(
+                object_id=sales_order.id, type=LogTracker.ERROR
+            ).exists()
+        )
+
+        # Retry it from admin
+        mock_post_to_erpnext.return_value = {
+            "status": "success", "id": 'erpnext_1'
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.retry()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, ErpOutboxStatus.DONE)
+
+    def test_ordered_per_object(
+            self, mock_post_to_erpnext, mock_put_to_erpnext
+    ):
+        """Test entries of an object are not pushed concurrently."""
+        sales_order = self.create_sales_order()
+        content_type = ContentType.objects.get_for_model(SalesOrder)
+        entry = ErpOutbox.claim(content_type.id, sales_order.id)
+        self.assertEqual(entry.status, ErpOutboxStatus.PROCESSING)
+
+        # Saved while it is being pushed
+        sales_order.save()
+        self.assertEqual(self.entries(sales_order).count(), 2)
+        self.assertIsNone(ErpOutbox.claim(content_type.id, sales_order.id))
+
+        # Stale processing is claimed again
+        ErpOutbox.objects.filter(id=entry.id).update(
+            locked_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(
+            ErpOutbox.claim(content_type.id, sales_order.id).id, entry.id
+        )
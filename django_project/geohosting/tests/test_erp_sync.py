@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from geohosting.models.country import Country
+
+
+class ErpModelSyncTests(TestCase):
+    """ErpModel sync tests."""
+
+    @staticmethod
+    def countries(total, name_format='Country {}'):
+        """Return country rows of erpnext."""
+        return [
+            {
+                'name': f'C{idx}',
+                'country_name': name_format.format(idx),
+                'code': f'c{idx}',
+                'time_zones': None,
+                'modified': '2000-01-01 00:00:00.000000'
+            }
+            for idx in range(total)
+        ]
+
+    @mock.patch('geohosting.models.erp_model.fetch_erpnext_data')
+    def test_bulk_sync(self, mock_fetch_erpnext_data):
+        """Test rows are written in bulk and only when changed."""
+        Country.objects.create(
+            erpnext_code='C0', name='Country 0', country_name='Country 0',
+            code='c0'
+        )
+        mock_fetch_erpnext_data.return_value = self.countries(300)
+        with CaptureQueriesContext(connection) as context:
+            Country.sync_data()
+        self.assertLess(len(context.captured_queries), 15)
+        self.assertEqual(Country.objects.count(), 300)
+        self.assertEqual(
+            Country.objects.get(erpnext_code='C10').country_name,
+            'Country 10'
+        )
+
+        # Nothing changed, nothing is written
+        with CaptureQueriesContext(connection) as context:
+            Country.sync_data(full=True)
+        self.assertFalse(
+            [
+                query for query in context.captured_queries
+                if 'geohosting_country' in query['sql'] and
+                not query['sql'].startswith('SELECT')
+            ]
+        )
+
+        # Just the changed one is updated
+        rows = self.countries(300)
+        rows[5]['country_name'] = 'New name'
+        mock_fetch_erpnext_data.return_value = rows
+        Country.sync_data(full=True)
+        self.assertEqual(
+            Country.objects.get(erpnext_code='C5').country_name,
+            'New name'
+        )
+        self.assertEqual(
+            Country.objects.filter(erpnext_code='C5').count(), 1
+        )
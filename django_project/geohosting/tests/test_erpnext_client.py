@@ -0,0 +1,221 @@
+import json
+from unittest.mock import patch
+
+import requests_mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from geohosting.utils.erpnext import (
+    fetch_erpnext_data, get_cached_erpnext_data, get_erpnext_data,
+    invalidate_erpnext_data_cache, iter_erpnext_data, post_to_erpnext
+)
+from geohosting.utils.erpnext_client import ErpClient, get_erp_client
+
+ERP_URL = 'https://erp.example.com'
+
+
+@override_settings(ERPNEXT_BASE_URL=ERP_URL)
+@patch('geohosting.utils.erpnext_client.time.sleep')
+class ErpClientTests(TestCase):
+    """ERP client tests."""
+
+    def test_session_is_reused(self, mock_sleep):
+        """Test the session is shared between requests."""
+        client = ErpClient()
+        self.assertIs(client.session, client.session)
+        self.assertIs(get_erp_client(), get_erp_client())
+
+    def test_retry_on_server_error(self, mock_sleep):
+        """Test GET is retried on 5xx and succeeds."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Item/item-1',
+                [
+                    {'status_code': 502},
+                    {'status_code': 503},
+                    {'status_code': 200, 'json': {'data': {'name': 'A'}}},
+                ]
+            )
+            result = get_erpnext_data('Item', 'item-1')
+            self.assertEqual(result['status'], 'success')
+            self.assertEqual(result['data'], {'name': 'A'})
+            self.assertEqual(requests_mocker.call_count, 3)
+            self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_retry_after_is_honoured(self, mock_sleep):
+        """Test Retry-After header is used for the delay."""
+        client = ErpClient(backoff_max=10)
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Item',
+                [
+                    {'status_code': 429, 'headers': {'Retry-After': '3'}},
+                    {'status_code': 200, 'json': {'data': []}},
+                ]
+            )
+            response = client.get('api/resource/Item')
+            self.assertEqual(response.status_code, 200)
+            mock_sleep.assert_called_once_with(3.0)
+
+    def test_retry_gives_up(self, mock_sleep):
+        """Test the last response is returned after max retries."""
+        client = ErpClient(max_retries=2)
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Item', status_code=500
+            )
+            response = client.get('api/resource/Item')
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(requests_mocker.call_count, 3)
+
+    def test_post_not_retried_on_500(self, mock_sleep):
+        """Test POST is not retried when server may have processed it."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.post(
+                f'{ERP_URL}/api/resource/Item', status_code=500
+            )
+            result = post_to_erpnext({'name': 'A'}, 'Item')
+            self.assertEqual(result['status'], 'error')
+            self.assertEqual(requests_mocker.call_count, 1)
+            mock_sleep.assert_not_called()
+
+    def test_timeout_is_sent(self, mock_sleep):
+        """Test every request has connect and read timeout."""
+        client = ErpClient(connect_timeout=2, read_timeout=7)
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Item', json={'data': []}
+            )
+            client.get('api/resource/Item')
+            self.assertEqual(
+                requests_mocker.last_request.timeout, (2, 7)
+            )
+
+
+@override_settings(
+    ERPNEXT_BASE_URL=ERP_URL, ERPNEXT_PAGE_LENGTH=20,
+    ERPNEXT_MAX_PAGE_LENGTH=80, ERPNEXT_PREFETCH_PAGES=3
+)
+class ErpPaginationTests(TestCase):
+    """ERP pagination tests."""
+
+    total = 1234
+
+    def rows_callback(self, request, context):
+        """Return the page of rows from the request."""
+        start = int(request.qs['limit_start'][0])
+        length = int(request.qs['limit_page_length'][0])
+        return {
+            'data': [
+                {'name': f'Issue {idx}'}
+                for idx in range(start, min(start + length, self.total))
+            ]
+        }
+
+    def test_fetch_all_pages(self):
+        """Test all rows are returned in order, beyond the old limit."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Issue', json=self.rows_callback
+            )
+            rows = fetch_erpnext_data('Issue', [['project', '=', 'a']])
+            self.assertEqual(len(rows), self.total)
+            self.assertEqual(
+                [row['name'] for row in rows],
+                [f'Issue {idx}' for idx in range(self.total)]
+            )
+            request = requests_mocker.request_history[0]
+            self.assertEqual(
+                json.loads(request.qs['filters'][0]),
+                [['project', '=', 'a']]
+            )
+
+    def test_page_length_grows(self):
+        """Test page length grows when pages are fast."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Issue', json=self.rows_callback
+            )
+            list(iter_erpnext_data('Issue'))
+            lengths = {
+                int(request.qs['limit_page_length'][0])
+                for request in requests_mocker.request_history
+            }
+            self.assertEqual(min(lengths), 20)
+            self.assertEqual(max(lengths), 80)
+
+    def test_stream_stops_early(self):
+        """Test the stream can be consumed partially."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Issue', json=self.rows_callback
+            )
+            rows = iter_erpnext_data('Issue')
+            self.assertEqual(next(rows), {'name': 'Issue 0'})
+            rows.close()
+            self.assertLessEqual(requests_mocker.call_count, 3)
+
+    def test_error(self):
+        """Test error page returns error message."""
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(
+                f'{ERP_URL}/api/resource/Issue', status_code=403,
+                text='Forbidden'
+            )
+            result = fetch_erpnext_data('Issue')
+            self.assertEqual(
+                result,
+                'Error: Unable to fetch data. Status code: 403, '
+                'Message: Forbidden'
+            )
+
+
+@override_settings(
+    ERPNEXT_BASE_URL=ERP_URL,
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class ErpDataCacheTests(TestCase):
+    """ERP data cache tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        cache.clear()
+
+    def test_cache(self):
+        """Test detail data is requested once until invalidated."""
+        url = (
+            f'{ERP_URL}/api/resource/'
+            'Sales Taxes and Charges Template/Tax 1'
+        )
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(url, json={'data': {'taxes': [1]}})
+            for _ in range(3):
+                result = get_cached_erpnext_data(
+                    'Sales Taxes and Charges Template', 'Tax 1'
+                )
+                self.assertEqual(result['data'], {'taxes': [1]})
+            self.assertEqual(requests_mocker.call_count, 1)
+
+            invalidate_erpnext_data_cache(
+                'Sales Taxes and Charges Template', ['Tax 1']
+            )
+            get_cached_erpnext_data(
+                'Sales Taxes and Charges Template', 'Tax 1'
+            )
+            self.assertEqual(requests_mocker.call_count, 2)
+
+    def test_error_not_cached(self):
+        """Test error is not cached."""
+        url = f'{ERP_URL}/api/resource/Payment Terms Template/Term'
+        with requests_mock.Mocker() as requests_mocker:
+            requests_mocker.get(url, status_code=404)
+            for _ in range(2):
+                result = get_cached_erpnext_data(
+                    'Payment Terms Template', 'Term'
+                )
+                self.assertEqual(result['status'], 'error')
+            self.assertEqual(requests_mocker.call_count, 2)
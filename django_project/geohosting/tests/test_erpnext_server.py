@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from geohosting.tests.erpnext_server import FakeErpNextServer
+from geohosting.utils.erpnext import (
+    download_erp_file, fetch_erpnext_data, get_erpnext_data,
+    post_to_erpnext, put_to_erpnext
+)
+
+
+@patch('geohosting.utils.erpnext_client.time.sleep')
+class FakeErpNextServerTests(TestCase):
+    """Fake ERPNext server tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.server = FakeErpNextServer().start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(
+            ERPNEXT_BASE_URL=self.server.url, ERPNEXT_PAGE_LENGTH=20
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_list(self, mock_sleep):
+        """Test list with filters and pagination."""
+        self.server.erp.add_many(
+            'Issue',
+            [
+                {'subject': f'Issue {idx}', 'project': f'P{idx % 2}'}
+                for idx in range(105)
+            ]
+        )
+        rows = fetch_erpnext_data('Issue', [['project', '=', 'P0']])
+        self.assertEqual(len(rows), 53)
+        self.assertEqual(len({row['name'] for row in rows}), 53)
+
+        rows = fetch_erpnext_data(
+            'Issue', {'project': 'P1'}, fields=['name', 'subject']
+        )
+        self.assertEqual(len(rows), 52)
+        self.assertEqual(set(rows[0].keys()), {'name', 'subject'})
+
+    def test_resource(self, mock_sleep):
+        """Test post, get and put."""
+        result = post_to_erpnext({'customer': 'A'}, 'Sales Order')
+        self.assertEqual(result['status'], 'success')
+        name = result['id']
+
+        result = put_to_erpnext({'status': 'To Bill'}, 'Sales Order', name)
+        self.assertEqual(result['data']['status'], 'To Bill')
+
+        result = get_erpnext_data('Sales Order', name)
+        self.assertEqual(result['data']['customer'], 'A')
+        self.assertEqual(result['data']['status'], 'To Bill')
+
+        result = get_erpnext_data('Sales Order', 'Unknown')
+        self.assertEqual(result['status'], 'error')
+
+    def test_methods(self, mock_sleep):
+        """Test make_sales_invoice and download_pdf."""
+        order = self.server.add(
+            'Sales Order', {'customer': 'A', 'items': [{'qty': 1}]}
+        )
+        result = post_to_erpnext(
+            {'source_name': order['name']}, 'Sales Invoice',
+            url_input=(
+                'api/method/erpnext.selling.doctype.'
+                'sales_order.sales_order.make_sales_invoice'
+            )
+        )
+        invoice = result['response_data']['message']
+        self.assertEqual(invoice['customer'], 'A')
+        self.assertEqual(invoice['items'][0]['sales_order'], order['name'])
+
+        contents = []
+
+        def save(path, content):
+            contents.append(content.read())
+            return path
+
+        with patch(
+                'geohosting.utils.erpnext.default_storage.save'
+        ) as mock_save:
+            mock_save.side_effect = save
+            self.assertEqual(
+                download_erp_file(
+                    '/api/method/frappe.utils.print_format.download_pdf'
+                    f'?doctype=Sales%20Order&name={order["name"]}',
+                    folder='invoices', filename='order.pdf'
+                ),
+                'invoices/order.pdf'
+            )
+            self.assertTrue(contents[0].startswith(b'%PDF'))
+
+    def test_error_injection(self, mock_sleep):
+        """Test injected errors are retried by the client."""
+        self.server.add('Item', {'name': 'Item 1'})
+        self.server.erp.fail_next(503, 502)
+        result = get_erpnext_data('Item', 'Item 1')
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(self.server.erp.requests), 3)
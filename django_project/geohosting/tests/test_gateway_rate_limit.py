@@ -0,0 +1,147 @@
+from unittest.mock import MagicMock, patch
+
+import stripe
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from paystackapi.plan import Plan
+from rest_framework.test import APIClient
+
+from geohosting.utils.gateway_rate_limit import (
+    Gateway, GatewayRateLimiter, LocalTokenBucket, Priority,
+    RateLimitExceeded, batch_priority, current_priority, gateway_metrics
+)
+
+
+class FakeTime:
+    """Clock that moves on sleep."""
+
+    def __init__(self):
+        self.now = 1000
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    GATEWAY_RATE_LIMITS={'stripe': 1, 'paystack': 1},
+    GATEWAY_RATE_LIMIT_BURST_SECONDS=4,
+    GATEWAY_BATCH_RESERVE=0.5,
+    GATEWAY_INTERACTIVE_MAX_WAIT_SECONDS=0,
+    GATEWAY_BATCH_MAX_WAIT_SECONDS=0
+)
+class GatewayRateLimitTests(TestCase):
+    """Payment gateway rate limiter tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        cache.clear()
+        self.clock = FakeTime()
+        patcher = patch(
+            'geohosting.utils.gateway_rate_limit.time', self.clock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def metric(self, gateway, metric, priority=Priority.INTERACTIVE):
+        """Return the metric of current minute."""
+        value = gateway_metrics(gateway, 1)[0][metric]
+        return value[priority] if priority else value
+
+    def test_batch_leaves_reserve(self):
+        """Test batch requests leave the reserve to interactive ones."""
+        limiter = GatewayRateLimiter(Gateway.STRIPE, LocalTokenBucket())
+        with batch_priority():
+            self.assertEqual(current_priority(), Priority.BATCH)
+            limiter.acquire()
+            limiter.acquire()
+            with self.assertRaises(RateLimitExceeded):
+                limiter.acquire()
+        self.assertEqual(current_priority(), Priority.INTERACTIVE)
+
+        # Interactive takes the reserve, then it is sent after max wait
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.metric(Gateway.STRIPE, 'used'), 3)
+        self.assertEqual(
+            self.metric(Gateway.STRIPE, 'used', Priority.BATCH), 2
+        )
+        self.assertEqual(self.metric(Gateway.STRIPE, 'throttled'), 1)
+        self.assertEqual(
+            self.metric(Gateway.STRIPE, 'throttled', Priority.BATCH), 1
+        )
+
+        # Bucket is refilled with the rate
+        self.clock.now += 3
+        with batch_priority():
+            limiter.acquire()
+
+    @override_settings(GATEWAY_INTERACTIVE_MAX_WAIT_SECONDS=10)
+    def test_backoff_on_429(self):
+        """Test paystack request backs off and is retried on 429."""
+        responses = [
+            MagicMock(status_code=429, headers={'Retry-After': '3'}),
+            MagicMock(status_code=200, headers={}),
+        ]
+        responses[1].json.return_value = {'status': True, 'data': []}
+        with patch(
+                'paystackapi.base.requests.get', side_effect=responses
+        ) as mock_get:
+            self.assertEqual(Plan.list(), {'status': True, 'data': []})
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.metric(Gateway.PAYSTACK, 'rate_limited', ''), 1)
+
+        # The retry waited for Retry-After
+        self.assertEqual(self.clock.sleeps, [3])
+
+    def test_stripe_client(self):
+        """Test stripe client is rate limited and retried on 429."""
+        with patch.object(
+                stripe.RequestsClient, '_request_internal',
+                side_effect=[
+                    (b'{}', 429, {'retry-after': '0'}),
+                    (b'{}', 200, {})
+                ]
+        ) as mock_request:
+            _, status_code, _ = stripe.default_http_client.request(
+                'get', 'https://api.stripe.com/v1/customers', {}
+            )
+        self.assertEqual(status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(self.metric(Gateway.STRIPE, 'used'), 2)
+        self.assertEqual(self.metric(Gateway.STRIPE, 'rate_limited', ''), 1)
+
+    def test_api(self):
+        """Test metrics api."""
+        GatewayRateLimiter(Gateway.PAYSTACK).acquire()
+        client = APIClient()
+        url = reverse('health-gateway-rate')
+        client.force_authenticate(
+            User.objects.create_user(username='user')
+        )
+        self.assertEqual(client.get(url).status_code, 403)
+
+        client.force_authenticate(
+            User.objects.create_superuser(username='admin')
+        )
+        response = client.get(url, {'minutes': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data[Gateway.STRIPE]), 5)
+        minute = response.data[Gateway.PAYSTACK][0]
+        self.assertEqual(minute['used'][Priority.INTERACTIVE], 1)
+        self.assertEqual(minute['budget_used'], round(100 / 60, 2))
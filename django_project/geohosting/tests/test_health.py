@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from geohosting.utils.health import (
+    Dependency, DependencyHealth, probe_dependencies
+)
+
+
+@override_settings(
+    HEALTH_FAILURE_THRESHOLD=2,
+    HEALTH_COOLDOWN_SECONDS=60,
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+@patch('geohosting.utils.health.DependencyHealth.test')
+class DependencyHealthTests(TestCase):
+    """Dependency health tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        cache.clear()
+
+    def test_cached_state(self, mock_test):
+        """Test state is probed in background and read from cache."""
+        mock_test.return_value = 'OK'
+        probe_dependencies()
+        self.assertEqual(mock_test.call_count, len(Dependency.TESTS))
+
+        for _ in range(3):
+            self.assertTrue(DependencyHealth(Dependency.ERP).is_available)
+        self.assertEqual(mock_test.call_count, len(Dependency.TESTS))
+
+    def test_not_probed_yet(self, mock_test):
+        """Test state is probed on read when it is not cached."""
+        mock_test.return_value = 'Connection refused'
+        self.assertEqual(
+            DependencyHealth(Dependency.VAULT).status, 'Connection refused'
+        )
+        self.assertFalse(DependencyHealth(Dependency.VAULT).is_available)
+        self.assertEqual(mock_test.call_count, 1)
+
+    def test_circuit_breaker(self, mock_test):
+        """Test failing dependency is not probed until cooldown is over."""
+        mock_test.return_value = 'Timeout'
+        health = DependencyHealth(Dependency.PROXY)
+        health.probe()
+        self.assertFalse(health.is_open())
+        health.probe()
+        self.assertTrue(health.is_open())
+
+        # Short circuited
+        health.probe()
+        health.probe()
+        self.assertEqual(mock_test.call_count, 2)
+
+        # Cooldown is over
+        state = health.state
+        state['opened_until'] = 0
+        health.save(state)
+        mock_test.return_value = 'OK'
+        state = health.probe()
+        self.assertEqual(mock_test.call_count, 3)
+        self.assertEqual(state['failures'], 0)
+        self.assertTrue(health.is_available)
+
+    def test_api(self, mock_test):
+        """Test health api returns the cached state."""
+        mock_test.return_value = 'OK'
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_superuser(
+                username='admin', email='admin@example.com',
+                password='password123'
+            )
+        )
+        response = client.get(reverse('health-erp'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'OK')
+
+        mock_test.return_value = 'Error'
+        response = client.get(reverse('health-stripe'))
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,374 @@
+import asyncio
+import errno
+import socket
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from geohosting.models import (
+    Cluster, Instance, InstanceStatus, Package, Product, Region
+)
+from geohosting.tasks.instances import (
+    check_instances as check_instances_task, check_instances_lock
+)
+from geohosting.utils.dns_resolver import DnsResolver, Reachability
+from geohosting.utils.instance_checker import (
+    InstanceChecker, check_instances
+)
+
+
+class FakeResolver(DnsResolver):
+    """Resolver of names that start with the unresolved prefixes."""
+
+    def __init__(self, unresolved=(), no_address=(), **kwargs):
+        super().__init__(cache={}, **kwargs)
+        self.unresolved = tuple(unresolved)
+        self.no_address = tuple(no_address)
+        self.lookups = []
+
+    async def getaddrinfo(self, host):
+        """Return addresses of the host."""
+        self.lookups.append(host)
+        if host.startswith(self.unresolved):
+            raise socket.gaierror(
+                socket.EAI_NONAME, 'Name or service not known'
+            )
+        if host.startswith(self.no_address):
+            raise socket.gaierror(
+                socket.EAI_NODATA, 'No address associated with hostname'
+            )
+        return ['127.0.0.1']
+
+
+class BaseInstanceTests(TestCase):
+    """Base instance tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.user = User.objects.create_user(username='user')
+        region = Region.objects.create(name='Region', code='region')
+        self.clusters = [
+            Cluster.objects.create(
+                code=f'cluster-{idx}', region=region,
+                domain=f'cluster-{idx}.example.com'
+            )
+            for idx in range(2)
+        ]
+        product = Product.objects.create(name='GeoNode', upstream_id='1')
+        self.package = Package.objects.create(
+            product=product, name='GeoNode', price=10
+        )
+
+    def create_instance(self, name, status, cluster=0):
+        """Create instance."""
+        return Instance.objects.create(
+            name=name, price=self.package, cluster=self.clusters[cluster],
+            owner=self.user, status=status
+        )
+
+    def checker(self, handler, unresolved=(), **kwargs):
+        """Return checker with mock transport and resolver."""
+        return InstanceChecker(
+            transport=httpx.MockTransport(handler),
+            resolver=FakeResolver(unresolved),
+            **kwargs
+        )
+
+
+class InstanceCheckerTests(BaseInstanceTests):
+    """Instance checker tests."""
+
+    def test_concurrency_and_timeout(self):
+        """Test instances are probed concurrently with timeout."""
+        for idx in range(40):
+            self.create_instance(f'server-{idx}', InstanceStatus.ONLINE)
+        self.create_instance('hung', InstanceStatus.ONLINE, cluster=1)
+
+        async def handler(request):
+            if request.url.host.startswith('hung'):
+                await asyncio.sleep(5)
+            await asyncio.sleep(0.2)
+            return httpx.Response(200)
+
+        checker = self.checker(handler, concurrency=50, timeout=0.5)
+        started_at = time.monotonic()
+        results = checker.probe(Instance.objects.all())
+        self.assertLess(time.monotonic() - started_at, 2)
+
+        self.assertEqual(len(results), 41)
+        hung = Instance.objects.get(name='hung')
+        self.assertEqual(results[hung.id].error, 'Timeout')
+        self.assertFalse(results[hung.id].online)
+        self.assertTrue(results[hung.id].reached)
+        online = [result for result in results.values() if result.online]
+        self.assertEqual(len(online), 40)
+
+    @patch('geohosting.models.instance.Instance.cancel_subscription')
+    @patch('geohosting.models.instance.Instance.update_sales_order')
+    @patch('geohosting.utils.email.InstanceEmail.send_credentials')
+    def test_transitions(
+            self, mock_send_credentials, mock_update_sales_order,
+            mock_cancel_subscription
+    ):
+        """Test status transitions are applied in bulk."""
+        deploying = self.create_instance(
+            'deploying', InstanceStatus.DEPLOYING
+        )
+        starting = self.create_instance(
+            'starting', InstanceStatus.STARTING_UP
+        )
+        online = self.create_instance('online', InstanceStatus.ONLINE)
+        down = self.create_instance('down', InstanceStatus.ONLINE)
+        deleting = self.create_instance('deleting', InstanceStatus.DELETING)
+
+        requested = []
+
+        def handler(request):
+            requested.append(request.url.host.split('.')[0])
+            if request.url.host.startswith('down'):
+                raise httpx.ConnectError(
+                    'Connection refused'
+                ) from ConnectionRefusedError(
+                    errno.ECONNREFUSED, 'Connection refused'
+                )
+            return httpx.Response(200)
+
+        checker = self.checker(handler, unresolved=['deleting'])
+        with CaptureQueriesContext(connection) as context:
+            changed = check_instances(
+                Instance.objects.exclude(status=InstanceStatus.DELETED),
+                checker=checker
+            )
+        results = checker.probe(
+            Instance.objects.filter(name__in=['down', 'online'])
+        )
+        self.assertEqual(
+            results[down.id].reachability, Reachability.CONNECT_REFUSED
+        )
+        self.assertEqual(results[online.id].reachability, Reachability.OK)
+        self.assertEqual(
+            sorted(instance.name for instance in changed),
+            ['deleting', 'deploying', 'down', 'starting']
+        )
+        # One update for the statuses, one for the next checks
+        self.assertEqual(
+            len([
+                query for query in context.captured_queries
+                if query['sql'].startswith('UPDATE "geohosting_instance"')
+            ]),
+            2
+        )
+        for instance, status in [
+            (deploying, InstanceStatus.STARTING_UP),
+            (starting, InstanceStatus.ONLINE),
+            (online, InstanceStatus.ONLINE),
+            (down, InstanceStatus.OFFLINE),
+            (deleting, InstanceStatus.DELETED)
+        ]:
+            instance.refresh_from_db()
+            self.assertEqual(instance.status, status)
+
+        # Side effects are only for the changed instances
+        self.assertEqual(mock_send_credentials.call_count, 1)
+        self.assertEqual(mock_update_sales_order.call_count, 2)
+        self.assertEqual(mock_cancel_subscription.call_count, 1)
+
+        # Name that is not resolved is not requested
+        self.assertNotIn('deleting', requested)
+
+        mock_update_sales_order.reset_mock()
+        with CaptureQueriesContext(connection) as context:
+            changed = check_instances(
+                Instance.objects.filter(id__in=[online.id, down.id]),
+                checker=checker
+            )
+        self.assertEqual(changed, [])
+        mock_update_sales_order.assert_not_called()
+        self.assertEqual(
+            len([
+                query for query in context.captured_queries
+                if query['sql'].startswith('UPDATE')
+            ]),
+            1
+        )
+
+    @override_settings(
+        INSTANCE_CHECK_MIN_INTERVAL_SECONDS=60,
+        INSTANCE_CHECK_MAX_INTERVAL_SECONDS=600
+    )
+    @patch('geohosting.utils.instance_checker.random.uniform', return_value=1)
+    def test_schedule(self, mock_uniform):
+        """Test stable instances back off and the changed ones do not."""
+        stable = self.create_instance('stable', InstanceStatus.ONLINE)
+        deploying = self.create_instance(
+            'deploying', InstanceStatus.DEPLOYING
+        )
+        flapping = self.create_instance('flapping', InstanceStatus.ONLINE)
+        responses = {'flapping': 200}
+
+        def handler(request):
+            host = request.url.host
+            if host.startswith('flapping'):
+                responses['flapping'] = (
+                    503 if responses['flapping'] == 200 else 200
+                )
+                return httpx.Response(responses['flapping'])
+            return httpx.Response(200)
+
+        checker = self.checker(handler, unresolved=['deploying'])
+        intervals = {'stable': [], 'deploying': [], 'flapping': []}
+        for _ in range(6):
+            started_at = timezone.now()
+            check_instances(Instance.objects.all(), checker=checker)
+            for instance in Instance.objects.all():
+                intervals[instance.name].append(
+                    round(
+                        (instance.next_check_at - started_at).total_seconds()
+                    )
+                )
+        self.assertEqual(intervals['stable'], [120, 240, 480, 600, 600, 600])
+        self.assertEqual(intervals['deploying'], [60] * 6)
+        self.assertEqual(intervals['flapping'], [60] * 6)
+        for instance, stability in [
+            (stable, 6), (deploying, 6), (flapping, 0)
+        ]:
+            instance.refresh_from_db()
+            self.assertEqual(instance.stability, stability)
+
+        # Changing the status elsewhere makes it due again
+        stable.offline()
+        stable.refresh_from_db()
+        self.assertIsNone(stable.next_check_at)
+        self.assertEqual(stable.stability, 0)
+
+
+class DnsResolverTests(TestCase):
+    """Dns resolver tests."""
+
+    def test_reachability(self):
+        """Test reachability of the names."""
+        resolver = FakeResolver(unresolved=['gone'], no_address=['empty'])
+        for host, reachability in [
+            ('server.example.com', Reachability.OK),
+            ('gone.example.com', Reachability.NXDOMAIN),
+            ('empty.example.com', Reachability.NO_ADDRESS)
+        ]:
+            self.assertEqual(resolver.resolve_sync(host), reachability)
+
+    def test_temporary_failure(self):
+        """Test temporary failures are ok and are not cached."""
+
+        class FailingResolver(FakeResolver):
+            async def getaddrinfo(self, host):
+                self.lookups.append(host)
+                raise socket.gaierror(
+                    socket.EAI_AGAIN, 'Temporary failure in name resolution'
+                )
+
+        resolver = FailingResolver()
+        self.assertEqual(
+            resolver.resolve_sync('server.example.com'), Reachability.OK
+        )
+        resolver.resolve_sync('server.example.com')
+        self.assertEqual(len(resolver.lookups), 2)
+
+    @patch('geohosting.utils.dns_resolver.time.monotonic')
+    def test_cache(self, mock_monotonic):
+        """Test names are cached with positive and negative ttl."""
+        mock_monotonic.return_value = 1000
+        resolver = FakeResolver(
+            unresolved=['gone'], positive_ttl=60, negative_ttl=10
+        )
+        for _ in range(3):
+            resolver.resolve_sync('server.example.com')
+            resolver.resolve_sync('gone.example.com')
+        self.assertEqual(len(resolver.lookups), 2)
+
+        # The negative one is expired
+        mock_monotonic.return_value = 1011
+        resolver.resolve_sync('server.example.com')
+        resolver.resolve_sync('gone.example.com')
+        self.assertEqual(len(resolver.lookups), 3)
+
+        mock_monotonic.return_value = 1061
+        resolver.resolve_sync('server.example.com')
+        self.assertEqual(len(resolver.lookups), 4)
+
+
+@override_settings(
+    INSTANCE_CHECK_SHARDS=3,
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+@patch('geohosting.tasks.instances.instance_checker.check_instances')
+class CheckInstancesTaskTests(BaseInstanceTests):
+    """Sharded check instances task tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        super().setUp()
+        cache.clear()
+        for idx in range(10):
+            self.create_instance(f'server-{idx}', InstanceStatus.ONLINE)
+        self.create_instance('deleted', InstanceStatus.DELETED)
+
+    def test_shards(self, mock_check_instances):
+        """Test every instance is checked by exactly one shard."""
+        self.assertEqual(check_instances_task(), 3)
+        self.assertEqual(mock_check_instances.call_count, 3)
+        ids = [
+            sorted(instance.id for instance in call[0][0])
+            for call in mock_check_instances.call_args_list
+        ]
+        self.assertEqual(
+            sorted(sum(ids, [])),
+            sorted(
+                Instance.objects.exclude(
+                    status=InstanceStatus.DELETED
+                ).values_list('id', flat=True)
+            )
+        )
+        for shard in range(3):
+            self.assertIsNone(cache.get(check_instances_lock(shard, 3)))
+
+    def test_shard_in_flight(self, mock_check_instances):
+        """Test shard that is still in flight is skipped."""
+        cache.set(check_instances_lock(1, 3), True)
+        self.assertEqual(check_instances_task(), 2)
+        checked = {
+            instance.id % 3
+            for call in mock_check_instances.call_args_list
+            for instance in call[0][0]
+        }
+        self.assertEqual(checked, {0, 2})
+        self.assertTrue(cache.get(check_instances_lock(1, 3)))
+
+    def test_only_due_instances(self, mock_check_instances):
+        """Test only the instances that are due are checked."""
+        now = timezone.now()
+        Instance.objects.filter(name__in=['server-0', 'server-1']).update(
+            next_check_at=now + timedelta(minutes=5)
+        )
+        Instance.objects.filter(name='server-2').update(
+            next_check_at=now - timedelta(minutes=5)
+        )
+        check_instances_task()
+        checked = {
+            instance.name
+            for call in mock_check_instances.call_args_list
+            for instance in call[0][0]
+        }
+        self.assertEqual(
+            checked, {f'server-{idx}' for idx in range(2, 10)}
+        )
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import httpx
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from geohosting.models import (
+    Instance, InstanceProbe, InstanceStatus, InstanceUptime,
+    InstanceUptimeResolution
+)
+from geohosting.tests.test_instance_checker import BaseInstanceTests
+from geohosting.utils.instance_checker import check_instances
+from geohosting.utils.instance_uptime import (
+    instance_uptime_report, purge_instance_uptime, rollup_instance_uptime
+)
+
+NOW = datetime(2026, 1, 3, 0, 30, tzinfo=dt_timezone.utc)
+START = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InstanceUptimeTests(BaseInstanceTests):
+    """Instance uptime tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        super().setUp()
+        self.instance = self.create_instance('server', InstanceStatus.ONLINE)
+
+    def create_probes(self):
+        """Create probes every 5 minutes, offline on 1 Jan 10:00-11:00."""
+        probes = []
+        checked_at = START
+        idx = 0
+        while checked_at < NOW:
+            online = not (10 <= checked_at.hour < 11 and checked_at.day == 1)
+            probes.append(
+                InstanceProbe(
+                    instance=self.instance,
+                    checked_at=checked_at,
+                    status_code=200 if online else 503,
+                    latency_ms=600 if idx % 10 == 0 else 80,
+                    online=online,
+                    interval_seconds=300
+                )
+            )
+            checked_at += timedelta(minutes=5)
+            idx += 1
+        InstanceProbe.objects.bulk_create(probes)
+        return probes
+
+    def test_rollups_and_report(self):
+        """Test report is computed from the rollups."""
+        probes = self.create_probes()
+        rollup_instance_uptime(
+            InstanceUptimeResolution.FIVE_MINUTES, end=NOW, periods=600
+        )
+        rollup_instance_uptime(
+            InstanceUptimeResolution.HOUR, end=NOW, periods=60
+        )
+        rollup_instance_uptime(
+            InstanceUptimeResolution.DAY, end=NOW, periods=3
+        )
+        self.assertEqual(
+            InstanceUptime.objects.filter(
+                resolution=InstanceUptimeResolution.DAY
+            ).count(),
+            2
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            report = instance_uptime_report(self.instance, START, NOW)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn(
+            'instanceprobe', context.captured_queries[0]['sql']
+        )
+        self.assertEqual(report['probes'], len(probes))
+        self.assertEqual(report['online_probes'], len(probes) - 12)
+        self.assertEqual(
+            report['uptime'],
+            round((len(probes) * 300 - 3600) / (len(probes) * 300) * 100, 3)
+        )
+        self.assertEqual(report['latency_ms'], {
+            'p50': 100, 'p95': 750, 'p99': 750
+        })
+
+        # Rolling up again does not duplicate the rows
+        count = InstanceUptime.objects.count()
+        rollup_instance_uptime(
+            InstanceUptimeResolution.FIVE_MINUTES, end=NOW
+        )
+        rollup_instance_uptime(InstanceUptimeResolution.HOUR, end=NOW)
+        self.assertEqual(InstanceUptime.objects.count(), count)
+
+    @override_settings(
+        INSTANCE_PROBE_RETENTION_DAYS=1,
+        INSTANCE_UPTIME_FIVE_MINUTES_RETENTION_DAYS=1,
+        INSTANCE_UPTIME_HOUR_RETENTION_DAYS=2
+    )
+    def test_purge(self):
+        """Test data older than retention is deleted."""
+        self.create_probes()
+        for resolution, periods in [
+            (InstanceUptimeResolution.FIVE_MINUTES, 600),
+            (InstanceUptimeResolution.HOUR, 60),
+            (InstanceUptimeResolution.DAY, 3)
+        ]:
+            rollup_instance_uptime(resolution, end=NOW, periods=periods)
+        purge_instance_uptime(NOW + timedelta(days=1))
+        self.assertFalse(
+            InstanceProbe.objects.filter(
+                checked_at__lt=NOW
+            ).exists()
+        )
+        self.assertFalse(
+            InstanceUptime.objects.filter(
+                resolution=InstanceUptimeResolution.FIVE_MINUTES,
+                period_start__lt=NOW
+            ).exists()
+        )
+        self.assertTrue(
+            InstanceUptime.objects.filter(
+                resolution=InstanceUptimeResolution.HOUR
+            ).exists()
+        )
+        self.assertEqual(
+            InstanceUptime.objects.filter(
+                resolution=InstanceUptimeResolution.DAY
+            ).count(),
+            2
+        )
+
+    def test_check_records_probes(self):
+        """Test checks append the probes with their interval."""
+        self.create_instance('down', InstanceStatus.ONLINE)
+
+        def handler(request):
+            if request.url.host.startswith('down'):
+                raise httpx.ConnectError('[Errno 111] Connection refused')
+            return httpx.Response(200)
+
+        checker = self.checker(handler)
+        check_instances(Instance.objects.all(), checker=checker)
+        probes = {
+            probe.instance.name: probe
+            for probe in InstanceProbe.objects.select_related('instance')
+        }
+        self.assertEqual(len(probes), 2)
+        self.assertTrue(probes['server'].online)
+        self.assertEqual(probes['server'].status_code, 200)
+        self.assertFalse(probes['down'].online)
+        self.assertTrue(probes['down'].reachable)
+        self.assertIsNone(probes['down'].status_code)
+        for probe in probes.values():
+            self.assertGreater(probe.interval_seconds, 0)
+
+    def test_api(self):
+        """Test uptime api."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse('instance-uptime', kwargs={'name': 'server'})
+        response = client.get(url, {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['uptime'])
+        self.assertEqual(response.data['probes'], 0)
+
+        response = client.get(url, {'days': 'all'})
+        self.assertEqual(response.status_code, 400)
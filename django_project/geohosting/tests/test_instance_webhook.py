@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from geohosting.models import Instance, InstanceStatus
+from geohosting.tests.test_instance_checker import BaseInstanceTests
+
+
+class InstanceWebhookTests(BaseInstanceTests):
+    """Argo CD events of running instances tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            user=User.objects.create_superuser(username='admin')
+        )
+
+    def post(self, instance, **data):
+        """Post Argo CD event of instance."""
+        return self.client.post(
+            '/api/webhook/',
+            data={
+                'app_name': f'devops-{instance.name}',
+                'source': 'ArgoCD',
+                **data
+            },
+            format='json'
+        )
+
+    def assertStatus(self, instance, status):
+        """Assert status of instance."""
+        instance.refresh_from_db()
+        self.assertEqual(instance.status, status)
+
+    @patch('geohosting.models.instance.Instance.update_sales_order')
+    def test_health(self, mock_update_sales_order):
+        """Test health drives the status without activity."""
+        instance = self.create_instance('server', InstanceStatus.DEPLOYING)
+
+        # Progressing is not used
+        response = self.post(instance, status='running', health='Progressing')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus(instance, InstanceStatus.DEPLOYING)
+
+        response = self.post(instance, status='synced', health='Healthy')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus(instance, InstanceStatus.STARTING_UP)
+
+        # Starting up is checked on the next run
+        Instance.objects.filter(id=instance.id).update(
+            next_check_at=timezone.now() + timedelta(minutes=10)
+        )
+        self.post(instance, status='synced', health='Healthy')
+        instance.refresh_from_db()
+        self.assertIsNone(instance.next_check_at)
+        self.assertEqual(instance.status, InstanceStatus.STARTING_UP)
+
+        # Online is confirmed, the next check is postponed
+        Instance.objects.filter(id=instance.id).update(
+            status=InstanceStatus.ONLINE
+        )
+        self.post(instance, status='synced', health='Healthy')
+        instance.refresh_from_db()
+        self.assertGreater(
+            instance.next_check_at, timezone.now() + timedelta(minutes=10)
+        )
+
+        response = self.post(instance, status='synced', health='Degraded')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus(instance, InstanceStatus.OFFLINE)
+        self.assertIsNone(instance.next_check_at)
+
+        self.post(instance, status='synced', health='Healthy')
+        self.assertStatus(instance, InstanceStatus.ONLINE)
+
+    @patch('geohosting.models.instance.Instance.cancel_subscription')
+    def test_deleted(self, mock_cancel_subscription):
+        """Test resource deletion makes the deleting instance deleted."""
+        online = self.create_instance('online', InstanceStatus.ONLINE)
+        self.post(online, status='deleted')
+        self.assertStatus(online, InstanceStatus.ONLINE)
+
+        deleting = self.create_instance('deleting', InstanceStatus.DELETING)
+        response = self.post(deleting, status='deleted')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatus(deleting, InstanceStatus.DELETED)
+        mock_cancel_subscription.assert_called_once()
+
+        deleting = self.create_instance('missing', InstanceStatus.DELETING)
+        self.post(deleting, status='synced', health='Missing')
+        self.assertStatus(deleting, InstanceStatus.DELETED)
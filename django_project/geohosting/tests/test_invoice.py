@@ -0,0 +1,141 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+
+from geohosting.factories import (
+    PackageFactory, SalesOrderFactory, ErpCompanyFactory
+)
+from geohosting.models import SalesOrder, SalesOrderStatus
+from geohosting.models.erp_company import ErpCompany, erp_company_post_save
+from geohosting.models.sales_order import InvoiceStatus, SalesOrderInvoice
+from geohosting.serializer.sales_order import SalesOrderSerializer
+from geohosting.tasks.invoice import materialise_pending_invoices
+from geohosting.tests.erpnext_server import FakeErpNextServer
+
+
+def save_to_storage(path, content):
+    """Read the content in chunks, like the storage does."""
+    size = sum(len(chunk) for chunk in content.chunks(chunk_size=1024))
+    save_to_storage.sizes.append(size)
+    return path
+
+
+@override_settings(ERPNEXT_DOWNLOAD_CHUNK_SIZE=1024)
+@patch('geohosting.utils.erpnext_client.time.sleep')
+@patch('geohosting.utils.erpnext.default_storage.save')
+class InvoiceTests(TestCase):
+    """Invoice pdf tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        post_save.disconnect(erp_company_post_save, sender=ErpCompany)
+        self.addCleanup(
+            post_save.connect, erp_company_post_save, sender=ErpCompany
+        )
+        self.server = FakeErpNextServer(pdf_size=100 * 1024).start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(ERPNEXT_BASE_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.erp_company = ErpCompanyFactory(erpnext_code='Company')
+        self.package = PackageFactory(erpnext_code='Package')
+        self.user = User.objects.create_user(username='user')
+        self.user.userprofile.erpnext_code = 'Customer'
+        self.user.userprofile.save()
+        save_to_storage.sizes = []
+
+    def create_order(self) -> SalesOrder:
+        """Create sales order that is pushed to erp."""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = SalesOrderFactory(
+                package=self.package, customer=self.user
+            )
+        order.refresh_from_db()
+        return order
+
+    def set_status(self, order: SalesOrder, status):
+        """Set order status, run the callbacks after commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            order.order_status = status.key
+            order.save()
+        order.refresh_from_db()
+
+    def download_requests(self):
+        """Return download pdf requests to the server."""
+        return [
+            request for request in self.server.erp.requests
+            if 'download_pdf' in request[1]
+        ]
+
+    def test_materialise_when_leaving_payment(self, mock_save, mock_sleep):
+        """Test invoice is stored in chunks when order leaves payment."""
+        mock_save.side_effect = save_to_storage
+        order = self.create_order()
+        self.assertIsNone(order.invoice_status)
+        self.assertEqual(self.download_requests(), [])
+
+        self.set_status(order, SalesOrderStatus.WAITING_CONFIGURATION)
+        self.assertEqual(len(self.download_requests()), 1)
+        self.assertEqual(save_to_storage.sizes, [100 * 1024])
+        self.assertEqual(
+            order.invoice.name, f'invoices/{order.erpnext_code}.pdf'
+        )
+        self.assertEqual(order.invoice_status, InvoiceStatus.READY)
+
+        # It is not downloaded again
+        self.set_status(order, SalesOrderStatus.WAITING_DEPLOYMENT)
+        self.assertEqual(len(self.download_requests()), 1)
+
+    def test_materialise_from_sales_invoice(self, mock_save, mock_sleep):
+        """Test invoice is generated from sales invoice."""
+        mock_save.side_effect = save_to_storage
+        self.erp_company.invoice_from_sales_invoice = True
+        self.erp_company.save()
+        order = self.create_order()
+        self.set_status(order, SalesOrderStatus.WAITING_DEPLOYMENT)
+
+        invoice = SalesOrderInvoice.objects.get(sales_order=order)
+        self.assertIsNotNone(invoice.erpnext_code)
+        self.assertEqual(
+            invoice.invoice.name, f'invoices/{invoice.erpnext_code}.pdf'
+        )
+        self.assertFalse(order.invoice)
+        self.assertEqual(order.invoice_url, invoice.invoice_url)
+        self.assertEqual(order.invoice_status, InvoiceStatus.READY)
+
+    def test_serializer_pending(self, mock_save, mock_sleep):
+        """Test serializer never downloads the pdf."""
+        mock_save.return_value = None
+        order = self.create_order()
+        SalesOrder.objects.filter(pk=order.pk).update(
+            order_status=SalesOrderStatus.WAITING_CONFIGURATION.key
+        )
+        self.server.erp.requests.clear()
+        data = SalesOrderSerializer(
+            SalesOrder.objects.filter(pk=order.pk), many=True
+        ).data
+        self.assertIsNone(data[0]['invoice_url'])
+        self.assertEqual(data[0]['invoice_status'], InvoiceStatus.PENDING)
+        self.assertEqual(self.download_requests(), [])
+
+    def test_pending_invoices_sweep(self, mock_save, mock_sleep):
+        """Test the sweep materialises the missed invoices."""
+        mock_save.side_effect = save_to_storage
+        waiting_payment = self.create_order()
+        missed = self.create_order()
+        SalesOrder.objects.filter(pk=missed.pk).update(
+            order_status=SalesOrderStatus.WAITING_CONFIGURATION.key
+        )
+        self.assertEqual(
+            list(SalesOrder.invoice_pending_orders()), [missed]
+        )
+
+        materialise_pending_invoices()
+        missed.refresh_from_db()
+        self.assertEqual(missed.invoice_status, InvoiceStatus.READY)
+        self.assertEqual(SalesOrder.invoice_pending_orders().count(), 0)
+        waiting_payment.refresh_from_db()
+        self.assertFalse(waiting_payment.invoice)
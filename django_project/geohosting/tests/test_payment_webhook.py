@@ -0,0 +1,350 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from geohosting.models import Subscription
+from geohosting.models.data_types import PaymentMethod
+from geohosting.tasks.subscription import (
+    process_payment_event, sync_subscriptions
+)
+from geohosting.utils.gateway_rate_limit import RateLimitExceeded
+from geohosting.utils.subscription import (
+    StripeSubscriptionGateway, SubscriptionData
+)
+from geohosting_event.models import PaymentEvent
+
+STRIPE_SECRET = 'whsec_test'
+PAYSTACK_SECRET = 'sk_test'
+
+
+@override_settings(
+    STRIPE_WEBHOOK_SECRET=STRIPE_SECRET,
+    PAYSTACK_SECRET_KEY=PAYSTACK_SECRET
+)
+class PaymentWebhookTests(TestCase):
+    """Payment webhook tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='user')
+        now = timezone.now()
+        self.stripe_subscription = Subscription.objects.create(
+            subscription_id='sub_1',
+            customer=self.user,
+            payment_method=PaymentMethod.STRIPE,
+            current_period_start=now - timedelta(days=30),
+            current_period_end=now
+        )
+        self.paystack_subscription = Subscription.objects.create(
+            subscription_id='123',
+            customer=self.user,
+            payment_method=PaymentMethod.PAYSTACK,
+            current_period_start=now - timedelta(days=30),
+            current_period_end=now
+        )
+
+    def post_stripe(self, data: dict, secret: str = STRIPE_SECRET):
+        """Post signed stripe event."""
+        payload = json.dumps(data)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f'{timestamp}.{payload}'.encode(),
+            hashlib.sha256
+        ).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('webhook-stripe'), data=payload,
+                content_type='application/json',
+                headers={'Stripe-Signature': f't={timestamp},v1={signature}'}
+            )
+
+    def post_paystack(self, data: dict, secret: str = PAYSTACK_SECRET):
+        """Post signed paystack event."""
+        payload = json.dumps(data).encode()
+        signature = hmac.new(
+            secret.encode(), payload, hashlib.sha512
+        ).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('webhook-paystack'), data=payload,
+                content_type='application/json',
+                headers={'X-Paystack-Signature': signature}
+            )
+
+    def stripe_subscription_event(
+            self, period_end, event_id='evt_1', created=None
+    ):
+        """Return customer.subscription.updated event."""
+        return {
+            'id': event_id,
+            'object': 'event',
+            'created': created or int(time.time()),
+            'type': 'customer.subscription.updated',
+            'data': {
+                'object': {
+                    'id': 'sub_1',
+                    'object': 'subscription',
+                    'customer': 'cus_1',
+                    'current_period_start': period_end - 30 * 86400,
+                    'current_period_end': period_end,
+                    'canceled_at': None,
+                    'latest_invoice': None,
+                    'discount': {
+                        'coupon': {
+                            'amount_off': None,
+                            'percent_off': 10,
+                            'name': 'TEN'
+                        }
+                    },
+                    'plan': {
+                        'currency': 'usd',
+                        'interval': 'month',
+                        'amount': 1000
+                    }
+                }
+            }
+        }
+
+    def test_invalid_signature(self):
+        """Test event with invalid signature is rejected."""
+        response = self.post_stripe(
+            self.stripe_subscription_event(int(time.time())), 'whsec_other'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.post_paystack({'event': 'charge.success'}, 'other')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PaymentEvent.objects.count(), 0)
+
+    @patch('geohosting.utils.subscription.get_stripe_invoice_detail')
+    @patch('geohosting.utils.subscription.get_stripe_subscription_detail')
+    def test_stripe_subscription_event(
+            self, mock_subscription_detail, mock_invoice_detail
+    ):
+        """Test subscription of the event is saved without fetching it."""
+        period_end = int(time.time()) + 30 * 86400
+        data = self.stripe_subscription_event(period_end)
+        for _ in range(2):
+            response = self.post_stripe(data)
+            self.assertEqual(response.status_code, 200)
+
+        event = PaymentEvent.objects.get()
+        self.assertEqual(event.event_type, 'customer.subscription.updated')
+        self.assertIsNotNone(event.processed_at)
+        mock_subscription_detail.assert_not_called()
+        mock_invoice_detail.assert_not_called()
+
+        self.stripe_subscription.refresh_from_db()
+        self.assertEqual(
+            int(self.stripe_subscription.current_period_end.timestamp()),
+            period_end
+        )
+        self.assertEqual(self.stripe_subscription.customer_payment_id, 'cus_1')
+        self.assertIsNotNone(self.stripe_subscription.synced_at)
+
+    @patch('geohosting.utils.payment_webhook.apply_stripe_event')
+    def test_event_is_retried(self, mock_apply_stripe_event):
+        """Test event that fails with transient error is retried."""
+        mock_apply_stripe_event.side_effect = [
+            RateLimitExceeded('No stripe budget for batch requests'),
+            'Applied'
+        ]
+        response = self.post_stripe(
+            self.stripe_subscription_event(int(time.time()))
+        )
+        self.assertEqual(response.status_code, 200)
+        event = PaymentEvent.objects.get()
+        self.assertEqual(
+            event.note, 'No stripe budget for batch requests'
+        )
+        self.assertIsNone(event.processed_at)
+
+        # The retry applies it
+        process_payment_event.delay(event.id)
+        event.refresh_from_db()
+        self.assertEqual(event.note, 'Applied')
+        self.assertIsNotNone(event.processed_at)
+
+    @patch('geohosting.utils.payment_webhook.apply_stripe_event')
+    def test_event_is_not_retried(self, mock_apply_stripe_event):
+        """Test event that fails with other error stays in the note."""
+        mock_apply_stripe_event.side_effect = KeyError('plan')
+        response = self.post_stripe(
+            self.stripe_subscription_event(int(time.time()))
+        )
+        self.assertEqual(response.status_code, 200)
+        mock_apply_stripe_event.assert_called_once()
+        event = PaymentEvent.objects.get()
+        self.assertEqual(event.note, "'plan'")
+        self.assertIsNone(event.processed_at)
+
+    def test_stripe_subscription_event_order(self):
+        """Test older subscription event does not revert the newer one."""
+        created = int(time.time())
+        period_end = created + 30 * 86400
+        self.post_stripe(
+            self.stripe_subscription_event(
+                period_end, 'evt_new', created
+            )
+        )
+        self.post_stripe(
+            self.stripe_subscription_event(
+                period_end - 30 * 86400, 'evt_old', created - 60
+            )
+        )
+        self.assertEqual(
+            PaymentEvent.objects.get(event_id='evt_old').note,
+            f'Subscription {self.stripe_subscription.id} has a newer event, '
+            f'it is skipped'
+        )
+        self.stripe_subscription.refresh_from_db()
+        self.assertEqual(
+            int(self.stripe_subscription.current_period_end.timestamp()),
+            period_end
+        )
+        self.assertEqual(
+            int(self.stripe_subscription.gateway_event_at.timestamp()),
+            created
+        )
+
+    @patch('geohosting.utils.payment_webhook._sync_subscription')
+    @patch('geohosting.utils.payment_webhook.PaystackSubscription.fetch')
+    def test_paystack_events(self, mock_fetch, mock_sync_subscription):
+        """Test paystack event syncs the subscription of the code."""
+        mock_fetch.return_value = {'data': {'id': 123}}
+        mock_sync_subscription.return_value = 'Synced'
+        data = {
+            'event': 'invoice.update',
+            'data': {
+                'subscription': {'subscription_code': 'SUB_1'},
+                'paid': True
+            }
+        }
+        for _ in range(2):
+            self.assertEqual(self.post_paystack(data).status_code, 200)
+        mock_fetch.assert_called_once_with('SUB_1')
+        mock_sync_subscription.assert_called_once_with(
+            self.paystack_subscription
+        )
+
+        self.post_paystack({'event': 'customer.identification', 'data': {}})
+        self.assertEqual(
+            PaymentEvent.objects.get(
+                event_type='customer.identification'
+            ).note,
+            'Event is not used'
+        )
+
+    @override_settings(STRIPE_BULK_RECONCILE_MIN=1)
+    @patch('geohosting.models.subscription.Subscription.sync_subscription')
+    @patch('geohosting.utils.subscription.get_stripe_invoice_detail')
+    @patch('geohosting.utils.subscription.get_stripe_subscription_detail')
+    @patch('geohosting.utils.subscription.list_stripe_subscriptions')
+    def test_bulk_reconciliation(
+            self, mock_list, mock_subscription_detail, mock_invoice_detail,
+            mock_sync_subscription
+    ):
+        """Test stripe subscriptions are synced from the list."""
+        period_end = int(time.time()) + 30 * 86400
+        remote = self.stripe_subscription_event(period_end)['data']['object']
+        remote['customer'] = {'id': 'cus_1', 'object': 'customer'}
+        remote['latest_invoice'] = {
+            'id': 'in_1',
+            'object': 'invoice',
+            'discount': remote.pop('discount')
+        }
+        mock_list.return_value = iter([{'id': 'sub_other'}, remote])
+        sync_subscriptions()
+
+        # The list skips the subscriptions that ended before the due ones
+        mock_list.assert_called_once_with(
+            current_period_end_gte=int(
+                self.stripe_subscription.current_period_end.timestamp()
+            )
+        )
+        mock_subscription_detail.assert_not_called()
+        mock_invoice_detail.assert_not_called()
+        # Only the paystack subscription is synced one by one
+        mock_sync_subscription.assert_called_once()
+        self.stripe_subscription.refresh_from_db()
+        self.assertEqual(
+            int(self.stripe_subscription.current_period_end.timestamp()),
+            period_end
+        )
+        self.assertEqual(self.stripe_subscription.customer_payment_id, 'cus_1')
+        self.assertIsNotNone(self.stripe_subscription.synced_at)
+
+    @override_settings(
+        STRIPE_BULK_RECONCILE_MIN=1, STRIPE_BULK_RECONCILE_MAX_PAGES=1
+    )
+    @patch('geohosting.models.subscription.Subscription.sync_subscription')
+    @patch('geohosting.utils.subscription.list_stripe_subscriptions')
+    def test_bulk_reconciliation_is_capped(
+            self, mock_list, mock_sync_subscription
+    ):
+        """Test the list is not paged through for a missing subscription."""
+        remotes = ({'id': f'sub_other_{idx}'} for idx in range(1000))
+        mock_list.return_value = remotes
+        sync_subscriptions()
+
+        # Only one page is read, both are synced one by one
+        self.assertEqual(len(list(remotes)), 900)
+        self.assertEqual(mock_sync_subscription.call_count, 2)
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    )
+    @patch.object(StripeSubscriptionGateway, '_get_subscription_data')
+    def test_detail_cache(self, mock_get_subscription_data):
+        """Test detail is cached until the subscription changes."""
+        period_end = int(time.time()) + 30 * 86400
+        mock_get_subscription_data.return_value = SubscriptionData(
+            id='sub_1', customer_id='cus_1',
+            current_period_start=period_end - 30 * 86400,
+            current_period_end=period_end,
+            canceled=False, currency='usd', period='month', amount=1000,
+            latest_invoice=None
+        )
+        subscription = self.stripe_subscription
+        subscription.customer_payment_id = 'cus_1'
+        subscription.save()
+        subscription.invalidate_detail()
+
+        self.assertEqual(subscription.detail['amount'], 10)
+        self.assertEqual(subscription.detail['amount'], 10)
+        self.assertEqual(mock_get_subscription_data.call_count, 1)
+
+        # Reading the detail does not save the subscription
+        subscription.refresh_from_db()
+        self.assertIsNone(subscription.synced_at)
+
+        # Payment method of the customer is changed
+        self.post_paystack({'event': 'customer.identification', 'data': {}})
+        subscription.detail  # noqa
+        self.assertEqual(mock_get_subscription_data.call_count, 1)
+        self.post_stripe({
+            'id': 'evt_2',
+            'object': 'event',
+            'type': 'customer.updated',
+            'data': {'object': {'id': 'cus_1', 'object': 'customer'}}
+        })
+        subscription.detail  # noqa
+        self.assertEqual(mock_get_subscription_data.call_count, 2)
+
+        # Saving from the gateway invalidates it too
+        subscription.sync_subscription()
+        subscription.detail  # noqa
+        self.assertEqual(mock_get_subscription_data.call_count, 4)
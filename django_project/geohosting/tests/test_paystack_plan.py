@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from geohosting.models import Package, PaystackPlan, Product
+
+
+def plan_data(code, amount=10000, **kwargs):
+    """Return plan of paystack."""
+    return {
+        'id': f'ID_{code}',
+        'plan_code': code,
+        'name': f'Plan {code}',
+        'amount': amount,
+        'currency': 'ZAR',
+        'interval': 'monthly',
+        'is_deleted': False,
+        'is_archived': False,
+        **kwargs
+    }
+
+
+class PaystackPlanTests(TestCase):
+    """Paystack plan registry tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        product = Product.objects.create(
+            name='Test Product',
+            order=1,
+            upstream_id='123',
+            description='Test Description',
+            available=True
+        )
+        self.package = Package.objects.create(
+            product=product,
+            name='Test Package',
+            price=100.00,
+            currency='ZAR',
+            periodicity='monthly',
+            feature_list={'spec': ['10 GB Storage']}
+        )
+
+    @patch('paystackapi.plan.Plan.list')
+    @patch('paystackapi.plan.Plan.create')
+    def test_plan_is_reused(self, mock_plan_create, mock_plan_list):
+        """Test plan is created once for the same pricing."""
+        mock_plan_create.side_effect = [
+            {'status': True, 'data': plan_data('PLN_1')},
+            {'status': True, 'data': plan_data('PLN_2', 9000)},
+        ]
+        metadata = {
+            'discount_code': 'CODE',
+            'discount_percentage': 10,
+            'discounted_amount': 9000.0
+        }
+        for email in ['a@test.com', 'b@test.com']:
+            self.assertEqual(
+                self.package.get_paystack_plan(email)['plan_code'], 'PLN_1'
+            )
+            self.assertEqual(
+                self.package.get_paystack_plan(email, metadata)['plan_code'],
+                'PLN_2'
+            )
+        self.assertEqual(mock_plan_create.call_count, 2)
+        self.assertEqual(
+            mock_plan_create.call_args_list[0].kwargs['amount'], 10000
+        )
+        mock_plan_list.assert_not_called()
+
+        plan = PaystackPlan.objects.get(plan_code='PLN_2')
+        self.assertEqual(plan.amount, 9000)
+        self.assertEqual(plan.discount_signature, '10::')
+
+    @patch('paystackapi.base.PayStackRequests.get')
+    def test_sync(self, mock_get):
+        """Test plans that are not usable anymore are deactivated."""
+        for code, amount in [
+            ('PLN_1', 10000), ('PLN_2', 20000), ('PLN_3', 30000),
+            ('PLN_4', 40000)
+        ]:
+            PaystackPlan.objects.create(
+                plan_id=f'ID_{code}', plan_code=code, name=code,
+                amount=amount, currency='ZAR', interval='monthly'
+            )
+        mock_get.side_effect = [
+            {
+                'status': True,
+                'data': [plan_data('PLN_1'), plan_data('OTHER')],
+                'meta': {'pageCount': 2}
+            },
+            {
+                'status': True,
+                'data': [
+                    plan_data('PLN_2', 20000, is_archived=True),
+                    plan_data('PLN_3', 35000)
+                ],
+                'meta': {'pageCount': 2}
+            }
+        ]
+        PaystackPlan.sync()
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(
+            list(
+                PaystackPlan.objects.filter(is_active=True).values_list(
+                    'plan_code', flat=True
+                )
+            ),
+            ['PLN_1']
+        )
+        self.assertEqual(
+            PaystackPlan.objects.get(plan_code='PLN_1').name, 'Plan PLN_1'
+        )
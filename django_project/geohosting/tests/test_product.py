@@ -3,7 +3,7 @@ from unittest.mock import patch, MagicMock
 
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -119,9 +119,12 @@ class FetchProductsTestCase(TestCase):
             username='admin', password='password', is_staff=True)
         self.url = reverse('fetch_products')
 
-    @patch('geohosting.views.products.fetch_erpnext_data')
-    @patch('geohosting.utils.erpnext.requests.get')
-    def test_fetch_products_success(self, mock_get, mock_fetch_erpnext_data):
+    @override_settings(ERPNEXT_BASE_URL='https://erp.example.com')
+    @patch('geohosting.utils.product_catalog.fetch_erpnext_data')
+    @patch('geohosting.utils.erpnext.get_erp_client')
+    def test_fetch_products_success(
+            self, mock_get_erp_client, mock_fetch_erpnext_data
+    ):
         # Mocking the ERPNext data fetch
         mock_fetch_erpnext_data.side_effect = [
             [
@@ -158,10 +161,11 @@ class FetchProductsTestCase(TestCase):
             ]
         ]
 
-        # Mocking the image download
+        # Mocking the detail fetch of the ERPNext client
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.content = b'fake image content'
+        mock_response.json.return_value = {'data': {'attributes': []}}
+        mock_get = mock_get_erp_client.return_value.get
         mock_get.return_value = mock_response
 
         self.client.force_authenticate(user=self.user)
@@ -169,6 +173,12 @@ class FetchProductsTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'success')
+        mock_get.assert_called()
+        self.assertTrue(
+            mock_get.call_args.args[0].startswith(
+                'https://erp.example.com/api/resource/Item'
+            )
+        )
 
         # Ensure products were created
         self.assertEqual(Product.objects.count(), 2)
@@ -194,10 +204,12 @@ class FetchProductsTestCase(TestCase):
         self.assertEqual(product2.name, 'Product 2')
         self.assertFalse(product2.available)
 
-    @patch('geohosting.views.products.fetch_erpnext_data')
-    @patch('geohosting.utils.erpnext.requests.get')
-    def test_fetch_products_image_download_fail(self, mock_get,
-                                                mock_fetch_erpnext_data):
+    @override_settings(ERPNEXT_BASE_URL='https://erp.example.com')
+    @patch('geohosting.utils.product_catalog.fetch_erpnext_data')
+    @patch('geohosting.utils.erpnext.get_erp_client')
+    def test_fetch_products_image_download_fail(
+            self, mock_get_erp_client, mock_fetch_erpnext_data
+    ):
         # Mocking the ERPNext data fetch
         mock_fetch_erpnext_data.side_effect = [[
             {'name': 'product_2', 'item_name': 'Product 2',
@@ -205,9 +217,10 @@ class FetchProductsTestCase(TestCase):
              'image': ''}
         ]]
 
-        # Mocking the image download failure
+        # Mocking the detail fetch failure of the ERPNext client
         mock_response = MagicMock()
         mock_response.status_code = 404
+        mock_get = mock_get_erp_client.return_value.get
         mock_get.return_value = mock_response
 
         self.client.force_authenticate(user=self.user)
@@ -215,6 +228,7 @@ class FetchProductsTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'success')
+        mock_get.assert_called()
 
         # Ensure product was created without image
         product1 = Product.objects.get(upstream_id='product_2')
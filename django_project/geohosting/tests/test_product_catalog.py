@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from geohosting.models import Package, Product
+from geohosting.tests.erpnext_server import FakeErpNextServer
+from geohosting.utils.product_catalog import ProductCatalogSync
+
+
+@patch('geohosting.utils.erpnext_client.time.sleep')
+class ProductCatalogSyncTests(TestCase):
+    """Product catalog sync tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.server = FakeErpNextServer().start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(ERPNEXT_BASE_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        erp = self.server.erp
+        erp.add('Item Attribute', {
+            'name': 'Host Specifications',
+            'item_attribute_values': [
+                {'abbr': 'DO', 'attribute_value': '2 CPU; 4 GB RAM'}
+            ]
+        })
+        for product in ['GeoNode', 'GeoServer', 'BIMS']:
+            erp.add('Item', {
+                'name': product,
+                'item_code': product,
+                'item_name': product,
+                'item_group': 'GeoHosting',
+                'available_in_geohosting': 1,
+                'description': (
+                    '<p><strong>Short Description</strong></p>'
+                    f'<p>{product} description</p>'
+                ),
+                'attributes': [{'attribute': 'Host Specifications'}]
+            })
+            package = f'{product}-DO'
+            erp.add('Item', {
+                'name': package,
+                'item_code': package,
+                'item_group': 'GeoHosting',
+                'variant_of': product
+            })
+            for currency in ['USD', 'EUR']:
+                erp.add('Item Price', {
+                    'name': f'{package}-{currency}',
+                    'item_code': package,
+                    'item_name': package,
+                    'price_list': 'Standard Selling',
+                    'price_list_rate': 10,
+                    'currency': currency
+                })
+
+    def writes(self, context):
+        """Return insert and update queries."""
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+
+    def test_sync(self, mock_sleep):
+        """Test catalog is synced and the attribute is fetched once."""
+        report = ProductCatalogSync().run()
+        self.assertEqual(
+            sorted(report['products']['added']),
+            ['BIMS', 'GeoNode', 'GeoServer']
+        )
+        self.assertEqual(len(report['packages']['added']), 6)
+        self.assertEqual(report['errors'], [])
+
+        package = Package.objects.get(erpnext_code='GeoNode-DO-USD')
+        self.assertEqual(package.product.upstream_id, 'GeoNode')
+        self.assertEqual(
+            package.feature_list, {'spec': ['2 CPU', '4 GB RAM']}
+        )
+        self.assertEqual(package.package_group.name, 'GeoNode-DO')
+        self.assertEqual(
+            Product.objects.get(
+                upstream_id='BIMS'
+            ).productmetadata_set.get(key='short_description').value,
+            'BIMS description'
+        )
+        self.assertEqual(
+            len([
+                request for request in self.server.erp.requests
+                if 'Item%20Attribute' in request[1]
+            ]),
+            1
+        )
+
+    def test_only_changes_are_written(self, mock_sleep):
+        """Test unchanged rows are not written."""
+        ProductCatalogSync().run()
+
+        with CaptureQueriesContext(connection) as context:
+            report = ProductCatalogSync().run()
+        self.assertEqual(self.writes(context), [])
+        for rows in [report['products'], report['packages']]:
+            self.assertEqual(
+                rows, {'added': [], 'changed': [], 'removed': []}
+            )
+
+        erp = self.server.erp
+        erp.update('Item Price', 'BIMS-DO-EUR', {'price_list_rate': 12})
+        erp.docs['Item Price'].pop('BIMS-DO-USD')
+        erp.docs['Item'].pop('GeoServer')
+        with CaptureQueriesContext(connection) as context:
+            report = ProductCatalogSync().run()
+        self.assertEqual(report['products']['removed'], ['GeoServer'])
+        self.assertEqual(report['packages']['changed'], ['BIMS-DO-EUR'])
+        self.assertEqual(report['packages']['removed'], ['BIMS-DO-USD'])
+        self.assertEqual(len(self.writes(context)), 2)
+
+        self.assertFalse(
+            Product.objects.get(upstream_id='GeoServer').available
+        )
+        self.assertEqual(
+            Package.objects.get(erpnext_code='BIMS-DO-EUR').price, 12
+        )
+        self.assertFalse(
+            Package.objects.get(erpnext_code='BIMS-DO-USD').enabled
+        )
@@ -0,0 +1,127 @@
+import hashlib
+from unittest.mock import patch
+
+import requests_mock
+from django.test import TestCase, override_settings
+
+from geohosting.models import Product
+
+ERP_URL = 'https://erp.example.com'
+IMAGE_URL = f'{ERP_URL}/files/geonode.png'
+MAIN_URL = (
+    f'{ERP_URL}/assets/geohosting/images/Product_Images/GeoNode/main.png'
+)
+SECONDARY_URL = (
+    f'{ERP_URL}/assets/geohosting/images/Product_Images/GeoNode/'
+    f'secondary.png'
+)
+
+
+def checksum(content: bytes):
+    """Return sha256 of content."""
+    return hashlib.sha256(content).hexdigest()
+
+
+@override_settings(ERPNEXT_BASE_URL=ERP_URL)
+@patch('geohosting.utils.erpnext.default_storage')
+class ProductMediaSyncTests(TestCase):
+    """Product media sync tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.product = Product.objects.create(
+            name='GeoNode', upstream_id='GeoNode'
+        )
+
+    def mock_erp(self, mock, image=b'image', etag='"v1"'):
+        """Mock item detail and the images."""
+        mock.get(
+            f'{ERP_URL}/api/resource/Item/GeoNode',
+            json={
+                'data': {
+                    'image': '/files/geonode.png',
+                    'description': (
+                        '<p><strong>overview header</strong></p>'
+                        '<p>Header</p>'
+                        '<p><strong>overview description</strong></p>'
+                        '<p>Description</p>'
+                    )
+                }
+            }
+        )
+
+        def image_response(request, context):
+            if etag and request.headers.get('If-None-Match') == etag:
+                context.status_code = 304
+                return b''
+            if etag:
+                context.headers['ETag'] = etag
+            return image
+
+        for url in [IMAGE_URL, MAIN_URL, SECONDARY_URL]:
+            mock.get(url, content=image_response)
+
+    def image_requests(self, mock):
+        """Return image requests, with the If-None-Match header."""
+        return [
+            (request.url, request.headers.get('If-None-Match'))
+            for request in mock.request_history
+            if '/api/resource/' not in request.url
+        ]
+
+    def test_sync_media(self, mock_storage):
+        """Test images are stored by checksum and not downloaded again."""
+        mock_storage.exists.return_value = False
+        mock_storage.save.side_effect = lambda path, content: path
+        with requests_mock.Mocker() as mock:
+            self.mock_erp(mock)
+            self.product.sync_media()
+            self.assertEqual(
+                self.image_requests(mock),
+                [(IMAGE_URL, None), (MAIN_URL, None)]
+            )
+
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.image.name,
+            f'product_images/{checksum(b"image")}.png'
+        )
+        self.assertEqual(self.product.image_etag, '"v1"')
+        media = self.product.images.get()
+        self.assertEqual(
+            media.image.name, f'product_media/{checksum(b"image")}.png'
+        )
+        self.assertEqual(media.title, 'Header')
+        self.assertEqual(mock_storage.save.call_count, 2)
+
+        # Conditional GET, nothing is stored
+        with requests_mock.Mocker() as mock:
+            self.mock_erp(mock)
+            self.product.sync_media()
+            self.assertEqual(
+                self.image_requests(mock),
+                [(IMAGE_URL, '"v1"'), (MAIN_URL, '"v1"')]
+            )
+        self.assertEqual(mock_storage.save.call_count, 2)
+
+    def test_sync_media_without_etag(self, mock_storage):
+        """Test unchanged content is not stored again without etag."""
+        mock_storage.exists.return_value = False
+        mock_storage.save.side_effect = lambda path, content: path
+        with requests_mock.Mocker() as mock:
+            self.mock_erp(mock, etag=None)
+            self.product.sync_media()
+            self.product.sync_media()
+        self.assertEqual(mock_storage.save.call_count, 2)
+
+        # Content is changed
+        with requests_mock.Mocker() as mock:
+            self.mock_erp(mock, image=b'new image', etag=None)
+            self.product.sync_media()
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.image.name,
+            f'product_images/{checksum(b"new image")}.png'
+        )
+        self.assertEqual(self.product.images.count(), 1)
+        self.assertEqual(mock_storage.save.call_count, 4)
@@ -66,9 +66,12 @@ class SalesOrderTests(TestCase):
             "status": "success", "data": {}
         }
 
-        sales_order = SalesOrderFactory(
-            package=self.package, customer=self.user
-        )
+        # Pushed to erp by the outbox after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            sales_order = SalesOrderFactory(
+                package=self.package, customer=self.user
+            )
+        sales_order.refresh_from_db()
         self.assertEqual(sales_order.package, self.package)
         self.assertEqual(sales_order.customer, self.user)
         self.assertEqual(sales_order.erpnext_code, 'erpnext_1')
@@ -93,9 +96,14 @@ class SalesOrderTests(TestCase):
             SalesOrderStatus.WAITING_CONFIGURATION.key
         )
 
-        # Add app name
+        # Add app name, it is deployed after the push to erp
         sales_order.app_name = 'test'
-        sales_order.save()
+        with patch(
+                'geohosting.models.sales_order.SalesOrder.request_invoice'
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                sales_order.save()
+        sales_order.refresh_from_db()
         self.assertEqual(
             sales_order.order_status,
             SalesOrderStatus.WAITING_DEPLOYMENT.key
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models.preferences import Preferences
+from geohosting.models import Subscription
+from geohosting.models.data_types import PaymentMethod
+from geohosting.tasks.subscription import (
+    sync_subscription, sync_subscriptions
+)
+
+
+class SubscriptionSchedulerTests(TestCase):
+    """Subscription renewal scheduler tests."""
+
+    def setUp(self):
+        """Setup test case."""
+        self.user = User.objects.create_user(username='user')
+        pref = Preferences.load()
+        pref.grace_period_days = 7
+        pref.save()
+
+    def create_subscription(self, name, period_end, synced_at=None):
+        """Create paystack subscription."""
+        return Subscription.objects.create(
+            subscription_id=name,
+            customer=self.user,
+            payment_method=PaymentMethod.PAYSTACK,
+            current_period_start=period_end - timedelta(days=30),
+            current_period_end=period_end,
+            synced_at=synced_at
+        )
+
+    @override_settings(SUBSCRIPTION_ROTATION_BATCH_SIZE=1)
+    @patch.object(Subscription, 'sync_subscription', autospec=True)
+    def test_sync_subscriptions(self, mock_sync_subscription):
+        """Test the due subscriptions are synced in their own task."""
+        now = timezone.now()
+        hour = timedelta(hours=1)
+        day = timedelta(days=1)
+        for name, period_end, synced_at in [
+            # Renewal window, synced more than 15 minutes ago
+            ('ending', now + hour, now - hour),
+            ('ended', now - hour, None),
+            ('grace', now - 7 * day, now - hour),
+            # Renewal window, synced recently
+            ('ending-synced', now + hour, now),
+            # Outside of the window, synced recently
+            ('future', now + 10 * day, now - hour),
+            ('expired', now - 30 * day, now - hour),
+            # Outside of the window, stale, the oldest first
+            ('future-stale', now + 10 * day, now - 2 * day),
+            ('future-staler', now + 10 * day, now - 3 * day),
+            ('never-synced', now + 10 * day, None),
+        ]:
+            self.create_subscription(name, period_end, synced_at)
+        Subscription.objects.filter(
+            subscription_id='never-synced'
+        ).update(is_active=False)
+
+        self.assertEqual(sync_subscriptions(), 4)
+        self.assertEqual(
+            sorted(
+                call.args[0].subscription_id
+                for call in mock_sync_subscription.call_args_list
+            ),
+            ['ended', 'ending', 'future-staler', 'grace']
+        )
+
+    @patch.object(Subscription, 'sync_subscription', autospec=True)
+    def test_sync_subscription_once(self, mock_sync_subscription):
+        """Test the subscription synced after scheduled is skipped."""
+        now = timezone.now()
+        subscription = self.create_subscription('ending', now, now)
+        sync_subscription(subscription.id, now.timestamp() - 60)
+        mock_sync_subscription.assert_not_called()
+
+        sync_subscription(subscription.id, now.timestamp() + 60)
+        sync_subscription(-1, now.timestamp())
+        mock_sync_subscription.assert_called_once()
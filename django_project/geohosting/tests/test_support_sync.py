@@ -1,9 +1,10 @@
 import mock
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 
 from core.models.preferences import Preferences
+from geohosting.models.erp_model import ErpSyncState
 from geohosting.models.support import Ticket
 
 
@@ -246,3 +247,152 @@ class TicketSyncTests(TestCase):
             tickets[2].created_at.strftime('%Y-%m-%d %H:%M:%S.%f'),
             "2000-02-01 00:00:00.000000"
         )
+
+    @mock.patch('geohosting.models.support.fetch_erpnext_data')
+    def test_incremental_sync(self, mock_fetch_erpnext_data):
+        mock_fetch_erpnext_data.return_value = [
+            {
+                'customer': 'User - 1',
+                'raised_by': 'testuser@test.com',
+                'subject': 'Subject 1',
+                'description': 'Description 1',
+                'creation': "2000-01-01 00:00:00.000000",
+                'modified': "2000-01-02 00:00:00.000000",
+                'status': 'Open',
+                'name': 'Ticket -1'
+            },
+            {
+                'customer': 'User - 1',
+                'raised_by': 'testuser@test.com',
+                'subject': 'Subject 2',
+                'description': 'Description 2',
+                'creation': "2000-01-01 00:00:00.000000",
+                'modified': "2000-01-05 10:00:00.000000",
+                'status': 'Open',
+                'name': 'Ticket -2'
+            }
+        ]
+        Ticket.sync_data()
+        self.assertEqual(
+            mock_fetch_erpnext_data.call_args.kwargs['filters'],
+            [["project", "=", "erpnext_project_code"]]
+        )
+        state = ErpSyncState.objects.get(model_name='Ticket')
+        self.assertEqual(state.watermark, "2000-01-05 10:00:00.000000")
+        self.assertIsNotNone(state.last_full_synced_at)
+
+        # Next sync just request the modified one
+        mock_fetch_erpnext_data.return_value = []
+        Ticket.sync_data()
+        self.assertEqual(
+            mock_fetch_erpnext_data.call_args.kwargs['filters'],
+            [
+                ["project", "=", "erpnext_project_code"],
+                ["modified", ">=", "2000-01-05 09:59:00.000000"]
+            ]
+        )
+        self.assertEqual(Ticket.objects.count(), 2)
+
+        # Full sync deletes the ticket that is deleted on ERP
+        Ticket.objects.update(created_at='2000-01-01 00:00:00.000000')
+        rows = [
+            {
+                'customer': 'User - 1',
+                'raised_by': 'testuser@test.com',
+                'subject': 'Subject 2',
+                'description': 'Description 2',
+                'creation': "2000-01-01 00:00:00.000000",
+                'modified': "2000-01-05 10:00:00.000000",
+                'status': 'Closed',
+                'name': 'Ticket -2'
+            }
+        ]
+        mock_fetch_erpnext_data.reset_mock()
+        mock_fetch_erpnext_data.side_effect = [rows, []]
+        Ticket.sync_data(full=True)
+        sync_call, check_call = mock_fetch_erpnext_data.call_args_list
+        self.assertEqual(
+            sync_call.kwargs['filters'],
+            [["project", "=", "erpnext_project_code"]]
+        )
+        self.assertEqual(sync_call.kwargs['order_by'], 'creation asc')
+        self.assertEqual(
+            check_call.kwargs['filters'], [["name", "in", ['Ticket -1']]]
+        )
+        self.assertEqual(
+            list(Ticket.objects.values_list('erpnext_code', 'status')),
+            [('Ticket -2', 'closed')]
+        )
+
+    @mock.patch('geohosting.models.support.fetch_erpnext_data')
+    def test_full_sync_keeps_skipped_ticket(self, mock_fetch_erpnext_data):
+        """Ticket that is missed by the paging is not deleted."""
+        for code in ['Ticket -1', 'Ticket -2']:
+            Ticket.objects.create(
+                erpnext_code=code,
+                customer='testuser@test.com',
+                status='open',
+                subject=code,
+                details=code
+            )
+        Ticket.objects.update(created_at='2000-01-01 00:00:00.000000')
+        row = {
+            'customer': 'User - 1',
+            'raised_by': 'testuser@test.com',
+            'subject': 'Ticket -2',
+            'description': 'Ticket -2',
+            'creation': "2000-01-01 00:00:00.000000",
+            'modified': "2000-01-05 10:00:00.000000",
+            'status': 'Open',
+            'name': 'Ticket -2'
+        }
+        mock_fetch_erpnext_data.side_effect = [
+            [row], [{'name': 'Ticket -1'}]
+        ]
+        Ticket.sync_data(full=True)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+        # Nothing is deleted when the check fails
+        mock_fetch_erpnext_data.side_effect = [[row], 'Error']
+        Ticket.sync_data(full=True)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    @override_settings(ERPNEXT_NAME_LOOKUP_BATCH_SIZE=1)
+    @mock.patch('geohosting.models.support.fetch_erpnext_data')
+    def test_full_sync_checks_names_in_batches(self, mock_fetch_erpnext_data):
+        """Missing tickets are checked in small batches of names."""
+        for code in ['Ticket -1', 'Ticket -2']:
+            Ticket.objects.create(
+                erpnext_code=code,
+                customer='testuser@test.com',
+                status='open',
+                subject=code,
+                details=code
+            )
+        Ticket.objects.update(created_at='2000-01-01 00:00:00.000000')
+        row = {
+            'customer': 'User - 1',
+            'raised_by': 'testuser@test.com',
+            'subject': 'Ticket -3',
+            'description': 'Ticket -3',
+            'creation': "2000-01-01 00:00:00.000000",
+            'modified': "2000-01-05 10:00:00.000000",
+            'status': 'Open',
+            'name': 'Ticket -3'
+        }
+        mock_fetch_erpnext_data.side_effect = [[row], [], []]
+        Ticket.sync_data(full=True)
+        self.assertEqual(
+            [
+                call.kwargs['filters']
+                for call in mock_fetch_erpnext_data.call_args_list[1:]
+            ],
+            [
+                [["name", "in", ['Ticket -1']]],
+                [["name", "in", ['Ticket -2']]]
+            ]
+        )
+        self.assertEqual(
+            list(Ticket.objects.values_list('erpnext_code', flat=True)),
+            ['Ticket -3']
+        )
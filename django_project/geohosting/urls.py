@@ -16,7 +16,7 @@ from geohosting.api.country import CountryViewSet
 from geohosting.api.erp import ERPApiView
 from geohosting.api.health import (
     ErpHealthView, ProxyHealthView, StripeHealthView,
-    PaystackHealthView, VaultHealthView
+    PaystackHealthView, VaultHealthView, GatewayRateView
 )
 from geohosting.api.instance import InstanceViewSet
 from geohosting.api.product import ProductViewSet
@@ -32,7 +32,9 @@ from geohosting.api.coupon import CheckPaystackCoupon
 from geohosting.api.support import TicketSetView, AttachmentSetView
 from geohosting.api.token import CreateToken
 from geohosting.api.user import UserProfileView, ChangePasswordView
-from geohosting.api.webhook import WebhookView
+from geohosting.api.webhook import (
+    PaystackWebhookView, StripeWebhookView, WebhookView
+)
 from geohosting.views.auth import (
     CustomAuthToken,
     logout,
@@ -136,6 +138,10 @@ health = [
     path('stripe/', StripeHealthView.as_view(), name='health-stripe'),
     path('paystack/', PaystackHealthView.as_view(), name='health-paystack'),
     path('vault/', VaultHealthView.as_view(), name='health-vault'),
+    path(
+        'gateway-rate/', GatewayRateView.as_view(),
+        name='health-gateway-rate'
+    ),
 ]
 
 api = [
@@ -143,6 +149,14 @@ api = [
     path('coupon-check/', include(coupon_code_check)),
     path('subscription/<pk>/payment-changes/', include(subscription_changes)),
     path('webhook/', WebhookView.as_view(), name='webhook-api'),
+    path(
+        'webhook/stripe/', StripeWebhookView.as_view(),
+        name='webhook-stripe'
+    ),
+    path(
+        'webhook/paystack/', PaystackWebhookView.as_view(),
+        name='webhook-paystack'
+    ),
     path(
         'sync-erp-data/', ERPApiView.as_view(), name='sync-with-erp'
     ),
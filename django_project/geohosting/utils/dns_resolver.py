@@ -0,0 +1,106 @@
+"""Async DNS resolver with cache, for reachability of instances."""
+import asyncio
+import errno
+import socket
+import time
+
+from django.conf import settings
+
+
+class Reachability:
+    """Reachability of an instance."""
+
+    OK = 'ok'
+    NXDOMAIN = 'nxdomain'
+    NO_ADDRESS = 'no_address'
+    CONNECT_REFUSED = 'connect_refused'
+
+    # The name is not resolved, the instance does not exist
+    UNREACHED = [NXDOMAIN, NO_ADDRESS]
+
+
+# Error codes of getaddrinfo of a name that has no address
+NO_ADDRESS_ERRORS = [
+    code for code in [
+        getattr(socket, 'EAI_NODATA', None),
+        getattr(socket, 'EAI_ADDRFAMILY', None)
+    ] if code is not None
+]
+
+# Cache of the hostnames, shared by the resolvers of the process
+_cache = {}
+
+
+def is_connect_refused(error: BaseException) -> bool:
+    """Return if the connection is refused, from the chain of the error."""
+    while error is not None:
+        if (
+                isinstance(error, OSError) and
+                error.errno == errno.ECONNREFUSED
+        ):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class DnsResolver:
+    """Resolve hostnames on the event loop, with positive and negative TTL.
+
+    Names that are resolved are cached for the positive TTL, the names
+    without address for the negative TTL. Temporary failures are not
+    cached and are reported as ok, so they never mark an instance
+    as unreached.
+    """
+
+    def __init__(
+            self, positive_ttl: int = None, negative_ttl: int = None,
+            timeout: float = None, cache: dict = None
+    ):
+        self.positive_ttl = (
+            positive_ttl or settings.INSTANCE_DNS_POSITIVE_TTL_SECONDS
+        )
+        self.negative_ttl = (
+            negative_ttl or settings.INSTANCE_DNS_NEGATIVE_TTL_SECONDS
+        )
+        self.timeout = timeout or settings.INSTANCE_CHECK_TIMEOUT
+        self.cache = _cache if cache is None else cache
+
+    async def getaddrinfo(self, host: str) -> list:
+        """Return addresses of the host."""
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, type=socket.SOCK_STREAM
+        )
+        return sorted({info[4][0] for info in infos})
+
+    async def resolve(self, host: str) -> str:
+        """Return reachability of the host from DNS."""
+        cached = self.cache.get(host)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        ttl = self.negative_ttl
+        try:
+            addresses = await asyncio.wait_for(
+                self.getaddrinfo(host), self.timeout
+            )
+            if addresses:
+                reachability = Reachability.OK
+                ttl = self.positive_ttl
+            else:
+                reachability = Reachability.NO_ADDRESS
+        except socket.gaierror as e:
+            if e.errno == socket.EAI_NONAME:
+                reachability = Reachability.NXDOMAIN
+            elif e.errno in NO_ADDRESS_ERRORS:
+                reachability = Reachability.NO_ADDRESS
+            else:
+                return Reachability.OK
+        except (asyncio.TimeoutError, OSError):
+            return Reachability.OK
+
+        self.cache[host] = (time.monotonic() + ttl, reachability)
+        return reachability
+
+    def resolve_sync(self, host: str) -> str:
+        """Return reachability of the host, outside of event loop."""
+        return asyncio.run(self.resolve(host))
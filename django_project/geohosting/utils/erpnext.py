@@ -1,27 +1,33 @@
+import hashlib
 import json
 import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import quote, urlparse
 
 import requests
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.base import File
 from django.core.files.storage import default_storage
 
+from geohosting.utils.erpnext_client import get_erp_client
 from geohosting_event.models.erp import ErpRequestLog, RequestMethod
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 def headers():
-    return {
-        "Authorization": (
-            f"token {settings.ERPNEXT_API_KEY}:"
-            f"{settings.ERPNEXT_API_SECRET}"
-        )
-    }
+    return get_erp_client().headers
 
 
 def test_connection():
     """Test erpnext connection."""
     url = f"{settings.ERPNEXT_BASE_URL}/api/resource/Item?limit=1"
-    return requests.get(url, headers=headers())
+    return get_erp_client().get(url)
 
 
 def fetch_erpnext_detail_data(doctype, filters=None):
@@ -40,7 +46,7 @@ def fetch_erpnext_detail_data(doctype, filters=None):
         params['filters'] = json.dumps(filters)
 
     try:
-        response = requests.get(url, headers=headers(), params=params)
+        response = get_erp_client().get(url, params=params)
 
         if response.status_code == 200:
             data = response.json()
@@ -57,25 +63,28 @@ def fetch_erpnext_detail_data(doctype, filters=None):
         return f"Exception occurred: {str(e)}"
 
 
-def fetch_erpnext_data(
-        doctype, filters: list = None, fields: list = None
+def iter_erpnext_data(
+        doctype, filters: list = None, fields: list = None,
+        page_length: int = None, prefetch: int = None,
+        order_by: str = None
 ):
     """
-    Fetch data from ERPNext.
+    Iterate data from ERPNext, page by page.
+
+    Rows are yielded as soon as their page arrives. The next pages are
+    prefetched concurrently and the page size adapts to the response time.
 
     Parameters:
         doctype (str): The document type to fetch the data from.
         filters (dict): Filters for the search
+        fields (list): Fields to be returned, default is all.
+        page_length (int): Initial page length.
+        prefetch (int): Number of pages that are fetched concurrently.
+        order_by (str): Order of the rows, e.g. 'modified asc'.
 
-    Returns:
-        response (dict): The response from the ERPNext API.
+    Raises:
+        requests.exceptions.HTTPError: When a page can't be fetched.
     """
-    if not settings.ERPNEXT_BASE_URL:
-        return {
-            "status": "error",
-            "message": 'ERPNEXT_BASE_URL is not set.'
-        }
-
     url = f"{settings.ERPNEXT_BASE_URL}/api/resource/{doctype}"
 
     if not fields:
@@ -83,48 +92,103 @@ def fetch_erpnext_data(
     params = {
         'fields': json.dumps(fields)
     }
-
     if filters:
         params['filters'] = json.dumps(filters)
+    if order_by:
+        params['order_by'] = order_by
+
+    if not page_length:
+        page_length = settings.ERPNEXT_PAGE_LENGTH
+    if not prefetch:
+        prefetch = settings.ERPNEXT_PREFETCH_PAGES
+    max_page_length = max(page_length, settings.ERPNEXT_MAX_PAGE_LENGTH)
+    client = get_erp_client()
+
+    def fetch_page(limit_start, limit_page_length):
+        _params = dict(params)
+        _params['limit_start'] = limit_start
+        _params['limit_page_length'] = limit_page_length
+        started_at = time.monotonic()
+        response = client.get(url, params=_params)
+        print(
+            f'{url} params: {json.dumps(_params)} : '
+            f'{response.status_code}'
+        )
+        response.raise_for_status()
+        return response.json().get('data'), time.monotonic() - started_at
+
+    pages = deque()
+    next_start = 0
+    # Only prefetch when the first page is full,
+    # so small lists are fetched with one request.
+    window = 1
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        try:
+            while True:
+                # Keep the prefetch window full
+                while len(pages) < window:
+                    pages.append(
+                        (
+                            page_length,
+                            executor.submit(
+                                fetch_page, next_start, page_length
+                            )
+                        )
+                    )
+                    next_start += page_length
+
+                requested_length, future = pages.popleft()
+                rows, elapsed = future.result()
+                if not rows:
+                    return
+                yield from rows
+                if len(rows) < requested_length:
+                    return  # This is the last page
+                window = prefetch
+
+                # Adapt page length for the next requests
+                if elapsed < settings.ERPNEXT_PAGE_TARGET_SECONDS / 2:
+                    page_length = min(page_length * 2, max_page_length)
+                elif elapsed > settings.ERPNEXT_PAGE_TARGET_SECONDS:
+                    page_length = max(page_length // 2, 1)
+        finally:
+            for _, future in pages:
+                future.cancel()
+
+
+def fetch_erpnext_data(
+        doctype, filters: list = None, fields: list = None,
+        order_by: str = None
+):
+    """
+    Fetch data from ERPNext.
 
-    all_data = []
-    page = 1
-    page_length = 20
-    max_try = 10
-    current_try = 1
+    Parameters:
+        doctype (str): The document type to fetch the data from.
+        filters (dict): Filters for the search
+        order_by (str): Order of the rows, e.g. 'creation asc'.
+
+    Returns:
+        response (dict): The response from the ERPNext API.
+    """
+    if not settings.ERPNEXT_BASE_URL:
+        return {
+            "status": "error",
+            "message": 'ERPNEXT_BASE_URL is not set.'
+        }
 
     try:
-        while True:
-            current_try += 1
-            if current_try > max_try:
-                break
-
-            params['limit_start'] = (page - 1) * page_length
-            params['limit_page_length'] = page_length
-
-            response = requests.get(url, headers=headers(), params=params)
-            print(
-                f'{url} params: {json.dumps(params)} : '
-                f'{response.status_code}'
+        return list(
+            iter_erpnext_data(
+                doctype, filters=filters, fields=fields, order_by=order_by
             )
-
-            if response.status_code == 200:
-                current_try = 1
-                data = response.json()
-                if 'data' in data:
-                    all_data.extend(data['data'])
-                    if len(data['data']) < page_length:
-                        break  # Exit loop if this is the last page
-                    page += 1
-                else:
-                    break  # Exit loop if no data found in response
-            else:
-                return (
-                    f"Error: Unable to fetch data. Status code: "
-                    f"{response.status_code}, "
-                    f"Message: {response.text}"
-                )
-        return all_data
+        )
+    except requests.exceptions.HTTPError as err:
+        return (
+            f"Error: Unable to fetch data. Status code: "
+            f"{err.response.status_code}, "
+            f"Message: {err.response.text}"
+        )
     except Exception as e:
         return f"Exception occurred: {str(e)}"
 
@@ -161,16 +225,12 @@ def post_to_erpnext(data, doctype, file=None, url_input=None):
 
     try:
         if files:
-            response = requests.post(
-                url, headers=headers(),
-                data=data, files=files
+            response = get_erp_client().post(
+                url, data=data, files=files
             )
         else:
-            _headers = headers()
-            _headers["Content-Type"] = "application/json"
-            response = requests.post(
-                url, headers=_headers,
-                data=json.dumps(data)
+            response = get_erp_client().post(
+                url, headers=JSON_HEADERS, data=json.dumps(data)
             )
 
         response.raise_for_status()
@@ -198,6 +258,64 @@ def post_to_erpnext(data, doctype, file=None, url_input=None):
             return {"status": "error", "message": str(err)}
 
 
+def _post_batch_to_erpnext(method, docs):
+    """Post docs to a batch method of ERPNext."""
+    url = f"{settings.ERPNEXT_BASE_URL}/api/method/{method}"
+    data = {"docs": json.dumps(docs)}
+    log = ErpRequestLog.objects.create(
+        url=url,
+        method=RequestMethod.POST,
+        data=data,
+    )
+    try:
+        response = get_erp_client().post(
+            url, headers=JSON_HEADERS, data=json.dumps(data)
+        )
+        response.raise_for_status()
+        log.response_code = response.status_code
+        log.save()
+        return {
+            "status": "success",
+            "message": response.json().get("message")
+        }
+    except requests.exceptions.HTTPError as err:
+        log.response_code = err.response.status_code
+        log.response_text = (
+            err.response.text if err.response is not None else str(err)
+        )
+        log.save()
+        return {"status": "error", "message": str(err)}
+    except requests.exceptions.RequestException as err:
+        log.response_text = str(err)
+        log.save()
+        return {"status": "error", "message": str(err)}
+
+
+def bulk_update_to_erpnext(docs: list):
+    """Update many docs to ERPNext in one request.
+
+    Parameters:
+        docs (list): Docs to be updated, each has the doctype and docname.
+
+    Returns:
+        result (dict): The result with the status and
+            failed docs as {docname: error}.
+    """
+    if not settings.ERPNEXT_BASE_URL:
+        return {
+            "status": "error",
+            "message": 'ERPNEXT_BASE_URL is not set.'
+        }
+    result = _post_batch_to_erpnext("frappe.client.bulk_update", docs)
+    if result['status'] == 'success':
+        message = result.pop('message') or {}
+        result['failed'] = {
+            failed['doc'].get('docname'): failed.get('exc')
+            for failed in message.get('failed_docs', [])
+        }
+    return result
+
+
 def upload_attachment_to_erp(doctype, id, file):
     """Post data to ERPNext and handle conflict if the data already exists.
 
@@ -229,9 +347,8 @@ def upload_attachment_to_erp(doctype, id, file):
     )
 
     try:
-        response = requests.post(
-            url, headers=headers(),
-            data=data, files=files
+        response = get_erp_client().post(
+            url, data=data, files=files
         )
 
         response.raise_for_status()
@@ -280,11 +397,7 @@ def get_erpnext_data(doctype, id):
     )
 
     try:
-        _headers = headers()
-        _headers["Content-Type"] = "application/json"
-        response = requests.get(
-            url, headers=_headers
-        )
+        response = get_erp_client().get(url, headers=JSON_HEADERS)
 
         response.raise_for_status()
         response_data = response.json()
@@ -305,6 +418,42 @@ def get_erpnext_data(doctype, id):
         return {"status": "error", "message": str(err)}
 
 
+def erpnext_data_cache_key(doctype, id):
+    """Return cache key of detail data of ERPNext."""
+    return f"erpnext-data:{quote(doctype)}:{quote(id)}"
+
+
+def get_cached_erpnext_data(doctype, id):
+    """Get detail data from cache, or from ERPNext and cache it.
+
+    Use it for reference documents that rarely change,
+    e.g. tax templates and payment terms.
+
+    Parameters:
+        doctype (str): The document type to post the data to.
+        id (str): Id of doc that needs to be put.
+
+    Returns:
+        result (dict): The result containing the status and message.
+    """
+    key = erpnext_data_cache_key(doctype, id)
+    data = cache.get(key)
+    if data is not None:
+        return {"status": "success", "data": data}
+
+    result = get_erpnext_data(doctype, id)
+    if result['status'] == 'success':
+        cache.set(key, result['data'], settings.ERPNEXT_DATA_CACHE_TIMEOUT)
+    return result
+
+
+def invalidate_erpnext_data_cache(doctype, ids: list):
+    """Remove cached detail data of ERPNext."""
+    cache.delete_many(
+        [erpnext_data_cache_key(doctype, id) for id in ids if id]
+    )
+
+
 def put_to_erpnext(data, doctype, id, file=None):
     """Put data to ERPNext.
 
@@ -335,17 +484,12 @@ def put_to_erpnext(data, doctype, id, file=None):
 
     try:
         if files:
-            response = requests.put(
-                url, headers=headers(),
-                data=data, files=files
+            response = get_erp_client().put(
+                url, data=data, files=files
             )
         else:
-            _headers = headers()
-            _headers["Content-Type"] = "application/json"
-            response = requests.put(
-                url,
-                headers=_headers,
-                data=json.dumps(data)
+            response = get_erp_client().put(
+                url, headers=JSON_HEADERS, data=json.dumps(data)
             )
 
         response.raise_for_status()
@@ -387,10 +531,8 @@ def add_erp_next_comment(user, doctype: str, id: str, comment: str):
         "comment_by": f"{user.first_name} {user.last_name}"
     }
     try:
-        _headers = headers()
-        _headers["Content-Type"] = "application/json"
-        response = requests.post(
-            url, headers=_headers, data=json.dumps(data)
+        response = get_erp_client().post(
+            url, headers=JSON_HEADERS, data=json.dumps(data)
         )
 
         response.raise_for_status()
@@ -402,21 +544,83 @@ def add_erp_next_comment(user, doctype: str, id: str, comment: str):
 
 
 def download_erp_file(image_path, folder='product_images', filename=None):
-    """Download file from erpnext."""
+    """Download file from erpnext.
+
+    The response is streamed in chunks to a temporary file,
+    so the whole file is never kept in memory.
+    """
     url = f"{settings.ERPNEXT_BASE_URL}{image_path}"
-    response = requests.get(url, headers=headers())
+    response = get_erp_client().get(url, stream=True)
 
-    if response.status_code == 200:
+    with response:
+        if response.status_code != 200:
+            print(f"Failed to download image: {url}")
+            return None
         if not filename:
             filename = os.path.basename(image_path)
-        content = ContentFile(response.content)
-        saved_path = (
-            default_storage.save(
-                f'{folder}/{filename}',
-                content
+        with _download_to_temporary_file(response) as (tmp, _):
+            return default_storage.save(
+                f'{folder}/{filename}', File(tmp, name=filename)
             )
-        )
-        return saved_path
-    else:
-        print(f"Failed to download image: {url}")
-        return None
+
+
+@contextmanager
+def _download_to_temporary_file(response):
+    """Stream response in chunks to a temporary file and hash it.
+
+    Yield (file, sha256 checksum), the file is closed on exit.
+    """
+    chunk_size = settings.ERPNEXT_DOWNLOAD_CHUNK_SIZE
+    with tempfile.SpooledTemporaryFile(max_size=chunk_size) as tmp:
+        checksum = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            tmp.write(chunk)
+            checksum.update(chunk)
+        tmp.seek(0)
+        yield tmp, checksum.hexdigest()
+
+
+def download_erp_file_if_changed(
+        image_path, folder, etag: str = None, checksum: str = None
+):
+    """Download file from erpnext only when the content is changed.
+
+    It does a conditional GET with the etag. The file is stored under
+    its checksum, so the same content is never uploaded twice.
+
+    Returns:
+        result (dict): The status is "changed", "unchanged" or "error".
+        It contains the path, etag and checksum of the file.
+    """
+    headers = {'If-None-Match': etag} if etag else None
+    url = f"{settings.ERPNEXT_BASE_URL}{image_path}"
+    try:
+        response = get_erp_client().get(url, headers=headers, stream=True)
+    except requests.exceptions.RequestException as e:
+        return {"status": "error", "message": str(e)}
+
+    with response:
+        if response.status_code == 304:
+            return {"status": "unchanged", "etag": etag, "checksum": checksum}
+        if response.status_code != 200:
+            return {
+                "status": "error",
+                "message": f"Failed to download {url}: "
+                           f"{response.status_code}"
+            }
+        etag = response.headers.get('ETag')
+        with _download_to_temporary_file(response) as (tmp, new_checksum):
+            if new_checksum == checksum:
+                return {
+                    "status": "unchanged", "etag": etag, "checksum": checksum
+                }
+            extension = os.path.splitext(urlparse(image_path).path)[1]
+            path = f'{folder}/{new_checksum}{extension}'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, File(tmp, name=path))
+            return {
+                "status": "changed",
+                "path": path,
+                "etag": etag,
+                "checksum": new_checksum
+            }
@@ -0,0 +1,230 @@
+"""Pooled HTTP client for ERPNext."""
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# Statuses that are worth retrying.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Statuses that mean the request was not processed by the server,
+# so they are safe to retry even for non-idempotent methods.
+NOT_PROCESSED_STATUSES = (429, 503)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
+class ErpClient:
+    """Client that keeps one pooled session per worker process.
+
+    Every request gets a connect/read timeout and is retried on
+    429/5xx with jittered exponential backoff, honouring Retry-After.
+    """
+
+    def __init__(
+            self,
+            connect_timeout: float = None,
+            read_timeout: float = None,
+            max_retries: int = None,
+            backoff_factor: float = None,
+            backoff_max: float = None,
+            pool_maxsize: int = None
+    ):
+        self.connect_timeout = (
+            connect_timeout if connect_timeout is not None else
+            settings.ERPNEXT_CONNECT_TIMEOUT
+        )
+        self.read_timeout = (
+            read_timeout if read_timeout is not None else
+            settings.ERPNEXT_READ_TIMEOUT
+        )
+        self.max_retries = (
+            max_retries if max_retries is not None else
+            settings.ERPNEXT_MAX_RETRIES
+        )
+        self.backoff_factor = (
+            backoff_factor if backoff_factor is not None else
+            settings.ERPNEXT_BACKOFF_FACTOR
+        )
+        self.backoff_max = (
+            backoff_max if backoff_max is not None else
+            settings.ERPNEXT_BACKOFF_MAX
+        )
+        self.pool_maxsize = (
+            pool_maxsize if pool_maxsize is not None else
+            settings.ERPNEXT_POOL_MAXSIZE
+        )
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        """Return base url of erpnext."""
+        return settings.ERPNEXT_BASE_URL
+
+    @property
+    def headers(self):
+        """Return authorization headers."""
+        return {
+            "Authorization": (
+                f"token {settings.ERPNEXT_API_KEY}:"
+                f"{settings.ERPNEXT_API_SECRET}"
+            )
+        }
+
+    @property
+    def session(self) -> requests.Session:
+        """Return session of current process.
+
+        A new session is created after fork, so the pooled sockets are
+        never shared between worker processes.
+        """
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=0
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._pid = pid
+        return self._session
+
+    def close(self):
+        """Close the session."""
+        if self._session is not None:
+            self._session.close()
+        self._session = None
+        self._pid = None
+
+    def url(self, path: str):
+        """Return absolute url from path."""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _should_retry(self, method: str, status_code: int):
+        """Return if the response status can be retried."""
+        if status_code not in RETRY_STATUSES:
+            return False
+        if method in IDEMPOTENT_METHODS:
+            return True
+        return status_code in NOT_PROCESSED_STATUSES
+
+    @staticmethod
+    def _retry_after(response: requests.Response):
+        """Return seconds from Retry-After header, if any."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(
+                parsedate_to_datetime(value).timestamp() - time.time(), 0
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int):
+        """Return jittered exponential backoff for the attempt."""
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    @staticmethod
+    def _rewind(files):
+        """Rewind files so they can be sent again on retry."""
+        if not files:
+            return
+        for file in files.values():
+            if hasattr(file, 'seek'):
+                file.seek(0)
+
+    def request(
+            self, method: str, path: str, headers: dict = None,
+            timeout=None, **kwargs
+    ) -> requests.Response:
+        """Do request to erpnext.
+
+        :param method: Http method.
+        :param path: Path relative to ERPNEXT_BASE_URL or absolute url.
+        :param headers: Extra headers, merged with authorization headers.
+        :param timeout: Override of (connect, read) timeout.
+        """
+        method = method.upper()
+        url = self.url(path)
+        _headers = self.headers
+        if headers:
+            _headers.update(headers)
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+
+        attempt = 0
+        while True:
+            self._rewind(kwargs.get('files'))
+            try:
+                response = self.session.request(
+                    method, url, headers=_headers, timeout=timeout,
+                    **kwargs
+                )
+            except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout
+            ):
+                if (
+                        method not in IDEMPOTENT_METHODS or
+                        attempt >= self.max_retries
+                ):
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if (
+                    attempt >= self.max_retries or
+                    not self._should_retry(method, response.status_code)
+            ):
+                return response
+
+            delay = self._retry_after(response)
+            if delay is None:
+                delay = self._backoff(attempt)
+            time.sleep(min(delay, self.backoff_max))
+            response.close()
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        """Do GET request."""
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        """Do POST request."""
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        """Do PUT request."""
+        return self.request('PUT', path, **kwargs)
+
+
+_erp_client = None
+
+
+def get_erp_client() -> ErpClient:
+    """Return the shared erp client."""
+    global _erp_client
+    if _erp_client is None:
+        _erp_client = ErpClient()
+    return _erp_client
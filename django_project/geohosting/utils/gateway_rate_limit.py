@@ -0,0 +1,334 @@
+"""Rate limiter of the payment gateway APIs.
+
+Every request to a gateway takes a token from the bucket of the gateway,
+the bucket is shared by all processes on redis. Batch requests leave a
+reserve of the bucket to the interactive ones (e.g. checkout), so bulk
+syncs can not exhaust the rate limit of the gateway.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+
+
+class Gateway:
+    """Payment gateways that are rate limited."""
+
+    STRIPE = 'stripe'
+    PAYSTACK = 'paystack'
+
+    ALL = [STRIPE, PAYSTACK]
+
+
+class Priority:
+    """Priority of the gateway requests."""
+
+    INTERACTIVE = 'interactive'
+    BATCH = 'batch'
+
+    ALL = [INTERACTIVE, BATCH]
+
+
+class RateLimitExceeded(Exception):
+    """Batch request waited too long for the gateway budget."""
+
+
+_priority = contextvars.ContextVar(
+    'gateway_priority', default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> str:
+    """Return priority of the gateway requests of current context."""
+    return _priority.get()
+
+
+@contextmanager
+def batch_priority():
+    """Make the gateway requests inside as batch requests.
+
+    It can be used as decorator for tasks and admin actions.
+    """
+    token = _priority.set(Priority.BATCH)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# Take tokens when the bucket keeps the reserve after that,
+# otherwise return the seconds until there are enough tokens.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local cost = tonumber(ARGV[5])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+local wait = 0
+if tokens - cost >= reserve then
+    tokens = tokens - cost
+else
+    wait = (cost + reserve - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class LocalTokenBucket:
+    """Token bucket of current process, when the cache is not redis."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(
+            self, key: str, rate: float, capacity: float, reserve: float,
+            now: float, cost: float = 1
+    ) -> float:
+        """Take the tokens, return the seconds to wait when it can not."""
+        with self.lock:
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = min(
+                capacity, tokens + max(now - updated_at, 0) * rate
+            )
+            wait = 0
+            if tokens - cost >= reserve:
+                tokens -= cost
+            else:
+                wait = (cost + reserve - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            return wait
+
+
+class RedisTokenBucket:
+    """Token bucket that is shared on redis."""
+
+    def __init__(self, client):
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(
+            self, key: str, rate: float, capacity: float, reserve: float,
+            now: float, cost: float = 1
+    ) -> float:
+        """Take the tokens, return the seconds to wait when it can not."""
+        return float(
+            self.script(
+                keys=[key], args=[rate, capacity, reserve, now, cost]
+            )
+        )
+
+
+_local_bucket = LocalTokenBucket()
+
+
+def token_bucket():
+    """Return token bucket of the cache."""
+    if isinstance(cache, RedisCache):
+        return RedisTokenBucket(cache._cache.get_client(write=True))
+    return _local_bucket
+
+
+class GatewayRateLimiter:
+    """Rate limiter of a payment gateway.
+
+    The bucket is refilled with the rate of the gateway and holds
+    GATEWAY_RATE_LIMIT_BURST_SECONDS of it. Batch requests can only take
+    tokens above GATEWAY_BATCH_RESERVE of the bucket. After a 429 of the
+    gateway, all requests wait until the backoff is over.
+    """
+
+    def __init__(self, gateway: str, bucket=None):
+        if gateway not in Gateway.ALL:
+            raise ValueError(f'{gateway} is not a payment gateway')
+        self.gateway = gateway
+        self.bucket = bucket or token_bucket()
+
+    @property
+    def rate(self) -> float:
+        """Return requests per second of the gateway."""
+        return settings.GATEWAY_RATE_LIMITS[self.gateway]
+
+    @property
+    def capacity(self) -> float:
+        """Return capacity of the bucket."""
+        return max(self.rate * settings.GATEWAY_RATE_LIMIT_BURST_SECONDS, 1)
+
+    def reserve(self, priority: str) -> float:
+        """Return tokens that are kept for the higher priority."""
+        if priority == Priority.BATCH:
+            return self.capacity * settings.GATEWAY_BATCH_RESERVE
+        return 0
+
+    def max_wait(self, priority: str) -> float:
+        """Return the longest time that the request waits for the budget."""
+        if priority == Priority.BATCH:
+            return settings.GATEWAY_BATCH_MAX_WAIT_SECONDS
+        return settings.GATEWAY_INTERACTIVE_MAX_WAIT_SECONDS
+
+    @property
+    def bucket_key(self) -> str:
+        """Return key of the bucket."""
+        return f'gateway-rate:{self.gateway}:bucket'
+
+    @property
+    def backoff_key(self) -> str:
+        """Return key of the backoff after 429."""
+        return f'gateway-rate:{self.gateway}:backoff'
+
+    def backoff_wait(self) -> float:
+        """Return the seconds until the backoff is over."""
+        backoff = cache.get(self.backoff_key)
+        if not backoff:
+            return 0
+        return max(backoff['until'] - time.time(), 0)
+
+    def acquire(self, priority: str = None, cost: float = 1):
+        """Wait until the request can be sent.
+
+        Interactive request is sent after its max wait even when there
+        is no budget, batch request raises RateLimitExceeded.
+        """
+        priority = priority or current_priority()
+        deadline = time.monotonic() + self.max_wait(priority)
+        while True:
+            wait = self.backoff_wait()
+            if not wait:
+                wait = self.bucket.take(
+                    self.bucket_key, self.rate, self.capacity,
+                    self.reserve(priority), time.time(), cost
+                )
+                if not wait:
+                    record_metric(self.gateway, 'used', priority)
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                record_metric(self.gateway, 'throttled', priority)
+                if priority == Priority.BATCH:
+                    raise RateLimitExceeded(
+                        f'No {self.gateway} budget for batch requests'
+                    )
+                record_metric(self.gateway, 'used', priority)
+                return
+            time.sleep(min(wait, remaining))
+
+    def rate_limited(self, retry_after: float = None) -> float:
+        """Back off after 429 of the gateway, return the backoff seconds.
+
+        Without Retry-After, the backoff doubles on every 429 in a row.
+        """
+        record_metric(self.gateway, 'rate_limited')
+        backoff = cache.get(self.backoff_key) or {}
+        count = backoff.get('count', 0) + 1
+        seconds = retry_after
+        if seconds is None:
+            seconds = min(
+                settings.GATEWAY_BACKOFF_SECONDS * (2 ** (count - 1)),
+                settings.GATEWAY_BACKOFF_MAX_SECONDS
+            )
+        cache.set(
+            self.backoff_key,
+            {'until': time.time() + seconds, 'count': count},
+            seconds + settings.GATEWAY_BACKOFF_MAX_SECONDS
+        )
+        return seconds
+
+    def request(self, send, max_retries: int = None):
+        """Send the request with the budget, retry it on 429.
+
+        :param send: Function that sends the request,
+            returns status code and Retry-After.
+        """
+        if max_retries is None:
+            max_retries = settings.GATEWAY_MAX_RETRIES
+        attempt = 0
+        while True:
+            self.acquire()
+            response, status_code, retry_after = send()
+            if status_code != 429:
+                if attempt:
+                    cache.delete(self.backoff_key)
+                return response
+            self.rate_limited(retry_after)
+            if attempt >= max_retries:
+                return response
+            attempt += 1
+
+
+def parse_retry_after(value) -> float | None:
+    """Return seconds of Retry-After header."""
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _metric_key(gateway: str, metric: str, priority: str, minute: str):
+    """Return cache key of the metric of the minute."""
+    return f'gateway-rate:{gateway}:{metric}:{priority}:{minute}'
+
+
+def _minute(dt: datetime) -> str:
+    """Return minute of the metrics."""
+    return dt.strftime('%Y-%m-%dT%H:%M')
+
+
+def record_metric(gateway: str, metric: str, priority: str = ''):
+    """Count the metric of current minute."""
+    key = _metric_key(
+        gateway, metric, priority, _minute(datetime.now(dt_timezone.utc))
+    )
+    timeout = settings.GATEWAY_METRICS_MINUTES * 60 + 60
+    try:
+        cache.add(key, 0, timeout)
+        cache.incr(key)
+    except ValueError:
+        # The cache does not keep the key, e.g. dummy cache
+        pass
+
+
+def gateway_metrics(gateway: str, minutes: int = None) -> list:
+    """Return the budget used per minute of the last minutes."""
+    minutes = minutes or settings.GATEWAY_METRICS_MINUTES
+    now = datetime.now(dt_timezone.utc)
+    periods = [
+        _minute(now - timedelta(minutes=idx)) for idx in range(minutes)
+    ]
+    fields = [
+        ('used', priority) for priority in Priority.ALL
+    ] + [
+        ('throttled', priority) for priority in Priority.ALL
+    ] + [('rate_limited', '')]
+    values = cache.get_many(
+        [
+            _metric_key(gateway, metric, priority, minute)
+            for minute in periods for metric, priority in fields
+        ]
+    )
+    budget = settings.GATEWAY_RATE_LIMITS[gateway] * 60
+    output = []
+    for minute in periods:
+        row = {'minute': minute}
+        for metric, priority in fields:
+            value = values.get(
+                _metric_key(gateway, metric, priority, minute), 0
+            )
+            if priority:
+                row.setdefault(metric, {})[priority] = value
+            else:
+                row[metric] = value
+        row['budget_used'] = round(
+            sum(row['used'].values()) / budget * 100, 2
+        )
+        output.append(row)
+    return output
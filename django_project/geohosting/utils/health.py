@@ -0,0 +1,132 @@
+"""Cached health state of the external dependencies."""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+OK = 'OK'
+
+
+class Dependency:
+    """External dependency names, value is the test of Preferences."""
+
+    ERP = 'erp'
+    PROXY = 'proxy'
+    VAULT = 'vault'
+    STRIPE = 'stripe'
+    PAYSTACK = 'paystack'
+
+    TESTS = {
+        ERP: 'erp_next_test',
+        PROXY: 'proxy_test',
+        VAULT: 'vault_test',
+        STRIPE: 'stripe_test',
+        PAYSTACK: 'paystack_test',
+    }
+
+
+class DependencyHealth:
+    """Health state of a dependency that is cached on redis.
+
+    The state is probed in the background. After
+    HEALTH_FAILURE_THRESHOLD failures in a row, the circuit is opened and
+    the dependency is not probed until the cooldown is over.
+    The cooldown grows on every failure, up to HEALTH_COOLDOWN_MAX_SECONDS.
+    """
+
+    def __init__(self, name: str):
+        if name not in Dependency.TESTS:
+            raise ValueError(f'{name} is not a dependency')
+        self.name = name
+
+    @property
+    def cache_key(self):
+        """Return cache key of the state."""
+        return f'dependency-health:{self.name}'
+
+    @property
+    def state(self) -> dict:
+        """Return the cached state, None if it is not probed yet."""
+        return cache.get(self.cache_key)
+
+    def save(self, state: dict):
+        """Save the state, it is kept at least until the circuit is closed.
+
+        When the prober stops, the state expires and is probed on read.
+        """
+        timeout = settings.HEALTH_STATE_TIMEOUT_SECONDS
+        if state.get('opened_until'):
+            timeout += max(state['opened_until'] - time.time(), 0)
+        cache.set(self.cache_key, state, timeout)
+
+    def is_open(self, state: dict = None) -> bool:
+        """Return if the circuit is open, so probe is skipped."""
+        state = state or self.state
+        if not state or not state.get('opened_until'):
+            return False
+        return time.time() < state['opened_until']
+
+    def test(self) -> str:
+        """Run the live test of the dependency."""
+        from core.models.preferences import Preferences
+        return f'{getattr(Preferences.load(), Dependency.TESTS[self.name])}'
+
+    def probe(self, force: bool = False) -> dict:
+        """Probe the dependency and save the state.
+
+        :param force: Probe even the circuit is open.
+        """
+        previous = self.state or {}
+        if not force and self.is_open(previous):
+            return previous
+
+        started_at = time.monotonic()
+        try:
+            status = self.test()
+        except Exception as e:
+            status = f'{e}'
+        latency = time.monotonic() - started_at
+
+        state = {
+            'status': status,
+            'latency_ms': round(latency * 1000, 2),
+            'checked_at': timezone.now().isoformat(),
+            'failures': 0,
+            'opened_until': None
+        }
+        if status != OK:
+            failures = previous.get('failures', 0) + 1
+            state['failures'] = failures
+            if failures >= settings.HEALTH_FAILURE_THRESHOLD:
+                state['opened_until'] = time.time() + min(
+                    settings.HEALTH_COOLDOWN_SECONDS * (
+                        2 ** (failures - settings.HEALTH_FAILURE_THRESHOLD)
+                    ),
+                    settings.HEALTH_COOLDOWN_MAX_SECONDS
+                )
+        self.save(state)
+        return state
+
+    def get(self) -> dict:
+        """Return the cached state, probe it when it is not cached yet."""
+        state = self.state
+        if state is None:
+            state = self.probe()
+        return state
+
+    @property
+    def status(self) -> str:
+        """Return status of the dependency, OK when it is healthy."""
+        return self.get()['status']
+
+    @property
+    def is_available(self) -> bool:
+        """Return if dependency is available."""
+        return self.status == OK
+
+
+def probe_dependencies():
+    """Probe all dependencies."""
+    for name in Dependency.TESTS:
+        DependencyHealth(name).probe()
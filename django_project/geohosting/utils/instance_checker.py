@@ -0,0 +1,249 @@
+"""Concurrent health checker of instances."""
+import asyncio
+import random
+import time
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import httpx
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from geohosting.utils.dns_resolver import (
+    DnsResolver, Reachability, is_connect_refused
+)
+
+
+class ProbeResult:
+    """Result of probing an instance."""
+
+    def __init__(
+            self, instance_id: int, url: str, status_code: int = None,
+            latency_ms: float = None, error: str = None,
+            reachability: str = Reachability.OK
+    ):
+        self.instance_id = instance_id
+        self.url = url
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.error = error
+        self.reachability = reachability
+        self.checked_at = timezone.now()
+
+    def __repr__(self):
+        return (
+            f'<ProbeResult {self.url} {self.status_code or self.error}>'
+        )
+
+    @property
+    def online(self) -> bool:
+        """Return if the instance is online."""
+        return self.status_code == 200
+
+    @property
+    def reached(self) -> bool:
+        """Return if the name of instance is resolved."""
+        return self.reachability not in Reachability.UNREACHED
+
+    @property
+    def event(self) -> str:
+        """Return instance event of the result."""
+        from geohosting.models.instance import InstanceEvent
+        if self.online:
+            return InstanceEvent.ONLINE
+        if self.reached:
+            return InstanceEvent.REACHED
+        return InstanceEvent.UNREACHED
+
+
+class InstanceChecker:
+    """Probe instances concurrently with httpx.
+
+    There is one client per cluster domain, so the connections are reused
+    for the instances on the same domain. The number of probes in flight
+    is limited by the concurrency and every probe has a timeout.
+    The name is resolved first, an instance without address is not
+    requested.
+    """
+
+    def __init__(
+            self, concurrency: int = None, timeout: float = None,
+            connections_per_domain: int = None,
+            transport: httpx.AsyncBaseTransport = None,
+            resolver: DnsResolver = None
+    ):
+        self.concurrency = (
+            concurrency or settings.INSTANCE_CHECK_CONCURRENCY
+        )
+        self.timeout = timeout or settings.INSTANCE_CHECK_TIMEOUT
+        self.connections_per_domain = (
+            connections_per_domain or
+            settings.INSTANCE_CHECK_CONNECTIONS_PER_DOMAIN
+        )
+        self.transport = transport
+        self.resolver = resolver or DnsResolver(timeout=self.timeout)
+
+    def client(self) -> httpx.AsyncClient:
+        """Return client of a domain."""
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.connections_per_domain,
+                max_keepalive_connections=self.connections_per_domain
+            ),
+            transport=self.transport
+        )
+
+    async def probe_url(
+            self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+            instance_id: int, url: str
+    ) -> ProbeResult:
+        """Probe an url."""
+        async with semaphore:
+            reachability = await self.resolver.resolve(urlparse(url).hostname)
+            if reachability in Reachability.UNREACHED:
+                return ProbeResult(
+                    instance_id, url, error=reachability,
+                    reachability=reachability
+                )
+
+            started_at = time.monotonic()
+            status_code = None
+            error = None
+            try:
+                response = await asyncio.wait_for(
+                    client.head(url), self.timeout
+                )
+                status_code = response.status_code
+            except asyncio.TimeoutError:
+                error = 'Timeout'
+            except httpx.HTTPError as e:
+                error = f'{e}' or e.__class__.__name__
+                if is_connect_refused(e):
+                    reachability = Reachability.CONNECT_REFUSED
+            return ProbeResult(
+                instance_id, url, status_code=status_code,
+                latency_ms=round((time.monotonic() - started_at) * 1000, 2),
+                error=error, reachability=reachability
+            )
+
+    async def probe_targets(self, targets: list) -> dict:
+        """Probe targets of (instance id, domain, url).
+
+        Return results by instance id.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        clients = {}
+        try:
+            tasks = []
+            for instance_id, domain, url in targets:
+                if domain not in clients:
+                    clients[domain] = self.client()
+                tasks.append(
+                    self.probe_url(
+                        clients[domain], semaphore, instance_id, url
+                    )
+                )
+            results = await asyncio.gather(*tasks)
+        finally:
+            for client in clients.values():
+                await client.aclose()
+        return {result.instance_id: result for result in results}
+
+    def probe(self, instances) -> dict:
+        """Probe instances, return results by instance id."""
+        from geohosting.models.product import ProductAddon
+        instances = list(instances)
+
+        # The check urls of addons, by product
+        addons = {}
+        for addon in ProductAddon.objects.filter(
+                is_instance_check=True,
+                product_id__in={
+                    instance.price.product_id for instance in instances
+                }
+        ).order_by('id'):
+            addons.setdefault(addon.product_id, addon)
+
+        targets = []
+        for instance in instances:
+            addon = addons.get(instance.price.product_id)
+            url = addon.addon_url(instance) if addon else instance.url
+            targets.append((instance.id, instance.cluster.domain, url))
+        return asyncio.run(self.probe_targets(targets))
+
+
+def next_check_interval(instance) -> timedelta:
+    """Return interval until the next check of an instance.
+
+    Instances in transition and the ones that just changed status are
+    checked on the minimum interval. The interval of stable instances is
+    doubled on every check, up to the maximum.
+    """
+    from geohosting.models.instance import InstanceStatus
+
+    minimum = settings.INSTANCE_CHECK_MIN_INTERVAL_SECONDS
+    maximum = settings.INSTANCE_CHECK_MAX_INTERVAL_SECONDS
+    if instance.status in [
+        InstanceStatus.DEPLOYING, InstanceStatus.STARTING_UP,
+        InstanceStatus.DELETING
+    ]:
+        seconds = minimum
+    else:
+        seconds = min(minimum * 2 ** min(instance.stability, 16), maximum)
+
+    # Jitter, so the instances are not due at the same time
+    return timedelta(seconds=seconds * random.uniform(0.9, 1.1))
+
+
+def schedule_next_check(instance, changed: bool):
+    """Update stability and next check of a probed instance."""
+    instance.stability = 0 if changed else instance.stability + 1
+    instance.next_check_at = timezone.now() + next_check_interval(instance)
+
+
+def apply_probe_results(instances, results: dict) -> list:
+    """Apply the status transitions of probe results.
+
+    The changed statuses, the next checks and the probe results are saved
+    in bulk, then the side effects of the changed instances are run.
+    Return the changed instances.
+    """
+    from geohosting.models.instance import Instance, InstanceStateMachine
+    from geohosting.utils.instance_uptime import record_probe_results
+
+    machine = InstanceStateMachine()
+    probed = []
+    for instance in instances:
+        result = results.get(instance.id)
+        if result is None:
+            continue
+        schedule_next_check(
+            instance, machine.transition(instance, result.event)
+        )
+        probed.append(instance)
+
+    with transaction.atomic():
+        machine.save()
+        Instance.objects.bulk_update(
+            probed, ['stability', 'next_check_at'],
+            batch_size=settings.INSTANCE_PROBE_BATCH_SIZE
+        )
+        record_probe_results(probed, results)
+
+    machine.run_side_effects()
+    return machine.changed
+
+
+def check_instances(instances, checker: InstanceChecker = None) -> list:
+    """Probe instances concurrently and apply the results.
+
+    Return the changed instances.
+    """
+    instances = list(
+        instances.select_related('cluster', 'price')
+    )
+    results = (checker or InstanceChecker()).probe(instances)
+    return apply_probe_results(instances, results)
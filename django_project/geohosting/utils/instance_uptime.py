@@ -0,0 +1,295 @@
+"""Probe results store and uptime rollups of instances."""
+import math
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from geohosting.models.instance_uptime import (
+    InstanceProbe, InstanceUptime, InstanceUptimeResolution
+)
+
+# Upper bounds of the latency histogram buckets, in ms.
+# The last bucket of histogram is for the slower ones.
+LATENCY_BUCKETS = (
+    25, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000
+)
+
+# Resolution, seconds of the period and the source resolution.
+# The first one is rolled up from the probes.
+RESOLUTIONS = [
+    (InstanceUptimeResolution.FIVE_MINUTES, 5 * 60, None),
+    (
+        InstanceUptimeResolution.HOUR, 60 * 60,
+        InstanceUptimeResolution.FIVE_MINUTES
+    ),
+    (
+        InstanceUptimeResolution.DAY, 24 * 60 * 60,
+        InstanceUptimeResolution.HOUR
+    ),
+]
+
+
+def floor_time(value: datetime, seconds: int) -> datetime:
+    """Floor time to the period."""
+    return datetime.fromtimestamp(
+        value.timestamp() // seconds * seconds, tz=dt_timezone.utc
+    )
+
+
+def ceil_time(value: datetime, seconds: int) -> datetime:
+    """Ceil time to the period."""
+    floor = floor_time(value, seconds)
+    return floor if floor == value else floor + timedelta(seconds=seconds)
+
+
+def latency_bucket(latency_ms: float) -> int:
+    """Return index of histogram bucket of a latency."""
+    return bisect_left(LATENCY_BUCKETS, latency_ms)
+
+
+def latency_percentile(histogram: list, percentile: float):
+    """Return upper bound of the bucket of the percentile, in ms.
+
+    None when there is no latency, or it is slower than the last bound.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = math.ceil(percentile / 100 * total)
+    cumulative = 0
+    for idx, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= rank:
+            return (
+                LATENCY_BUCKETS[idx] if idx < len(LATENCY_BUCKETS) else None
+            )
+    return None
+
+
+def record_probe_results(instances, results: dict):
+    """Append probe results of the scheduled instances, in batches."""
+    probes = []
+    for instance in instances:
+        result = results.get(instance.id)
+        if result is None:
+            continue
+        interval = 0
+        if instance.next_check_at:
+            interval = max(
+                (instance.next_check_at - result.checked_at).total_seconds(),
+                0
+            )
+        probes.append(
+            InstanceProbe(
+                instance_id=instance.id,
+                checked_at=result.checked_at,
+                status_code=result.status_code,
+                latency_ms=result.latency_ms,
+                reachable=result.reached,
+                online=result.online,
+                interval_seconds=interval
+            )
+        )
+    InstanceProbe.objects.bulk_create(
+        probes, batch_size=settings.INSTANCE_PROBE_BATCH_SIZE
+    )
+
+
+class UptimeAggregate:
+    """Aggregate of probes or rollups."""
+
+    def __init__(self):
+        self.probes = 0
+        self.online_probes = 0
+        self.unreachable_probes = 0
+        self.observed_seconds = 0
+        self.online_seconds = 0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add_probe(self, probe: InstanceProbe):
+        """Add a probe."""
+        self.probes += 1
+        self.observed_seconds += probe.interval_seconds
+        if probe.online:
+            self.online_probes += 1
+            self.online_seconds += probe.interval_seconds
+        if not probe.reachable:
+            self.unreachable_probes += 1
+
+        # Only latency of responses, not of the errors
+        if probe.status_code and probe.latency_ms is not None:
+            self.latency_histogram[latency_bucket(probe.latency_ms)] += 1
+
+    def add_uptime(self, uptime: InstanceUptime):
+        """Add a rollup."""
+        self.probes += uptime.probes
+        self.online_probes += uptime.online_probes
+        self.unreachable_probes += uptime.unreachable_probes
+        self.observed_seconds += uptime.observed_seconds
+        self.online_seconds += uptime.online_seconds
+        for idx, count in enumerate(uptime.latency_histogram):
+            self.latency_histogram[idx] += count
+
+    def to_uptime(self, instance_id, resolution, period_start):
+        """Return the rollup row."""
+        return InstanceUptime(
+            instance_id=instance_id,
+            resolution=resolution,
+            period_start=period_start,
+            probes=self.probes,
+            online_probes=self.online_probes,
+            unreachable_probes=self.unreachable_probes,
+            observed_seconds=self.observed_seconds,
+            online_seconds=self.online_seconds,
+            latency_histogram=self.latency_histogram
+        )
+
+    def to_dict(self):
+        """Return uptime and latency percentiles."""
+        uptime = None
+        if self.observed_seconds:
+            uptime = round(
+                self.online_seconds / self.observed_seconds * 100, 3
+            )
+        return {
+            'uptime': uptime,
+            'probes': self.probes,
+            'online_probes': self.online_probes,
+            'unreachable_probes': self.unreachable_probes,
+            'latency_ms': {
+                'p50': latency_percentile(self.latency_histogram, 50),
+                'p95': latency_percentile(self.latency_histogram, 95),
+                'p99': latency_percentile(self.latency_histogram, 99)
+            }
+        }
+
+
+def rollup_instance_uptime(
+        resolution: str, end: datetime = None, periods: int = None
+) -> int:
+    """Roll up the last closed periods of a resolution.
+
+    The periods are computed again from the source,
+    so probes that came late are included. Return number of rows.
+    """
+    seconds, source = {
+        _resolution: (_seconds, _source)
+        for _resolution, _seconds, _source in RESOLUTIONS
+    }[resolution]
+    periods = periods or settings.INSTANCE_UPTIME_ROLLUP_PERIODS
+    end = floor_time(end or timezone.now(), seconds)
+    start = end - timedelta(seconds=seconds * periods)
+
+    aggregates = {}
+    if source is None:
+        for probe in InstanceProbe.objects.filter(
+                checked_at__gte=start, checked_at__lt=end
+        ).only(
+            'instance', 'checked_at', 'status_code', 'latency_ms',
+            'reachable', 'online', 'interval_seconds'
+        ).iterator():
+            key = (probe.instance_id, floor_time(probe.checked_at, seconds))
+            aggregates.setdefault(key, UptimeAggregate()).add_probe(probe)
+    else:
+        for uptime in InstanceUptime.objects.filter(
+                resolution=source,
+                period_start__gte=start, period_start__lt=end
+        ).iterator():
+            key = (
+                uptime.instance_id, floor_time(uptime.period_start, seconds)
+            )
+            aggregates.setdefault(key, UptimeAggregate()).add_uptime(uptime)
+
+    with transaction.atomic():
+        InstanceUptime.objects.filter(
+            resolution=resolution,
+            period_start__gte=start, period_start__lt=end
+        ).delete()
+        InstanceUptime.objects.bulk_create(
+            [
+                aggregate.to_uptime(instance_id, resolution, period_start)
+                for (instance_id, period_start), aggregate in
+                aggregates.items()
+            ],
+            batch_size=settings.INSTANCE_PROBE_BATCH_SIZE
+        )
+    return len(aggregates)
+
+
+def purge_instance_uptime(now: datetime = None):
+    """Delete probes and rollups that are older than their retention."""
+    now = now or timezone.now()
+    InstanceProbe.objects.filter(
+        checked_at__lt=now - timedelta(
+            days=settings.INSTANCE_PROBE_RETENTION_DAYS
+        )
+    ).delete()
+    for resolution, days in [
+        (
+            InstanceUptimeResolution.FIVE_MINUTES,
+            settings.INSTANCE_UPTIME_FIVE_MINUTES_RETENTION_DAYS
+        ),
+        (
+            InstanceUptimeResolution.HOUR,
+            settings.INSTANCE_UPTIME_HOUR_RETENTION_DAYS
+        )
+    ]:
+        InstanceUptime.objects.filter(
+            resolution=resolution,
+            period_start__lt=now - timedelta(days=days)
+        ).delete()
+
+
+def uptime_segments(start: datetime, end: datetime, level: int = None):
+    """Return (resolution, start, end) of rollups that cover the range.
+
+    The range is covered with the coarsest periods that fit,
+    the edges with the finer ones.
+    """
+    if level is None:
+        level = len(RESOLUTIONS) - 1
+    resolution, seconds, _ = RESOLUTIONS[level]
+    first = ceil_time(start, seconds)
+    last = floor_time(end, seconds)
+    if first >= last:
+        return uptime_segments(start, end, level - 1) if level else []
+
+    segments = [(resolution, first, last)]
+    if level:
+        if start < first:
+            segments += uptime_segments(start, first, level - 1)
+        if last < end:
+            segments += uptime_segments(last, end, level - 1)
+    return segments
+
+
+def instance_uptime_report(
+        instance, start: datetime, end: datetime = None
+) -> dict:
+    """Return uptime and latency percentiles of an instance from rollups."""
+    end = end or timezone.now()
+    query = Q()
+    for resolution, segment_start, segment_end in uptime_segments(
+            start, end
+    ):
+        query |= Q(
+            resolution=resolution,
+            period_start__gte=segment_start,
+            period_start__lt=segment_end
+        )
+
+    aggregate = UptimeAggregate()
+    if query:
+        for uptime in InstanceUptime.objects.filter(
+                query, instance=instance
+        ):
+            aggregate.add_uptime(uptime)
+    return {
+        'start': start,
+        'end': end,
+        **aggregate.to_dict()
+    }
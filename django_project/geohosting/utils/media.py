@@ -1,5 +1,36 @@
 from geohosting.models.product import ProductMedia
-from geohosting.utils.erpnext import download_erp_file
+from geohosting.utils.erpnext import download_erp_file_if_changed
+
+
+def sync_erp_image(obj, image_path: str, folder: str) -> bool:
+    """Sync image of obj from erpnext when the content is changed.
+
+    The obj has image, image_etag and image_checksum,
+    it is not saved here.
+    Return True when the obj is changed.
+    """
+    etag = checksum = None
+    # Use the validators only when the image is still the synced one
+    if obj.image and obj.image_checksum and obj.image.name.startswith(
+            f'{folder}/{obj.image_checksum}'
+    ):
+        etag = obj.image_etag
+        checksum = obj.image_checksum
+    result = download_erp_file_if_changed(
+        image_path, folder, etag=etag, checksum=checksum
+    )
+    if result['status'] == 'error':
+        print(result['message'])
+        return False
+    if result['status'] == 'changed':
+        print(f'Save {result["path"]}')
+        obj.image = result['path']
+    changed = result['status'] == 'changed' or obj.image_etag != result[
+        'etag'
+    ]
+    obj.image_etag = result['etag']
+    obj.image_checksum = result['checksum']
+    return changed
 
 
 def save_product_image(
@@ -9,17 +40,14 @@ def save_product_image(
     try:
         title = product_desc[title_key]
         description = product_desc[description_key]
-        image_file = download_erp_file(image_path)
-        if not image_file:
-            raise AttributeError()
-        print(f'Save {image_file}')
-        media, _ = ProductMedia.objects.update_or_create(
-            product=obj,
-            title=title,
-            defaults={
-                'image': image_file,
-                'description': description
-            }
-        )
-    except (KeyError, AttributeError):
-        pass
+    except KeyError:
+        return
+    media = ProductMedia.objects.filter(
+        product=obj, title=title
+    ).first() or ProductMedia(product=obj, title=title)
+    changed = sync_erp_image(media, image_path, 'product_media')
+    if not media.image:
+        return
+    if changed or not media.pk or media.description != description:
+        media.description = description
+        media.save()
@@ -0,0 +1,228 @@
+"""Webhook events of the payment gateways."""
+import hashlib
+import hmac
+from datetime import datetime, timezone as dt_timezone
+
+import requests
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from paystackapi.subscription import Subscription as PaystackSubscription
+
+from geohosting.models.data_types import PaymentMethod
+from geohosting.models.sales_order import SalesOrder
+from geohosting.models.subscription import Subscription
+from geohosting.utils.gateway_rate_limit import RateLimitExceeded
+from geohosting_event.models.log import LogTracker
+from geohosting_event.models.payment import PaymentEvent
+
+# Errors of the event that can pass when it is retried
+TRANSIENT_ERRORS = (
+    RateLimitExceeded,
+    stripe.APIConnectionError,
+    stripe.RateLimitError,
+    requests.RequestException,
+    OperationalError
+)
+
+
+class InvalidSignature(Exception):
+    """Signature of the webhook is not valid."""
+
+
+def construct_stripe_event(payload: bytes, signature: str) -> dict:
+    """Return stripe event of the payload if the signature is valid."""
+    try:
+        return stripe.Webhook.construct_event(
+            payload, signature, settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.SignatureVerificationError) as e:
+        raise InvalidSignature(f'{e}')
+
+
+def verify_paystack_signature(payload: bytes, signature: str):
+    """Raise InvalidSignature if the signature of payload is not valid."""
+    expected = hmac.new(
+        settings.PAYSTACK_SECRET_KEY.encode(), payload, hashlib.sha512
+    ).hexdigest()
+    if not signature or not hmac.compare_digest(expected, signature):
+        raise InvalidSignature('Invalid paystack signature')
+
+
+def paystack_event_id(payload: bytes) -> str:
+    """Return id of paystack event, the events do not have one."""
+    return hashlib.sha256(payload).hexdigest()
+
+
+def receive_payment_event(
+        payment_method: str, event_id: str, event_type: str, data: dict
+) -> PaymentEvent:
+    """Store the event once and process it after the commit.
+
+    The event that is received again is processed again only when it is
+    not processed yet.
+    """
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                payment_method=payment_method,
+                event_id=event_id,
+                event_type=event_type,
+                data=data
+            )
+    except IntegrityError:
+        event = PaymentEvent.objects.get(
+            payment_method=payment_method, event_id=event_id
+        )
+        if event.processed_at:
+            return event
+
+    from geohosting.tasks.subscription import process_payment_event
+    # The event is stored, the gateway gets 200 even when it fails
+    transaction.on_commit(
+        lambda: process_payment_event.delay(event.id), robust=True
+    )
+    return event
+
+
+def _sync_sales_order(payment_method: str, payment_id: str) -> str:
+    """Update payment status of the sales order of payment."""
+    sales_order = SalesOrder.objects.filter(
+        payment_method=payment_method, payment_id=payment_id
+    ).first()
+    if not sales_order:
+        return f'No sales order for payment {payment_id}'
+    sales_order.update_payment_status()
+    return f'Sales order {sales_order.id} is updated'
+
+
+def _sync_subscription(subscription: Subscription) -> str:
+    """Fetch the subscription from the gateway and save it."""
+    subscription.payment_gateway.subscription(subscription.customer)
+    subscription.check_expiry()
+    return f'Subscription {subscription.id} is synced'
+
+
+def apply_stripe_event(data: dict) -> str:
+    """Apply stripe event, return the note."""
+    event_type = data['type']
+    obj = data['data']['object']
+
+    if event_type == 'checkout.session.completed':
+        return _sync_sales_order(PaymentMethod.STRIPE, obj['id'])
+
+    # The payment method of the customer is in the subscription detail
+    if event_type in ['customer.updated', 'payment_method.attached']:
+        customer_id = (
+            obj['id'] if event_type == 'customer.updated' else
+            obj['customer']
+        )
+        subscriptions = Subscription.objects.filter(
+            payment_method=PaymentMethod.STRIPE,
+            customer_payment_id=customer_id
+        )
+        for subscription in subscriptions:
+            subscription.invalidate_detail()
+        return f'Detail of {len(subscriptions)} subscriptions is invalidated'
+
+    if event_type.startswith('customer.subscription.'):
+        subscription_id = obj['id']
+    elif event_type.startswith('invoice.'):
+        subscription_id = obj.get('subscription')
+    else:
+        return 'Event is not used'
+
+    subscription = Subscription.objects.filter(
+        payment_method=PaymentMethod.STRIPE,
+        subscription_id=subscription_id
+    ).first()
+    if not subscription:
+        return f'No subscription {subscription_id}'
+    if not event_type.startswith('customer.subscription.'):
+        return _sync_subscription(subscription)
+
+    # The event has the subscription, no need to fetch it.
+    # Stripe does not deliver the events in order,
+    # an older event would revert the subscription.
+    # The row is locked just to check and save, no gateway is called.
+    gateway = subscription.payment_gateway
+    subscription_data = gateway.subscription_data(obj, fetch_invoice=False)
+    created = datetime.fromtimestamp(data['created'], dt_timezone.utc)
+    with transaction.atomic():
+        subscription = Subscription.objects.select_for_update().get(
+            id=subscription.id
+        )
+        if (
+                subscription.gateway_event_at and
+                created < subscription.gateway_event_at
+        ):
+            return (
+                f'Subscription {subscription.id} has a newer event, '
+                f'it is skipped'
+            )
+        gateway.save_to_subscription(
+            subscription_data, subscription.customer
+        )
+        Subscription.objects.filter(id=subscription.id).update(
+            gateway_event_at=created
+        )
+    subscription.refresh_from_db()
+    subscription.check_expiry()
+    return f'Subscription {subscription.id} is updated'
+
+
+def apply_paystack_event(data: dict) -> str:
+    """Apply paystack event, return the note."""
+    event_type = data['event']
+    obj = data['data']
+
+    if event_type == 'charge.success':
+        return _sync_sales_order(PaymentMethod.PAYSTACK, obj['reference'])
+
+    if event_type.startswith('subscription.'):
+        subscription_code = obj['subscription_code']
+    elif event_type.startswith('invoice.'):
+        subscription_code = obj['subscription']['subscription_code']
+    else:
+        return 'Event is not used'
+
+    # The subscription is saved by id, the event has the code
+    detail = PaystackSubscription.fetch(subscription_code)
+    subscription_id = f"{detail['data']['id']}"
+    subscription = Subscription.objects.filter(
+        payment_method=PaymentMethod.PAYSTACK,
+        subscription_id=subscription_id
+    ).first()
+    if not subscription:
+        return f'No subscription {subscription_id}'
+    return _sync_subscription(subscription)
+
+
+def process_payment_event(event: PaymentEvent, force: bool = False):
+    """Apply the event once, it is locked while it is applied.
+
+    The event is not locked while it is applied, as the gateway requests
+    can wait for the rate limit. Applying an event twice is safe,
+    the subscription is saved from the newest state.
+
+    The error is saved to the note of the event.
+    The transient one is raised again, so the task can retry it.
+    """
+    event = PaymentEvent.objects.get(id=event.id)
+    if event.processed_at and not force:
+        return
+    error = None
+    try:
+        if event.payment_method == PaymentMethod.STRIPE:
+            event.note = apply_stripe_event(event.data)
+        else:
+            event.note = apply_paystack_event(event.data)
+        event.processed_at = timezone.now()
+    except Exception as e:
+        error = e
+        event.note = f'{e}'
+        LogTracker.error(event, f'Payment event: {e}')
+    event.save(update_fields=['note', 'processed_at'])
+    if isinstance(error, TRANSIENT_ERRORS):
+        raise error
@@ -2,12 +2,42 @@
 from decimal import Decimal
 
 from django.conf import settings
+from paystackapi.base import PayStackBase, PayStackRequests
 from paystackapi.paystack import Paystack
 from paystackapi.plan import Plan
 from paystackapi.subscription import Subscription
 from paystackapi.transaction import Transaction
 
+from geohosting.utils.gateway_rate_limit import (
+    Gateway, GatewayRateLimiter, parse_retry_after
+)
+
+
+class RateLimitedRequests(PayStackRequests):
+    """Paystack requests that share the rate limit of paystack."""
+
+    def _request(self, method, resource_uri, **kwargs):
+        """Do the request with the budget of paystack."""
+        def send():
+            response = method(
+                self.API_BASE_URL + resource_uri,
+                json=kwargs.get('data'), headers=self.headers,
+                params=kwargs.get('qs')
+            )
+            return (
+                response, response.status_code,
+                parse_retry_after(response.headers.get('Retry-After'))
+            )
+
+        return GatewayRateLimiter(Gateway.PAYSTACK).request(send).json()
+
+
 paystack = Paystack(secret_key=settings.PAYSTACK_SECRET_KEY)
+# All of paystack classes share the requests object
+PayStackBase._shared_state['requests'] = RateLimitedRequests(
+    api_url=paystack.requests.API_BASE_URL,
+    headers=paystack.requests.headers
+)
 
 
 def test_connection():
@@ -20,27 +50,37 @@ def test_connection():
 def create_paystack_price(
         name: str, currency: str, amount: Decimal, interval: str,
         features: list, metadata: dict = None
-) -> str:
-    """Create a paystack object.
+) -> dict:
+    """Return paystack plan of the pricing.
 
-    :rtype: str
-    :return: Paystack price id
-    """
-    plans = [
-        plan for plan in Plan.list()['data'] if
-        not plan['is_deleted'] and not plan['is_archived']
-    ]
-    for plan in plans:
-        if plan['name'] == name:
-            return plan
+    The plan is reused from the registry, it is created on paystack
+    only when there is no plan for the pricing yet.
 
+    :rtype: dict
+    :return: Paystack plan
+    """
+    from geohosting.models.paystack_plan import PaystackPlan
     price = float(amount * 100)
     if metadata:
         price = metadata["discounted_amount"]
+    return PaystackPlan.get_or_create_plan(
+        name=name,
+        currency=currency,
+        amount=int(round(price)),
+        interval=interval,
+        features=features,
+        discount_signature=PaystackPlan.get_discount_signature(metadata)
+    ).data
+
+
+def create_plan(
+        name: str, currency: str, amount: int, interval: str, features: list
+) -> dict:
+    """Create plan on paystack, amount is in the subunit."""
     response = Plan.create(
         name=name,
         description=f'Features: {features}',
-        amount=price,
+        amount=amount,
         interval=interval,
         currency=currency
     )
@@ -49,6 +89,25 @@ def create_paystack_price(
     return response['data']
 
 
+def list_plans(per_page: int = 100):
+    """Iterate all plans on paystack, page by page."""
+    page = 1
+    while True:
+        response = Plan().requests.get(
+            'plan', qs={'perPage': per_page, 'page': page}
+        )
+        if not response['status']:
+            raise Exception(response['message'])
+        yield from response['data']
+        page_count = response.get('meta', {}).get('pageCount')
+        if page_count is None:
+            if len(response['data']) < per_page:
+                return
+        elif page >= page_count:
+            return
+        page += 1
+
+
 def verify_paystack_payment(reference):
     """Return if the reference is valid."""
     return Transaction.verify(reference)
@@ -0,0 +1,379 @@
+"""Product catalog sync from ERPNext."""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from geohosting.models.package import Package, PackageGroup
+from geohosting.models.product import Product, ProductMetadata
+from geohosting.utils.erpnext import (
+    fetch_erpnext_data, fetch_erpnext_detail_data
+)
+
+DOCTYPE = 'Item'
+HOST_SPECIFICATIONS = 'host specifications'
+
+# Package fields that are synced from the item price
+PACKAGE_FIELDS = [
+    'feature_list', 'price', 'currency', 'name', 'erpnext_item_code',
+    'package_group', 'price_list'
+]
+
+
+def parse_description(html_content: str) -> dict:
+    """Parse description from html content of product page."""
+    html_content = html_content.replace(
+        "\uFEFF", ""
+    ).replace('<strong></strong>', '')
+    pattern = re.compile(r'<strong>(.*?)</strong></p><p>(.*?)</p>')
+    matches = pattern.findall(html_content)
+    data = {
+        match[0].strip().lower().replace(" ", "_"):
+            match[1].strip() for match in matches
+    }
+    return data
+
+
+class CatalogReport:
+    """Added, changed and removed codes of a catalog sync."""
+
+    def __init__(self):
+        self.added = []
+        self.changed = []
+        self.removed = []
+
+    def to_dict(self):
+        """Return report as dict."""
+        return {
+            'added': self.added,
+            'changed': self.changed,
+            'removed': self.removed
+        }
+
+
+class ProductCatalogSync:
+    """Sync products and packages from ERPNext.
+
+    Item details, attributes and prices are fetched concurrently with a
+    bounded pool and every attribute is fetched once per run.
+    The snapshot is diffed against the current rows,
+    so only the changed rows are written.
+
+    Products that are not on ERPNext anymore are made unavailable and
+    packages of removed prices are disabled, they are never deleted.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = (
+            max_workers or settings.ERPNEXT_CATALOG_SYNC_WORKERS
+        )
+        self.products = CatalogReport()
+        self.packages = CatalogReport()
+        self.errors = []
+
+    @property
+    def report(self) -> dict:
+        """Return report of the run."""
+        return {
+            'products': self.products.to_dict(),
+            'packages': self.packages.to_dict(),
+            'errors': self.errors
+        }
+
+    # ---------------------------------------------------
+    # Fetch
+    # ---------------------------------------------------
+    @staticmethod
+    def _fetch_details(executor, requests: dict) -> dict:
+        """Fetch details concurrently.
+
+        :param requests: Dict of key and (doctype, filters).
+        :return: Dict of key and the detail.
+        """
+        futures = {
+            key: executor.submit(fetch_erpnext_detail_data, *request)
+            for key, request in requests.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+    def fetch(self):
+        """Fetch snapshot of the catalog.
+
+        Return (item names, products, packages), None when the list fails.
+        Products have the parsed description and host attributes,
+        packages are the item details with their prices.
+        """
+        items = fetch_erpnext_data(DOCTYPE, {'item_group': 'GeoHosting'})
+        if not isinstance(items, list):
+            self.errors.append(f'{items}')
+            return None
+
+        products = []
+        package_names = []
+        for item in items:
+            code = item.get('item_code', '')
+
+            # Currently we focus on DO
+            if code.endswith('DO'):
+                package_names.append(item.get('name', ''))
+
+            description = item.get('description', None)
+            if description:
+                desc = parse_description(description)
+                if desc.get('short_description'):
+                    item['desc'] = desc
+                    products.append(item)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            requests = {
+                ('item', item.get('item_code', '')): (
+                    f'{DOCTYPE}/{item.get("item_code", "")}', None
+                )
+                for item in products
+            }
+            for name in package_names:
+                requests[('item', name)] = (f'{DOCTYPE}/{name}', None)
+                requests[('price', name)] = (
+                    'Item Price', {'item_code': name}
+                )
+            details = self._fetch_details(executor, requests)
+
+            # Attributes are shared by products, fetch them once
+            attributes = {}
+            for item in products:
+                detail = details[('item', item.get('item_code', ''))]
+                if not isinstance(detail, dict):
+                    item['attributes'] = []
+                    continue
+                item['attributes'] = [
+                    attribute['attribute']
+                    for attribute in detail.get('attributes', [])
+                    if HOST_SPECIFICATIONS in attribute.get(
+                        'attribute', ''
+                    ).lower()
+                ]
+                for name in item['attributes']:
+                    attributes[name] = (f'Item Attribute/{name}', None)
+            attributes = self._fetch_details(executor, attributes)
+
+        for item in products:
+            host_attributes = {}
+            for name in item['attributes']:
+                attribute = attributes[name]
+                if not isinstance(attribute, dict):
+                    continue
+                for value in attribute.get('item_attribute_values', []):
+                    host_attributes[value['abbr'].lower()] = value[
+                        'attribute_value'
+                    ]
+            item['host_attributes'] = host_attributes
+
+        packages = []
+        for name in package_names:
+            detail = details[('item', name)]
+            prices = details[('price', name)]
+            if not isinstance(detail, dict) or not isinstance(prices, list):
+                self.errors.append(f'{name}: {detail}')
+                continue
+            detail['prices'] = prices
+            packages.append(detail)
+        return {item.get('name') for item in items}, products, packages
+
+    # ---------------------------------------------------
+    # Save
+    # ---------------------------------------------------
+    def _save_products(self, products: list) -> dict:
+        """Save changed products and metadata, return products by name."""
+        existing = {}
+        for product in Product.objects.filter(
+                upstream_id__in=[item.get('name', '') for item in products]
+        ).order_by('id'):
+            existing.setdefault(product.upstream_id, product)
+
+        product_by_name = {}
+        for item in products:
+            upstream_id = item.get('name', '')
+            values = {
+                'name': item.get('item_name', ''),
+                'description': item['desc'].get('short_description', ''),
+                'available': item.get('available_in_geohosting', 0) == 1
+            }
+            product = existing.get(upstream_id)
+            if product is None:
+                product = Product(upstream_id=upstream_id, **values)
+                product.save()
+                self.products.added.append(upstream_id)
+            elif any(
+                    getattr(product, field) != value
+                    for field, value in values.items()
+            ):
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.save()
+                self.products.changed.append(upstream_id)
+            product_by_name[upstream_id] = product
+
+        # Save all description to product metadata
+        metadata = {
+            (row.product_id, row.key): row
+            for row in ProductMetadata.objects.filter(
+                product__in=product_by_name.values()
+            )
+        }
+        new_rows = []
+        changed_rows = []
+        reported = set(self.products.added + self.products.changed)
+        for item in products:
+            upstream_id = item.get('name', '')
+            product = product_by_name[upstream_id]
+            for key, value in item['desc'].items():
+                row = metadata.get((product.id, key))
+                if row is None:
+                    new_rows.append(
+                        ProductMetadata(product=product, key=key, value=value)
+                    )
+                elif row.value != value:
+                    row.value = value
+                    changed_rows.append(row)
+                else:
+                    continue
+                if upstream_id not in reported:
+                    reported.add(upstream_id)
+                    self.products.changed.append(upstream_id)
+        ProductMetadata.objects.bulk_create(
+            new_rows, batch_size=settings.ERPNEXT_SYNC_BATCH_SIZE
+        )
+        ProductMetadata.objects.bulk_update(
+            changed_rows, ['value'],
+            batch_size=settings.ERPNEXT_SYNC_BATCH_SIZE
+        )
+        return product_by_name
+
+    def _remove_products(self, item_names: set):
+        """Make products that are not on ERPNext unavailable."""
+        removed = Product.objects.filter(
+            available=True, is_add_on=False
+        ).exclude(upstream_id='').exclude(upstream_id__in=item_names)
+        removed = dict(removed.values_list('id', 'upstream_id'))
+        if removed:
+            Product.objects.filter(id__in=removed).update(available=False)
+        self.products.removed = list(removed.values())
+
+    def _save_packages(
+            self, packages: list, products: list, product_by_name: dict
+    ):
+        """Save changed packages, disable the removed ones."""
+        item_by_name = {item.get('name', ''): item for item in products}
+        packages = [
+            package for package in packages
+            if package.get('variant_of', '') in product_by_name
+        ]
+
+        group_names = {package.get('name', '') for package in packages}
+        groups = {}
+        for group in PackageGroup.objects.filter(
+                name__in=group_names
+        ).order_by('id'):
+            groups.setdefault(group.name, group)
+        PackageGroup.objects.bulk_create(
+            [
+                PackageGroup(name=name)
+                for name in group_names if name not in groups
+            ]
+        )
+        for group in PackageGroup.objects.filter(
+                name__in=group_names
+        ).order_by('id'):
+            groups.setdefault(group.name, group)
+
+        existing = {}
+        by_item_code = {}
+        for row in Package.objects.filter(
+                product__in=product_by_name.values()
+        ).order_by('id'):
+            existing.setdefault((row.product_id, row.erpnext_code), row)
+            by_item_code.setdefault(row.erpnext_item_code, []).append(row)
+
+        now = timezone.now()
+        new_rows = []
+        changed_rows = []
+        for package in packages:
+            name = package.get('name', '')
+            product_name = package.get('variant_of', '')
+            product = product_by_name[product_name]
+
+            spec = {}
+            for key, value in item_by_name[product_name].get(
+                    'host_attributes', {}
+            ).items():
+                if key in name.lower():
+                    spec = {
+                        'spec': [spec.strip() for spec in value.split(';')]
+                    }
+
+            codes = set()
+            for item_price in package['prices']:
+                code = item_price.get('name')
+                codes.add(code)
+                values = {
+                    'feature_list': spec,
+                    'price': Decimal(
+                        f'{item_price.get("price_list_rate", 0)}'
+                    ),
+                    'currency': item_price.get('currency', 'USD'),
+                    'name': item_price.get('item_name'),
+                    'erpnext_item_code': item_price.get('item_code'),
+                    'package_group': groups[name],
+                    'price_list': item_price.get('price_list')
+                }
+                row = existing.get((product.id, code))
+                if row is None:
+                    new_rows.append(
+                        Package(product=product, erpnext_code=code, **values)
+                    )
+                    self.packages.added.append(code)
+                elif any(
+                        getattr(row, field) != value
+                        for field, value in values.items()
+                ):
+                    for field, value in values.items():
+                        setattr(row, field, value)
+                    row.updated_at = now
+                    changed_rows.append(row)
+                    self.packages.changed.append(code)
+
+            # Disable packages of removed prices
+            for row in by_item_code.get(name, []):
+                if (
+                        row.product_id == product.id and
+                        row.erpnext_code and
+                        row.erpnext_code not in codes and
+                        row.enabled
+                ):
+                    row.enabled = False
+                    row.updated_at = now
+                    changed_rows.append(row)
+                    self.packages.removed.append(row.erpnext_code)
+
+        Package.objects.bulk_create(
+            new_rows, batch_size=settings.ERPNEXT_SYNC_BATCH_SIZE
+        )
+        Package.objects.bulk_update(
+            changed_rows, PACKAGE_FIELDS + ['enabled', 'updated_at'],
+            batch_size=settings.ERPNEXT_SYNC_BATCH_SIZE
+        )
+
+    def run(self) -> dict:
+        """Run the sync and return the report."""
+        snapshot = self.fetch()
+        if snapshot is None:
+            return self.report
+        item_names, products, packages = snapshot
+        with transaction.atomic():
+            product_by_name = self._save_products(products)
+            self._remove_products(item_names)
+            self._save_packages(packages, products, product_by_name)
+        return self.report
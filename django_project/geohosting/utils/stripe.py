@@ -4,9 +4,44 @@ from decimal import Decimal
 import stripe
 from django.conf import settings
 
+from geohosting.utils.gateway_rate_limit import (
+    Gateway, GatewayRateLimiter, parse_retry_after
+)
+
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
+class RateLimitedClient(stripe.RequestsClient):
+    """Stripe http client that shares the rate limit of stripe."""
+
+    def _request_internal(
+            self, method, url, headers, post_data, is_streaming
+    ):
+        """Do the request with the budget of stripe."""
+        def send():
+            response = super(RateLimitedClient, self)._request_internal(
+                method, url, headers, post_data, is_streaming
+            )
+            _, status_code, response_headers = response
+            return (
+                response, status_code,
+                parse_retry_after(
+                    (response_headers or {}).get('retry-after')
+                )
+            )
+
+        return GatewayRateLimiter(Gateway.STRIPE).request(send)
+
+
+stripe.default_http_client = RateLimitedClient()
+
+# The subscription of the list has everything that is needed for syncing
+SUBSCRIPTION_LIST_EXPAND = [
+    'data.latest_invoice',
+    'data.customer.invoice_settings.default_payment_method'
+]
+
+
 def test_connection():
     """Test connection to Stripe API."""
     stripe.Customer.list()['data']
@@ -92,21 +127,42 @@ def get_subscription(subscription_id):
     return subscription
 
 
+def list_subscriptions(current_period_end_gte: int = None):
+    """Iterate subscriptions, 100 per request.
+
+    The latest invoice and the customer are expanded.
+
+    :param current_period_end_gte: Only the subscriptions that the period
+        ends at or after this timestamp, it skips the ended history.
+    """
+    params = {}
+    if current_period_end_gte:
+        params['current_period_end'] = {'gte': current_period_end_gte}
+    return stripe.Subscription.list(
+        status='all', limit=100, expand=SUBSCRIPTION_LIST_EXPAND, **params
+    ).auto_paging_iter()
+
+
 def get_payment_method_detail(subscription):
     """Payment method detail."""
-    customer = stripe.Customer.retrieve(subscription['customer'])
+    # The customer and latest invoice are objects when they are expanded
+    customer = subscription['customer']
+    if isinstance(customer, str):
+        customer = stripe.Customer.retrieve(customer)
 
     # This is if customer has default payment method
-    if customer.invoice_settings.default_payment_method:
-        payment_method = stripe.PaymentMethod.retrieve(
-            customer.invoice_settings.default_payment_method
-        )
+    payment_method = customer.invoice_settings.default_payment_method
+    if payment_method:
+        if isinstance(payment_method, str):
+            payment_method = stripe.PaymentMethod.retrieve(payment_method)
         payment_method.billing_details.name = customer.name
         payment_method.billing_details.email = customer.email
         return payment_method
 
     # This just check last invoice
-    invoice = stripe.Invoice.retrieve(subscription.latest_invoice)
+    invoice = subscription.latest_invoice
+    if isinstance(invoice, str):
+        invoice = stripe.Invoice.retrieve(invoice)
     payment_intent = stripe.PaymentIntent.retrieve(invoice.payment_intent)
     return stripe.PaymentMethod.retrieve(payment_intent.payment_method)
 
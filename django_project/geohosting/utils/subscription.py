@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+from itertools import islice
 
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.timezone import make_aware, now
 
@@ -17,7 +19,9 @@ from geohosting.utils.stripe import (
     get_subscription as get_stripe_subscription_detail,
     get_payment_method_detail as get_stripe_payment_method_detail,
     get_invoice_detail as get_stripe_invoice_detail,
+    list_subscriptions as list_stripe_subscriptions
 )
+from geohosting_event.models.log import LogTracker
 
 User = get_user_model()
 
@@ -325,7 +329,9 @@ class SubscriptionGateway:
         subscription.current_period_start = current_period_start
         subscription.current_period_end = current_period_end
         subscription.is_active = not subscription_data.canceled
+        subscription.synced_at = now()
         subscription.save()
+        subscription.invalidate_detail()
         return subscription
 
     def subscription(self, subscriber: User) -> Subscription | None:
@@ -335,12 +341,15 @@ class SubscriptionGateway:
             return None
         return self.save_to_subscription(subscription_data, subscriber)
 
-    def get_subscription_data(self) -> SubscriptionData | None:
-        """Get subscription data."""
+    def get_subscription_data(
+            self, save: bool = True
+    ) -> SubscriptionData | None:
+        """Get subscription data, with the payment detail."""
         subscription_data = self._get_subscription_data(return_payment=True)
         if not subscription_data:
             return None
-        self.save_to_subscription(subscription_data)
+        if save:
+            self.save_to_subscription(subscription_data)
         return subscription_data
 
 
@@ -363,23 +372,54 @@ class StripeSubscriptionGateway(SubscriptionGateway):
         subscription = get_stripe_subscription_detail(self.subscription_id)
         if not subscription:
             return None
+        return self.subscription_data(subscription, return_payment)
+
+    def subscription_data(
+            self, subscription, return_payment: bool = None,
+            fetch_invoice: bool = True
+    ) -> SubscriptionData:
+        """Return subscription data of stripe subscription object.
+
+        Without fetch_invoice, the discount is from the subscription,
+        e.g. for the subscription of webhook event.
+        """
+        # The customer and latest invoice are objects when they are expanded
+        customer_id = subscription['customer']
+        if not isinstance(customer_id, str):
+            customer_id = customer_id['id']
+        invoice = None
+        latest_invoice = subscription['latest_invoice']
+        if latest_invoice and not isinstance(latest_invoice, str):
+            invoice = latest_invoice
+            latest_invoice = invoice['id']
+
         subscription_data = SubscriptionData(
             id=subscription['id'],
-            customer_id=subscription['customer'],
+            customer_id=customer_id,
             current_period_start=subscription['current_period_start'],
             current_period_end=subscription['current_period_end'],
             canceled=True if subscription['canceled_at'] else False,
             currency=subscription['plan']['currency'],
             period=subscription['plan']['interval'],
             amount=subscription['plan']['amount'],
-            latest_invoice=subscription['latest_invoice'],
+            latest_invoice=latest_invoice,
         )
         # For getting discount
-        if subscription['latest_invoice']:
-            invoice = get_stripe_invoice_detail(subscription['latest_invoice'])
+        discount = None
+        if invoice is None:
+            if not fetch_invoice:
+                discount = subscription.get('discount')
+            elif latest_invoice:
+                invoice = get_stripe_invoice_detail(latest_invoice)
+        if invoice:
+            try:
+                discount = invoice['discount']
+            except Exception:
+                pass
+        if discount:
             try:
                 # Coupon
-                coupon = invoice['discount']['coupon']
+                coupon = discount['coupon']
                 subscription_data.discount_amount = coupon['amount_off']
                 subscription_data.discount_percentage = coupon['percent_off']
                 subscription_data.discount_code = coupon['name']
@@ -415,6 +455,51 @@ class StripeSubscriptionGateway(SubscriptionGateway):
                 pass
         return subscription_data
 
+    @classmethod
+    def reconcile(cls, subscriptions: list) -> list:
+        """Sync the subscriptions from the stripe subscription list.
+
+        It pages through the list, 100 subscriptions per request,
+        instead of fetching every subscription with its invoice.
+        The list starts from the earliest period end of the subscriptions,
+        as the period end only moves forward, and it is capped to
+        STRIPE_BULK_RECONCILE_MAX_PAGES.
+        Return the subscriptions that are not found in the list,
+        they need to be synced one by one.
+        """
+        subscriptions = {
+            subscription.subscription_id: subscription
+            for subscription in subscriptions
+        }
+        if not subscriptions:
+            return []
+        remotes = list_stripe_subscriptions(
+            current_period_end_gte=int(
+                min(
+                    subscription.current_period_end
+                    for subscription in subscriptions.values()
+                ).timestamp()
+            )
+        )
+        for remote in islice(
+                remotes, settings.STRIPE_BULK_RECONCILE_MAX_PAGES * 100
+        ):
+            subscription = subscriptions.pop(remote['id'], None)
+            if not subscription:
+                continue
+            try:
+                gateway = cls(subscription.subscription_id)
+                gateway.save_to_subscription(
+                    gateway.subscription_data(remote), subscription.customer
+                )
+                subscription.check_expiry()
+            except Exception as e:
+                LogTracker.error(subscription, f'{e}')
+            # No need to fetch the next pages
+            if not subscriptions:
+                break
+        return list(subscriptions.values())
+
 
 class PaystackSubscriptionGateway(SubscriptionGateway):
     """Paystack Subscription Gateway."""
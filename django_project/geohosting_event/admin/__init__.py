@@ -1,4 +1,5 @@
 from geohosting_event.admin.email import *
 from geohosting_event.admin.erp import *
 from geohosting_event.admin.log import *
+from geohosting_event.admin.payment import *
 from geohosting_event.admin.webhook import *
@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from geohosting_event.models import PaymentEvent
+
+
+def process_payment_event(modeladmin, request, queryset):
+    """Process payment events again."""
+    from geohosting.tasks.subscription import process_payment_event
+    for event in queryset:
+        process_payment_event.delay(event.id, force=True)
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    """PaymentEvent admin."""
+
+    list_display = (
+        'received_at', 'payment_method', 'event_type', 'event_id',
+        'processed_at', 'note'
+    )
+    list_filter = ('payment_method', 'event_type')
+    search_fields = ('event_id',)
+    actions = (process_payment_event,)
+    readonly_fields = (
+        'payment_method', 'event_id', 'event_type', 'data',
+        'received_at', 'processed_at', 'note'
+    )
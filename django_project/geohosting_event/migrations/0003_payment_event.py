@@ -0,0 +1,31 @@
+# Generated by Django 5.2.13 on 2026-10-18 13:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geohosting_event', '0002_emailevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_method', models.CharField(max_length=256)),
+                ('event_id', models.CharField(help_text='Id of the event, for paystack it is the checksum of the body.', max_length=256)),
+                ('event_type', models.CharField(max_length=256)),
+                ('data', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('note', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-received_at',),
+                'unique_together': {('payment_method', 'event_id')},
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from geohosting_event.models.email import *
 from geohosting_event.models.erp import *
 from geohosting_event.models.log import *
+from geohosting_event.models.payment import *
 from geohosting_event.models.webhook import *
@@ -0,0 +1,45 @@
+# coding=utf-8
+"""
+GeoHosting.
+
+.. note:: Webhook events of payment gateways.
+"""
+
+from django.db import models
+from django.utils import timezone
+
+
+class PaymentEvent(models.Model):
+    """Event that is received from the payment gateway webhook.
+
+    The event id is unique per gateway, so the retries of the gateway
+    are stored once and applied once.
+    """
+
+    payment_method = models.CharField(max_length=256)
+    event_id = models.CharField(
+        max_length=256,
+        help_text=(
+            'Id of the event, for paystack it is the checksum of the body.'
+        )
+    )
+    event_type = models.CharField(max_length=256)
+    data = models.JSONField()
+    received_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False
+    )
+    processed_at = models.DateTimeField(
+        null=True, blank=True
+    )
+    note = models.TextField(
+        blank=True, null=True
+    )
+
+    class Meta:  # noqa
+        ordering = ('-received_at',)
+        unique_together = ('payment_method', 'event_id')
+
+    def __str__(self):
+        """Return string representation."""
+        return f'{self.payment_method} {self.event_type} {self.event_id}'
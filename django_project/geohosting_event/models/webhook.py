@@ -30,6 +30,15 @@ class WebhookStatus:
     DELETED = 'deleted'
 
 
+class WebhookHealth:
+    """Health of the Argo CD application."""
+
+    HEALTHY = 'healthy'
+    DEGRADED = 'degraded'
+    PROGRESSING = 'progressing'
+    MISSING = 'missing'
+
+
 class WebhookEvent(models.Model):
     """WebhookEvent model."""
 